@@ -14,40 +14,78 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import sys
 import logging
-
-# --- Bootstrapping: Auto-extract sessions from cookie.json if provided (Dev Only) ---
-if os.path.exists("cookie.json") and os.path.getsize("cookie.json") > 10:
-    print("Running session extraction from cookie.json...")
-    try:
-        from extract_sessions import generate_from_json
-        generate_from_json()
-    except Exception as e:
-        print(f"Warning: Session extraction failed: {e}")
-
 import time
-import pandas as pd
-from flask import Flask, render_template, request, jsonify, redirect, url_for, Response
+import json
+import threading
+import importlib.util
+from collections import Counter
+from datetime import datetime, timedelta
+import click
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context, send_file, g
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.utils import secure_filename
 
 # Import modules
-from modules import process_csv_sentiment, InstagramScraper, Config 
-from modules.database.models import db, InstagramScrape, InstagramComment, CsvUpload, CsvComment
+from modules.configuration.config import Config
+from modules.analysis.sentiment import (
+    process_csv_sentiment, get_sentiment_cache_stats, iter_csv_sentiment, analyze_comment_records
+)
+from modules.database.models import db, InstagramScrape, CsvUpload, CsvComment, ScrapeJob
+from modules.database.persistence import (
+    bulk_insert_comments, save_instagram_scrape, save_csv_upload, find_fresh_scrape, load_scrape_payload,
+    find_latest_scrape, known_comment_ids, merge_incremental_scrape, scrape_sentiment_counts,
+    iter_scrape_rows, iter_upload_rows, SCRAPE_EXPORT_COLUMNS, UPLOAD_EXPORT_COLUMNS,
+    sentiment_timeseries, recent_scrape_rollups, rebuild_sentiment_rollups, backfill_sentiment_scores
+)
+from modules.export import EXPORT_FORMATS, negotiate_format, stream_export, columnar, dumps, negotiate_encoding, compress
+from modules.jobs import ScrapeJobRunner, BatchScrapeScheduler
+from modules.instagram import InstagramScraper, is_rate_limit_error, InstagramSessionPool
+from modules.instagram.auth import parse_session_json, store_session
+from modules.instagram.session_store import create_session_store
+from modules.metrics import stage_timer, record_scrape, record_upload_rows, render_metrics
+from modules.metrics.prometheus import record_request, record_stage
 from functools import wraps
 
+# Configure Logging
+logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+
+# Heavy stacks (pandas, instaloader/instagrapi, Alembic, the VADER lexicon) are imported on
+# first use, so importing this module stays cheap for CLI commands and new workers.
+
 #=======================================    App    =======================================
 # Initialize App
 app = Flask(__name__)
 Config.init_app(app)
 app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = Config.SQLALCHEMY_TRACK_MODIFICATIONS
-app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_UPLOAD_MB * 1024 * 1024
 db.init_app(app)
-with app.app_context():
-    db.create_all()
+
+# Schema is managed by Alembic migrations in migrations/ (flask --app app db upgrade)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Function to register Flask-Migrate (imports Alembic, so only when migrations are needed)
+def init_migrations():
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=MIGRATIONS_DIR)
+
+# Function to apply pending migrations if Config.AUTO_MIGRATE is on (called by the server entry points)
+def apply_migrations():
+    if not Config.AUTO_MIGRATE:
+        return
+    init_migrations()
+    from flask_migrate import upgrade
+    with app.app_context():
+        upgrade()
+
+# The `flask db ...` commands need the extension registered when the Flask CLI loads this module
+if click.get_current_context(silent=True) is not None:
+    init_migrations()
 
 # Restrict CORS to known origins (configurable via ALLOWED_ORIGINS in .env)
 CORS(app, origins=os.environ.get('ALLOWED_ORIGINS', 'http://localhost,http://localhost:5000').split(','))
@@ -60,24 +98,349 @@ limiter = Limiter(
     storage_uri=os.environ.get('REDIS_URL', 'memory://')
 )
 
-# Global Scraper Placeholder
+# Background pool for asynchronous scrape jobs (POST /scrape with "async": true)
+job_runner = ScrapeJobRunner(app)
+
+# Request latency histogram for /metrics, labelled by route pattern (not raw URL) to bound cardinality
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        record_request(endpoint, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+# Global Scraper Placeholder (built lazily, once per worker process)
 scraper = None
+scraper_lock = threading.Lock()
+
+# Shared store for Instagram session state (Config.SESSION_STORE; None when it is 'off')
+session_store = create_session_store(app)
 
 #=======================================    Helper Functions    =======================================
 # Function to load instagram scraper instance
 def get_scraper():
     global scraper
     if scraper is None:
-        try:
-            scraper = InstagramScraper()
-            if scraper.instaloader_active or scraper.instagrapi_active:
-                logging.info("InstagramScraper initialized successfully.")
+        # Threaded workers: only the first request logs the sessions in
+        with scraper_lock:
+            if scraper is None:
+                try:
+                    scraper = InstagramSessionPool(session_store=session_store)
+                    if scraper.instaloader_active or scraper.instagrapi_active:
+                        logging.info("InstagramScraper initialized successfully.")
+                    else:
+                        logging.warning("InstagramScraper initialized but NO active sessions found.")
+                except Exception as e:
+                    logging.error(f"Failed to initialize global scraper: {e}")
+                    return None
+    return scraper
+
+#------------------------------------------------------------------------------------------
+# Function to validate an Instagram shortcode's format and length
+def is_valid_shortcode(shortcode):
+    import re
+    return bool(shortcode) and isinstance(shortcode, str) and re.match(r'^[a-zA-Z0-9_-]{1,30}$', shortcode) is not None
+
+#------------------------------------------------------------------------------------------
+# Function to scrape, analyze and persist one shortcode (shared by sync /scrape and scrape jobs)
+def run_scrape(shortcode, report_progress=None, force_refresh=False, incremental=False):
+    """
+    Returns (payload, status_code, scrape_id). scrape_id is None if nothing was saved.
+    report_progress(percent) is called between stages when given.
+    A stored scrape younger than Config.SCRAPE_CACHE_TTL is served instead of hitting
+    Instagram unless force_refresh is set; payload["cache_hit"] says which happened.
+    incremental=True fetches only comments newer than the latest stored scrape of the
+    shortcode and merges them into it; sentiment_counts are then that scrape's running totals.
+    """
+    report_progress = report_progress or (lambda progress: None)
+
+    if not force_refresh and not incremental:
+        with stage_timer('cache_lookup'):
+            cached = find_fresh_scrape(shortcode, Config.SCRAPE_CACHE_TTL)
+        if cached is not None:
+            logging.info(f"Serving {shortcode} from stored scrape {cached.id} (cache hit)")
+            with stage_timer('cache_load'):
+                payload = load_scrape_payload(cached.id)
+            record_scrape('cache', 'success')
+            payload["cache_hit"] = True
+            payload["cached_at"] = (cached.updated_at or cached.created_at).isoformat()
+            payload["engine"] = cached.engine
+            payload["scrape_id"] = cached.id
+            return payload, 200, cached.id
+
+    # Legacy scrapes without comment timestamps cannot be diffed; fall back to a full scrape
+    base_scrape = find_latest_scrape(shortcode) if incremental else None
+    if base_scrape is not None and base_scrape.newest_comment_at is None:
+        base_scrape = None
+
+    scraper_service = get_scraper()
+    if not scraper_service:
+        record_scrape(None, 'unavailable')
+        return {"error": "Scraper service unavailable"}, 503, None
+
+    # Check session health - if both inactive, try refresh
+    if not scraper_service.instagrapi_active and not scraper_service.instaloader_active:
+        logging.warning("Sessions inactive before scrape. Attempting refresh...")
+        scraper_service.setup_session()
+        
+        if not scraper_service.instagrapi_active and not scraper_service.instaloader_active:
+            record_scrape(None, 'unavailable')
+            return {
+                "error": "No active sessions available. Please refresh sessions manually via /admin/refresh-session"
+            }, 503, None
+
+    report_progress(10)
+    try:
+        with stage_timer('fetch_comments'):
+            if base_scrape is not None:
+                result = scraper_service.fetch_comments(
+                    shortcode, since=base_scrape.newest_comment_at, known_ids=known_comment_ids(base_scrape)
+                )
             else:
-                logging.warning("InstagramScraper initialized but NO active sessions found.")
+                result = scraper_service.fetch_comments(shortcode)
+        comments = result["comments"]
+    except Exception as e:
+        logging.error(f"Scraping failed: {e}")
+        rate_limited = is_rate_limit_error(e)
+        record_scrape(None, 'rate_limited' if rate_limited else 'error')
+        return {"error": f"Scraping failed: {str(e)}"}, 429 if rate_limited else 500, None
+    report_progress(60)
+    
+    # Perform Sentiment Analysis immediately (plain lists: a DataFrame costs more than the scoring here)
+    with stage_timer('sentiment'):
+        analyzed_comments, sentiment_counts = analyze_comment_records(comments)
+    report_progress(80)
+            
+    # Save to database
+    scrape_id = None
+    try:
+        with stage_timer('db_save'):
+            if base_scrape is not None:
+                merge_incremental_scrape(base_scrape, analyzed_comments)
+                scrape_id = base_scrape.id
+                logging.info(f"Merged {len(analyzed_comments)} new comments for {shortcode} into scrape {scrape_id}")
+            else:
+                scrape_job = save_instagram_scrape(shortcode, analyzed_comments, result["engine"], result["cursor"])
+                scrape_id = scrape_job.id
+                logging.info(f"Saved scrape for {shortcode} to database with ID {scrape_id}")
+    except Exception as db_err:
+        logging.error(f"Failed to save scrape to DB: {db_err}")
+    record_scrape(result["engine"], 'success')
+
+    payload = {
+        "comments": comments,
+        "analyzed_comments": analyzed_comments,
+        "sentiment_counts": sentiment_counts,
+        "cache_hit": False,
+        "engine": result["engine"],
+        "scrape_id": scrape_id
+    }
+    if base_scrape is not None:
+        payload["incremental"] = True
+        payload["new_comments"] = len(analyzed_comments)
+        payload["new_sentiment_counts"] = sentiment_counts
+        if scrape_id is not None:
+            payload["sentiment_counts"] = scrape_sentiment_counts(scrape_id)
+    return payload, 200, scrape_id
+
+#------------------------------------------------------------------------------------------
+# Function to stream a scored CSV upload back as NDJSON (one row per line, summary last)
+def stream_upload_ndjson(filepath, filename):
+    def generate():
+        counts = Counter()
+        rows = 0
+        upload_id = None
+        try:
+            upload_job = CsvUpload(filename=filename)
+            db.session.add(upload_job)
+            db.session.commit()
+            upload_id = upload_job.id
+        except Exception as db_err:
+            logging.error(f"Failed to save CSV to DB: {db_err}")
+            db.session.rollback()
+
+        try:
+            for records in iter_csv_sentiment(filepath):
+                # Persist chunk by chunk so ORM objects never pile up for the whole file
+                if upload_id is not None:
+                    try:
+                        bulk_insert_comments(CsvComment, 'upload_id', upload_id, records)
+                        db.session.commit()
+                    except Exception as db_err:
+                        logging.error(f"Failed to save CSV chunk to DB: {db_err}")
+                        db.session.rollback()
+
+                counts.update(c['sentiment'] for c in records)
+                rows += len(records)
+                yield "".join(json.dumps(c, default=str) + "\n" for c in records)
         except Exception as e:
-            logging.error(f"Failed to initialize global scraper: {e}")
-            return None
-    return scraper
+            logging.error(f"Streaming CSV processing failed: {e}")
+            yield json.dumps({"error": f"Processing Error: {str(e)}"}) + "\n"
+            return
+
+        logging.info(f"Streamed CSV upload {filename} ({rows} rows) with ID {upload_id}")
+        record_upload_rows(rows)
+        yield json.dumps({"summary": {
+            "counts": dict(counts),
+            "rows": rows,
+            "filename": filename,
+            "upload_id": upload_id
+        }}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+#------------------------------------------------------------------------------------------
+# Function to format one Server-Sent Event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# Function to stream a scrape as Server-Sent Events: each page is scored, stored and sent as it arrives
+def stream_scrape_events(shortcode, force_refresh=False):
+    """
+    Events: "page" {comments (scored), sentiment_counts (this page), running_sentiment_counts,
+    total, engine, page}, then "done" {scrape_id, sentiment_counts, total, engine, cache_hit,
+    next_cursor, has_more}, or "error" {error, status} if the scrape fails part-way.
+    Capped at MAX_COMMENTS like /scrape; continue past it with /scrape/page and next_cursor.
+    """
+    def generate():
+        if not force_refresh:
+            cached = find_fresh_scrape(shortcode, Config.SCRAPE_CACHE_TTL)
+            if cached is not None:
+                payload = load_scrape_payload(cached.id)
+                record_scrape('cache', 'success')
+                yield sse_event("page", {
+                    "comments": payload["analyzed_comments"],
+                    "sentiment_counts": payload["sentiment_counts"],
+                    "running_sentiment_counts": payload["sentiment_counts"],
+                    "total": len(payload["analyzed_comments"]),
+                    "engine": cached.engine,
+                    "page": 1
+                })
+                yield sse_event("done", {
+                    "scrape_id": cached.id,
+                    "sentiment_counts": payload["sentiment_counts"],
+                    "total": len(payload["analyzed_comments"]),
+                    "engine": cached.engine,
+                    "cache_hit": True,
+                    "next_cursor": cached.next_cursor,
+                    "has_more": cached.next_cursor is not None
+                })
+                return
+
+        scraper_service = get_scraper()
+        if not scraper_service:
+            record_scrape(None, 'unavailable')
+            yield sse_event("error", {"error": "Scraper service unavailable", "status": 503})
+            return
+
+        counts = Counter()
+        total = 0
+        scrape = None
+        page = None
+        started = time.perf_counter()
+        pages = scraper_service.iter_comment_pages(shortcode, limit=Config.MAX_COMMENTS)
+        try:
+            for number, page in enumerate(pages, start=1):
+                with stage_timer('sentiment'):
+                    comments, page_counts = analyze_comment_records(page["comments"])
+                try:
+                    with stage_timer('db_save'):
+                        if scrape is None:
+                            scrape = save_instagram_scrape(shortcode, comments, page["engine"], page["cursor"])
+                        else:
+                            scrape.next_cursor = page["cursor"]
+                            merge_incremental_scrape(scrape, comments)
+                except Exception as db_err:
+                    logging.error(f"Failed to save streamed page to DB: {db_err}")
+
+                counts.update(page_counts)
+                total += len(comments)
+                if number == 1:
+                    # Time-to-first-result, the number streaming exists to cut
+                    record_stage('stream_first_page', time.perf_counter() - started)
+                yield sse_event("page", {
+                    "comments": comments,
+                    "sentiment_counts": page_counts,
+                    "running_sentiment_counts": dict(counts),
+                    "total": total,
+                    "engine": page["engine"],
+                    "page": number
+                })
+        except Exception as e:
+            logging.error(f"Streaming scrape failed: {e}")
+            rate_limited = is_rate_limit_error(e)
+            record_scrape(None, 'rate_limited' if rate_limited else 'error')
+            yield sse_event("error", {"error": f"Scraping failed: {str(e)}", "status": 429 if rate_limited else 500})
+            return
+        finally:
+            pages.close()
+
+        engine = page["engine"] if page else None
+        record_scrape(engine, 'success')
+        next_cursor = page["cursor"] if page else None
+        yield sse_event("done", {
+            "scrape_id": scrape.id if scrape else None,
+            "sentiment_counts": dict(counts),
+            "total": total,
+            "engine": engine,
+            "cache_hit": False,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        # Proxies (nginx) must pass each event on instead of buffering the response
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+#------------------------------------------------------------------------------------------
+# Function to pick the export format from the JSON body, ?format= or the Accept header
+def resolve_export_format(requested=None):
+    """Returns (format, None) or (None, error_response)."""
+    fmt = negotiate_format(requested or request.args.get('format'), request.accept_mimetypes)
+    if fmt is None:
+        supported = ", ".join(EXPORT_FORMATS)
+        return None, (jsonify({"error": f"Unsupported export format. Choose one of: {supported}"}), 400)
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        return None, (jsonify({"error": "Parquet export is not available on this server"}), 406)
+    return fmt, None
+
+# Function to stream rows as a download in the given format
+def export_response(fmt, columns, rows, filename_stem):
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    return Response(
+        stream_with_context(stream_export(fmt, columns, rows)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment;filename={filename_stem}.{extension}"}
+    )
+
+#------------------------------------------------------------------------------------------
+# Function to tell whether the client asked for the compact columnar payload (?format=compact
+# or "format": "compact" in the JSON body)
+def wants_compact(data=None):
+    requested = (data or {}).get('format') or request.args.get('format')
+    return requested == 'compact'
+
+# Function to send a row-heavy payload as JSON, compressed as the Accept-Encoding header allows
+def json_payload_response(payload, status_code=200):
+    with stage_timer('json_encode'):
+        body = dumps(payload)
+    response = Response(body, status=status_code, mimetype='application/json')
+    if Config.RESPONSE_COMPRESSION:
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding and len(body) >= Config.RESPONSE_COMPRESS_MIN_BYTES:
+            with stage_timer('compress'):
+                response.set_data(compress(body, encoding))
+            response.content_encoding = encoding
+    return response
 
 #------------------------------------------------------------------------------------------
 # Global Error Handler
@@ -128,33 +491,32 @@ def analyze_upload():
         filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
         file.save(filepath)
 
-        counts, comments, error = process_csv_sentiment(filepath)
+        # Streaming mode: chunked scoring with NDJSON output, memory bounded by CSV_CHUNK_SIZE
+        if request.args.get('stream') == '1':
+            return stream_upload_ndjson(filepath, filename)
+
+        with stage_timer('csv_analysis'):
+            counts, comments, error = process_csv_sentiment(filepath)
         
         if error:
             return jsonify({"error": error}), 500
+        record_upload_rows(len(comments))
             
         # Save to database
+        upload_id = None
         try:
-            upload_job = CsvUpload(filename=filename)
-            db.session.add(upload_job)
-            db.session.flush()
-            for c in comments:
-                db.session.add(CsvComment(
-                    upload_id=upload_job.id, 
-                    username=c.get('username', 'unknown'), 
-                    text=c.get('comment', ''), 
-                    sentiment=c.get('sentiment', 'N/A')
-                ))
-            db.session.commit()
-            logging.info(f"Saved CSV upload {filename} to database with ID {upload_job.id}")
+            with stage_timer('db_save'):
+                upload_job = save_csv_upload(filename, comments)
+            upload_id = upload_job.id
+            logging.info(f"Saved CSV upload {filename} to database with ID {upload_id}")
         except Exception as db_err:
             logging.error(f"Failed to save CSV to DB: {db_err}")
-            db.session.rollback()
             
-        return jsonify({
+        return json_payload_response({
             "counts": counts,
-            "comments": comments,
-            "filename": filename
+            "comments": columnar(comments) if wants_compact(request.form) else comments,
+            "filename": filename,
+            "upload_id": upload_id
         })
     else:
         return jsonify({"error": "Invalid file type. Please upload a CSV."}), 400
@@ -170,66 +532,209 @@ def scrape_comments_route():
     data = request.get_json()
     shortcode = data.get('shortcode')
 
-    import re
     # Validate shortcode format and length
-    if not shortcode or not isinstance(shortcode, str) or not re.match(r'^[a-zA-Z0-9_-]{1,30}$', shortcode):
+    if not is_valid_shortcode(shortcode):
         return jsonify({"error": "Invalid shortcode format"}), 400
 
+    force_refresh = data.get('force_refresh') is True
+    incremental = data.get('incremental') is True
+
+    # Job mode: enqueue and return immediately, poll GET /jobs/<id> for the result
+    if data.get('async') is True:
+        job_id = job_runner.submit(
+            shortcode, lambda report_progress: run_scrape(shortcode, report_progress, force_refresh, incremental)
+        )
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for('get_job_status', job_id=job_id)
+        }), 202
+
+    payload, status_code, _ = run_scrape(shortcode, force_refresh=force_refresh, incremental=incremental)
+    if wants_compact(data) and "analyzed_comments" in payload:
+        # analyzed_comments carry every field of comments, so one table replaces both lists
+        payload["comments"] = columnar(payload.pop("analyzed_comments"))
+    return json_payload_response(payload, status_code)
+
+#-----------------------------------------------------------------------------------
+@app.route('/scrape/page', methods=['POST'])
+@limiter.limit("60 per minute")
+def scrape_page_route():
+    """
+    Client-driven pagination past MAX_COMMENTS: each call fetches, scores and stores one page.
+    Send back the returned scrape_id (and optionally next_cursor) to continue the same scrape.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    data = request.get_json()
+    shortcode = data.get('shortcode')
+    cursor = data.get('cursor')
+    scrape_id = data.get('scrape_id')
+    page_size = data.get('page_size')
+
+    if not is_valid_shortcode(shortcode):
+        return jsonify({"error": "Invalid shortcode format"}), 400
+    if cursor is not None and not isinstance(cursor, str):
+        return jsonify({"error": "Invalid cursor"}), 400
+    if page_size is not None and (not isinstance(page_size, int) or not 1 <= page_size <= 500):
+        return jsonify({"error": "page_size must be an integer between 1 and 500"}), 400
+
+    scrape = None
+    if scrape_id is not None:
+        scrape = db.session.get(InstagramScrape, scrape_id) if isinstance(scrape_id, int) else None
+        if scrape is None or scrape.shortcode != shortcode:
+            return jsonify({"error": "Unknown scrape_id for this shortcode"}), 404
+        if cursor is None:
+            if not scrape.next_cursor:
+                return jsonify({"error": "This scrape has no more pages"}), 400
+            cursor = scrape.next_cursor
+
     scraper_service = get_scraper()
     if not scraper_service:
         return jsonify({"error": "Scraper service unavailable"}), 503
 
-    # Check session health - if both inactive, try refresh
-    if not scraper_service.instagrapi_active and not scraper_service.instaloader_active:
-        logging.warning("Sessions inactive before scrape. Attempting refresh...")
-        scraper_service.setup_session()
-        
-        if not scraper_service.instagrapi_active and not scraper_service.instaloader_active:
-            return jsonify({
-                "error": "No active sessions available. Please refresh sessions manually via /admin/refresh-session"
-            }), 503
-
     try:
-        comments = scraper_service.scrape_comments(shortcode)
+        pages = scraper_service.iter_comment_pages(shortcode, cursor=cursor, page_size=page_size)
+        with stage_timer('fetch_page'):
+            page = next(pages)
+        pages.close()
+    except StopIteration:
+        page = {"comments": [], "cursor": None, "engine": None}
     except Exception as e:
-        logging.error(f"Scraping failed: {e}")
-        return jsonify({"error": f"Scraping failed: {str(e)}"}), 500
-    
-    # Perform Sentiment Analysis immediately
-    df_temp = pd.DataFrame(comments)
-    sentiment_counts = {}
-    analyzed_comments = comments
-
-    if not df_temp.empty and 'comment' in df_temp.columns:
-            from modules.analysis.sentiment import analyze_sentiment_text
-            df_temp['sentiment'] = df_temp['comment'].apply(analyze_sentiment_text)
-            analyzed_comments = df_temp.to_dict(orient='records')
-            sentiment_counts = df_temp['sentiment'].value_counts().to_dict()
-            
-    # Save to database
+        logging.error(f"Paginated scraping failed: {e}")
+        rate_limited = is_rate_limit_error(e)
+        record_scrape(None, 'rate_limited' if rate_limited else 'error')
+        return jsonify({"error": f"Scraping failed: {str(e)}"}), 429 if rate_limited else 500
+    record_scrape(page["engine"], 'success')
+
+    with stage_timer('sentiment'):
+        comments, page_counts = analyze_comment_records(page["comments"])
+
     try:
-        scrape_job = InstagramScrape(shortcode=shortcode)
-        db.session.add(scrape_job)
-        db.session.flush()
-        for c in analyzed_comments:
-            db.session.add(InstagramComment(
-                scrape_id=scrape_job.id, 
-                username=c.get('username', 'unknown'), 
-                text=c.get('comment', ''), 
-                sentiment=c.get('sentiment', 'N/A')
-            ))
-        db.session.commit()
-        logging.info(f"Saved scrape for {shortcode} to database with ID {scrape_job.id}")
+        with stage_timer('db_save'):
+            if scrape is None:
+                scrape = save_instagram_scrape(shortcode, comments, page["engine"], page["cursor"])
+            else:
+                scrape.next_cursor = page["cursor"]
+                merge_incremental_scrape(scrape, comments)
     except Exception as db_err:
-        logging.error(f"Failed to save scrape to DB: {db_err}")
-        db.session.rollback()
+        logging.error(f"Failed to save scrape page to DB: {db_err}")
+        return jsonify({"error": "Failed to save scraped page"}), 500
 
     return jsonify({
+        "scrape_id": scrape.id,
         "comments": comments,
-        "analyzed_comments": analyzed_comments,
-        "sentiment_counts": sentiment_counts
+        "sentiment_counts": page_counts,
+        "running_sentiment_counts": scrape_sentiment_counts(scrape.id),
+        "next_cursor": page["cursor"],
+        "has_more": page["cursor"] is not None,
+        "engine": page["engine"]
     })
 
+#-----------------------------------------------------------------------------------
+@app.route('/scrape/stream', methods=['GET'])
+@limiter.limit("10 per minute")
+def scrape_stream_route():
+    """
+    Streaming variant of /scrape as Server-Sent Events (GET, so EventSource works):
+    /scrape/stream?shortcode=...&force_refresh=1. See stream_scrape_events for the events.
+    """
+    shortcode = request.args.get('shortcode')
+    if not is_valid_shortcode(shortcode):
+        return jsonify({"error": "Invalid shortcode format"}), 400
+    force_refresh = request.args.get('force_refresh') in ('1', 'true')
+    return stream_scrape_events(shortcode, force_refresh)
+
+#-----------------------------------------------------------------------------------
+@app.route('/scrape/batch', methods=['POST'])
+@limiter.limit("5 per minute")
+def scrape_batch_route():
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    data = request.get_json()
+    shortcodes = data.get('shortcodes')
+    force_refresh = data.get('force_refresh') is True
+    incremental = data.get('incremental') is True
+
+    if not isinstance(shortcodes, list) or not shortcodes:
+        return jsonify({"error": "Invalid or empty 'shortcodes' list"}), 400
+    if len(shortcodes) > Config.BATCH_SCRAPE_MAX_SHORTCODES:
+        return jsonify({"error": f"At most {Config.BATCH_SCRAPE_MAX_SHORTCODES} shortcodes per batch"}), 400
+    invalid = [s for s in shortcodes if not is_valid_shortcode(s)]
+    if invalid:
+        return jsonify({"error": "Invalid shortcode format", "invalid_shortcodes": invalid}), 400
+
+    # De-duplicate while keeping the caller's order
+    shortcodes = list(dict.fromkeys(shortcodes))
+
+    # Each worker thread needs its own app context (and therefore its own DB session)
+    def scrape_one(shortcode):
+        with app.app_context():
+            try:
+                payload, status_code, _ = run_scrape(shortcode, force_refresh=force_refresh, incremental=incremental)
+                return payload, status_code
+            finally:
+                db.session.remove()
+
+    outcomes = BatchScrapeScheduler().run(shortcodes, scrape_one)
+
+    results = []
+    summary_counts = Counter()
+    for shortcode, payload, status_code in outcomes:
+        ok = status_code == 200
+        if ok:
+            summary_counts.update(payload.get("sentiment_counts", {}))
+        results.append({
+            "shortcode": shortcode,
+            "status": "ok" if ok else "rate_limited" if status_code == 429 else "error",
+            "status_code": status_code,
+            "engine": payload.get("engine"),
+            "cache_hit": payload.get("cache_hit", False),
+            "error": payload.get("error"),
+            "retry_after": payload.get("retry_after"),
+            "result": payload if ok else None
+        })
+
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    rate_limited = [r["shortcode"] for r in results if r["status"] == "rate_limited"]
+    return jsonify({
+        "results": results,
+        "summary": {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            # Resubmit these once retry_after has passed
+            "rate_limited": rate_limited,
+            "retry_after": max((r["retry_after"] or 0 for r in results), default=0) if rate_limited else None,
+            "sentiment_counts": dict(summary_counts)
+        }
+    })
+
+#-----------------------------------------------------------------------------------
+@app.route('/jobs/<job_id>', methods=['GET'])
+@limiter.limit("120 per minute")
+def get_job_status(job_id):
+    job = db.session.get(ScrapeJob, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    response = {
+        "job_id": job.id,
+        "shortcode": job.shortcode,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None
+    }
+
+    # Rebuild the same payload a synchronous /scrape returns from the stored rows
+    if job.status == 'done' and job.scrape_id is not None:
+        response["result"] = load_scrape_payload(job.scrape_id)
+    return jsonify(response)
+
 #-----------------------------------------------------------------------------------
 # --- 4. Download Raw CSV Routes ---
 @app.route('/download_csv', methods=['POST'])
@@ -243,15 +748,18 @@ def download_csv_route():
 
     if not isinstance(comments, list) or not comments:
         return jsonify({"error": "Invalid or empty 'comments' list"}), 400
+
+    fmt, error = resolve_export_format(data.get('format'))
+    if error:
+        return error
         
-    # Use Pandas for CSV Generation
+    # Use Pandas to normalise the comment dicts into columns
+    import pandas as pd
     df = pd.DataFrame(comments)
-    # Ensure correct column order/naming if needed, or just dump as is
     
-    return Response(
-        df.to_csv(index=False),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment;filename=Raw_Instagram_Comments_{shortcode}.csv"}
+    return export_response(
+        fmt, list(df.columns), df.itertuples(index=False, name=None),
+        f"Raw_Instagram_Comments_{shortcode}"
     )
 
 #-----------------------------------------------------------------------------------
@@ -270,23 +778,98 @@ def download_analyzed_csv_route():
 
     if not isinstance(comments, list) or not comments:
         return jsonify({"error": "Invalid or empty 'comments' list"}), 400
+
+    fmt, error = resolve_export_format(data.get('format'))
+    if error:
+        return error
         
-    saved_filename = f"{filename_prefix}_{int(time.time())}.csv"
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    saved_filename = f"{filename_prefix}_{int(time.time())}.{extension}"
     save_path = os.path.join(Config.DOWNLOAD_FOLDER, saved_filename)
     
-    # Use Pandas for CSV Generation & Saving
+    # Serialise once to disk, then send that file (no second in-memory copy)
+    import pandas as pd
     df = pd.DataFrame(comments)
+    with open(save_path, 'wb') as f:
+        for chunk in stream_export(fmt, list(df.columns), df.itertuples(index=False, name=None)):
+            f.write(chunk)
     
-    # Save to disk
-    df.to_csv(save_path, index=False, encoding='utf-8')
-    
-    # Return download response
-    return Response(
-        df.to_csv(index=False),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment;filename={saved_filename}"}
+    return send_file(os.path.abspath(save_path), mimetype=mimetype, as_attachment=True, download_name=saved_filename)
+
+#-----------------------------------------------------------------------------------
+# --- 6. Streaming Export Routes (read straight from the database) ---
+@app.route('/export/scrape/<int:scrape_id>', methods=['GET'])
+@limiter.limit("30 per minute")
+def export_scrape_route(scrape_id):
+    scrape = db.session.get(InstagramScrape, scrape_id)
+    if scrape is None:
+        return jsonify({"error": "Scrape not found"}), 404
+
+    fmt, error = resolve_export_format()
+    if error:
+        return error
+
+    # ?raw=1 mirrors /download_csv (no sentiment column)
+    raw = request.args.get('raw') == '1'
+    columns = ["username", "comment"] if raw else SCRAPE_EXPORT_COLUMNS
+    rows = iter_scrape_rows(scrape_id)
+    if raw:
+        rows = (row[:2] for row in rows)
+
+    prefix = "Raw_Instagram_Comments" if raw else "Analyzed_Instagram_Comments"
+    return export_response(fmt, columns, rows, f"{prefix}_{scrape.shortcode}_{scrape_id}")
+
+#-----------------------------------------------------------------------------------
+@app.route('/export/upload/<int:upload_id>', methods=['GET'])
+@limiter.limit("30 per minute")
+def export_upload_route(upload_id):
+    upload = db.session.get(CsvUpload, upload_id)
+    if upload is None:
+        return jsonify({"error": "Upload not found"}), 404
+
+    fmt, error = resolve_export_format()
+    if error:
+        return error
+
+    stem = os.path.splitext(upload.filename)[0]
+    return export_response(
+        fmt, UPLOAD_EXPORT_COLUMNS, iter_upload_rows(upload_id),
+        f"Analyzed_Custom_Upload_{stem}_{upload_id}"
     )
 
+#-----------------------------------------------------------------------------------
+# --- 7. Analytics Routes (read only the rollup tables) ---
+@app.route('/analytics/<shortcode>', methods=['GET'])
+@limiter.limit("60 per minute")
+def analytics_route(shortcode):
+    if not is_valid_shortcode(shortcode):
+        return jsonify({"error": "Invalid shortcode format"}), 400
+
+    bucket = request.args.get('bucket', 'hour')
+    if bucket not in ('hour', 'day'):
+        return jsonify({"error": "bucket must be 'hour' or 'day'"}), 400
+    try:
+        hours = int(request.args.get('hours', 168))
+    except ValueError:
+        return jsonify({"error": "hours must be an integer"}), 400
+    hours = max(1, min(hours, 24 * 365))
+
+    since = datetime.utcnow() - timedelta(hours=hours)
+    series = sentiment_timeseries(shortcode, since=since, bucket=bucket)
+    totals = Counter()
+    for point in series:
+        totals.update(point["counts"])
+        point["bucket"] = point["bucket"].isoformat()
+
+    return jsonify({
+        "shortcode": shortcode,
+        "bucket": bucket,
+        "window_hours": hours,
+        "series": series,
+        "totals": dict(totals),
+        "scrapes": recent_scrape_rollups(shortcode)
+    })
+
 #=======================================    Admin Security    =======================================
 def require_admin_token(f):
     @wraps(f)
@@ -298,11 +881,11 @@ def require_admin_token(f):
     return decorated
 
 #-----------------------------------------------------------------------------------
-# --- 6. Admin Session Management Routes ---
+# --- 8. Admin Session Management Routes ---
 @app.route('/admin/check-session', methods=['GET'])
 @require_admin_token
 def check_session():
-    """Check if sessions are active and healthy"""
+    """Check if sessions are active and healthy (per account: budget, cooldown, engine breakers and latency)"""
     scraper_service = get_scraper()
     if not scraper_service:
         return jsonify({
@@ -314,6 +897,8 @@ def check_session():
         "status": "ok",
         "instagrapi_active": scraper_service.instagrapi_active,
         "instaloader_active": scraper_service.instaloader_active,
+        "accounts": scraper_service.status(),
+        "sentiment_cache": get_sentiment_cache_stats(),
         "message": "Session check complete"
     })
 
@@ -321,13 +906,46 @@ def check_session():
 @app.route('/admin/refresh-session', methods=['POST'])
 @require_admin_token
 def refresh_session():
-    """Manually trigger session refresh/re-initialization"""
+    """
+    Manually trigger session refresh/re-initialization.
+    An optional JSON body {"account", "instagrapi_settings", "instaloader_cookies"} saves new
+    sessions to the session store first; other workers pick them up on their next store sync.
+    instagrapi_settings is the settings dict (or its base64 JSON, like INSTAGRAPI_SESSION_B64),
+    instaloader_cookies the cookie dict {"sessionid": "...", ...}.
+    """
     global scraper
     
     logging.info("Manual session refresh triggered by admin...")
+
+    data = request.get_json(silent=True) or {}
+    if data.get("instaloader_session_b64"):
+        return jsonify({"status": "error", "message": "instaloader_session_b64 is no longer accepted; send the cookie dict as instaloader_cookies"}), 400
+    new_sessions = {
+        'instagrapi': data.get("instagrapi_settings") or data.get("instagrapi_session_b64"),
+        'instaloader': data.get("instaloader_cookies"),
+    }
+    if any(new_sessions.values()):
+        if session_store is None:
+            return jsonify({"status": "error", "message": "SESSION_STORE is off; update the *_SESSION_B64 variables instead"}), 400
+        accounts = {a["name"]: a for a in Config.instagram_accounts()}
+        account = accounts.get(data.get("account") or "default")
+        if account is None:
+            return jsonify({"status": "error", "message": f"Unknown account. Known: {', '.join(accounts)}"}), 404
+        # Everything is checked before anything is saved, so a bad value leaves the store as it was
+        parsed = {}
+        for engine, value in new_sessions.items():
+            if value:
+                parsed[engine] = parse_session_json(engine, value)
+                if parsed[engine] is None:
+                    field = "instagrapi_settings" if engine == 'instagrapi' else "instaloader_cookies"
+                    return jsonify({"status": "error", "message": f"Invalid {field}"}), 400
+        for engine, session in parsed.items():
+            store_session(session_store, account, engine, session)
     
     try:
         # Force re-initialization
+        if scraper is not None:
+            scraper.close()
         scraper = None
         scraper_service = get_scraper()
         
@@ -353,8 +971,63 @@ def refresh_session():
             "message": str(e)
         }), 500
 
+#-----------------------------------------------------------------------------------
+# --- 9. Metrics Route (Prometheus scrape target) ---
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    """Prometheus text exposition, summed over all gunicorn workers. Set METRICS_TOKEN to require a bearer token."""
+    if Config.METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {Config.METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+#============================================   CLI   =======================================
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute sentiment rollups from stored comments (backfill for scrapes saved before rollups)."""
+    shortcodes = rebuild_sentiment_rollups()
+    print(f"Rebuilt sentiment rollups ({shortcodes} shortcodes).")
+
+@app.cli.command('backfill-scores')
+def backfill_scores_command():
+    """Compute sentiment_score for stored comments that have none (rows saved before the column)."""
+    scored = backfill_sentiment_scores()
+    print(f"Scored {scored} comments.")
+
+@app.cli.command('extract-sessions')
+def extract_sessions_command():
+    """Generate Instagrapi/Instaloader sessions from cookie.json and write them to .env."""
+    from extract_sessions import bootstrap_from_cookie_file
+    if not bootstrap_from_cookie_file():
+        print("No usable cookie.json found; sessions unchanged.")
+
+@app.cli.command('record-fixtures')
+@click.argument('shortcodes', nargs=-1, required=True)
+@click.option('--engine', type=click.Choice(['both', 'instagrapi', 'instaloader']), default='both')
+def record_fixtures_command(shortcodes, engine):
+    """Scrape SHORTCODES live and save the responses as replay fixtures (INSTAGRAM_FIXTURES_DIR)."""
+    Config.INSTAGRAM_BACKEND = 'record'
+    recorder = InstagramScraper()
+    engines = ['instagrapi', 'instaloader'] if engine == 'both' else [engine]
+    for shortcode in shortcodes:
+        for name in engines:
+            # Engines are tried in health order, so mark the other one logged out to reach this one
+            recorder.setup_session()
+            recorder.logged_in = {e: ok and e == name for e, ok in recorder.logged_in.items()}
+            try:
+                result = recorder.fetch_comments(shortcode)
+                print(f"{shortcode} [{name}]: recorded {len(result['comments'])} comments")
+            except Exception as e:
+                print(f"{shortcode} [{name}]: failed ({e})")
+    print(f"Fixtures are in {Config.INSTAGRAM_FIXTURES_DIR}")
+
 #============================================   Main   =======================================
 if __name__ == '__main__':
+    # Dev convenience: pick up a fresh cookie.json export and bring the schema up to date
+    from extract_sessions import bootstrap_from_cookie_file
+    bootstrap_from_cookie_file()
+    apply_migrations()
+
     # Read debug mode from env
     debug_mode = os.environ.get('FLASK_DEBUG', '0') == '1'
     app.run(host='0.0.0.0', port=5000, debug=debug_mode)
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Compares /scrape and /analyze_upload response bodies in the default and ?format=compact shapes,
+uncompressed and with each Content-Encoding the server can negotiate.
+
+Usage:
+    python benchmarks/bench_response_size.py [--comments 200] [--upload-rows 10000] [--repeat 20]
+
+For every shape and encoding it prints the body size and the median time to encode
+(serialize + compress) and to decode (decompress + parse) it, i.e. what the server and a
+client each pay per response. Brotli rows appear only when the `brotli` package is installed.
+Inputs come from benchmarks/corpus.py (fixed seed).
+"""
+import argparse
+import gzip
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from benchmarks.corpus import comment_records
+from modules.analysis.sentiment import analyze_comment_records
+from modules.export import columnar, dumps, compress
+
+
+#==================================== Payloads =================================
+# 1. Function to build the default and compact bodies of a scrape and an upload
+def payloads(comments, upload_rows):
+    records = comment_records(comments, seed=5)
+    analyzed, counts = analyze_comment_records(records)
+    scrape = {"sentiment_counts": counts, "cache_hit": False, "engine": "instagrapi", "scrape_id": 1}
+
+    upload, upload_counts = analyze_comment_records(
+        [{"username": r["username"], "comment": r["comment"]} for r in comment_records(upload_rows, seed=6)]
+    )
+    upload_meta = {"counts": upload_counts, "filename": "bench.csv", "upload_id": 1}
+    return {
+        "scrape": lambda: {"comments": records, "analyzed_comments": analyzed, **scrape},
+        "scrape compact": lambda: {"comments": columnar(analyzed), **scrape},
+        "upload": lambda: {"comments": upload, **upload_meta},
+        "upload compact": lambda: {"comments": columnar(upload), **upload_meta},
+    }
+
+#==================================== Timing =================================
+# 2. Function to return the median time of `run` over `repeat` runs
+def median_time(run, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+#==================================== Main =================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=200, help="comments in the scrape")
+    parser.add_argument('--upload-rows', type=int, default=10000, help="rows in the CSV upload")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    encodings = ['identity', 'gzip']
+    decoders = {'identity': lambda body: body, 'gzip': gzip.decompress}
+    if importlib.util.find_spec('brotli') is not None:
+        import brotli
+        encodings.append('br')
+        decoders['br'] = brotli.decompress
+
+    print(f"{'body':<16}{'encoding':<10}{'bytes':>12}{'encode':>12}{'decode':>12}")
+    for name, build in payloads(args.comments, args.upload_rows).items():
+        for encoding in encodings:
+            def encode():
+                body = dumps(build())
+                return body if encoding == 'identity' else compress(body, encoding)
+            body = encode()
+            encode_s = median_time(encode, args.repeat)
+            decode_s = median_time(lambda: json.loads(decoders[encoding](body)), args.repeat)
+            print(f"{name:<16}{encoding:<10}{len(body):>12,}{encode_s * 1000:>10.1f}ms{decode_s * 1000:>10.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
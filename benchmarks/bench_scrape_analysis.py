@@ -0,0 +1,82 @@
+"""
+Compares the per-request cost of scoring a scrape result through a pandas DataFrame (as
+run_scrape did before) with the list-based analyze_comment_records path.
+
+Usage:
+    python benchmarks/bench_scrape_analysis.py [--rows 200] [--requests 500]
+
+Scores are served from the sentiment cache after the first request, as they mostly are in
+production, so the numbers isolate the DataFrame build/convert overhead around the scoring.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from modules.analysis.sentiment import analyze_sentiment_scores, sentiment_label, analyze_comment_records
+
+
+#==================================== Setup =================================
+def make_comments(rows):
+    samples = ["fire 🔥🔥", "W", "this is mid", "first", "@friend look at this", "absolute banger", "L take", "ok"]
+    return [
+        {"username": f"user_{i}", "comment": f"{samples[i % len(samples)]} #{i % 50}", "commented_at": None}
+        for i in range(rows)
+    ]
+
+#==================================== Analysis Paths =================================
+# Baseline: DataFrame round trip, as app.py did before the list-based path
+def analyze_with_pandas(comments):
+    df_temp = pd.DataFrame(comments)
+    sentiment_counts = {}
+    analyzed_comments = comments
+    if not df_temp.empty and 'comment' in df_temp.columns:
+        scores = analyze_sentiment_scores(df_temp['comment'].tolist())
+        df_temp['sentiment'] = [sentiment_label(score) for score in scores]
+        df_temp['sentiment_score'] = scores
+        analyzed_comments = df_temp.to_dict(orient='records')
+        sentiment_counts = df_temp['sentiment'].value_counts().to_dict()
+    return analyzed_comments, sentiment_counts
+
+def analyze_with_lists(comments):
+    return analyze_comment_records(comments)
+
+def time_path(fn, comments, requests):
+    fn(comments)  # warm the sentiment cache and any lazy imports
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn(comments)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+#==================================== Main =================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    comments = make_comments(args.rows)
+
+    # Both paths must agree before their timings mean anything
+    expected_rows, expected_counts = analyze_with_pandas(comments)
+    rows, counts = analyze_with_lists(comments)
+    assert rows == expected_rows and counts == expected_counts, "list path disagrees with the pandas path"
+
+    pandas_median, pandas_p99 = time_path(analyze_with_pandas, comments, args.requests)
+    lists_median, lists_p99 = time_path(analyze_with_lists, comments, args.requests)
+
+    print(f"rows={args.rows} requests={args.requests}")
+    print(f"  pandas DataFrame : median {pandas_median * 1e6:8.1f} us   p99 {pandas_p99 * 1e6:8.1f} us")
+    print(f"  plain lists      : median {lists_median * 1e6:8.1f} us   p99 {lists_p99 * 1e6:8.1f} us")
+    print(f"  speedup (median) : {pandas_median / lists_median:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Load-tests the scrape path (session pool -> scraper engines -> sentiment -> database) against
+replayed Instagram responses, so nothing touches the network or burns a session.
+
+Usage:
+    python benchmarks/bench_scrape_replay.py [--scrapes 200] [--concurrency 8] [--latency-ms 80]
+        [--rate-429 instagrapi:0.2] [--rate-5xx 0.02] [--comments 200] [--accounts 3]
+        [--fixtures DIR] [--engines instagrapi,instaloader] [--seed 1]
+        [--stall-rate instagrapi:0.05 --stall-ms 3000] [--hedge] [--expect-ok 1.0]
+
+--fixtures points at recordings made with INSTAGRAM_BACKEND=record (see
+modules/instagram/backends.py); without it a synthetic fixture set is generated from
+benchmarks/corpus.py. Error rates accept "0.1" or per engine "instagrapi:0.3,instaloader:0",
+which exercises the Instagrapi -> Instaloader fallback, the pool's 429 rerouting and cooldowns,
+and the engine circuit breakers. --stall-rate makes a share of requests hang (a slow engine);
+compare tail latency with and without --hedge. Results go to a temporary SQLite file.
+
+--expect-ok makes the run a check: the exit status is 1 when fewer than that share of the
+scrapes return 200 or a breaker is left open. A few transient errors must not trip the
+breakers, e.g. every scrape should still succeed with
+    python benchmarks/bench_scrape_replay.py --scrapes 100 --rate-5xx 0.05 --expect-ok 1.0
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import comment_records
+
+
+#==================================== Synthetic Fixtures =================================
+# Writes one fixture per engine and shortcode in the same format the recorder produces
+def write_synthetic_fixtures(store, shortcodes, comments_per_post, page_size=20):
+    for n, shortcode in enumerate(shortcodes):
+        records = comment_records(comments_per_post, seed=n)
+        raw = [
+            {
+                "pk": str(18_000_000_000_000_000 + n * 100_000 + i),
+                "text": r["comment"],
+                "user": {"pk": str(1_000 + i), "username": r["username"]},
+                "created_at_utc": int(datetime.fromisoformat(r["created_at"]).timestamp()),
+                "content_type": "comment",
+                "status": "Active",
+            }
+            for i, r in enumerate(records)
+        ]
+        media_id = f"{3_000_000_000_000_000_000 + n}_42"
+        for start in range(0, len(raw), page_size):
+            params = {"max_id": f"replay-{start}"} if start else None
+            store.add_instagrapi_page(shortcode, media_id, params, {"comments": raw[start:start + page_size]})
+
+        store.add_instaloader_comments(shortcode, [
+            {"id": int(c["pk"]), "username": c["user"]["username"], "text": c["text"], "created_at_utc": r["created_at"]}
+            for c, r in zip(raw, records)
+        ])
+
+#==================================== Main =================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scrapes', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--shortcodes', type=int, default=20, help="distinct shortcodes to cycle through")
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--rate-429', default='0')
+    parser.add_argument('--rate-5xx', default='0')
+    parser.add_argument('--stall-rate', default='0', help="share of requests that hang for --stall-ms")
+    parser.add_argument('--stall-ms', type=float, default=3000)
+    parser.add_argument('--hedge', action='store_true', help="enable hedged scrapes (SCRAPE_HEDGE_ENABLED)")
+    parser.add_argument('--comments', type=int, default=200, help="comments per post (0 = as recorded)")
+    parser.add_argument('--accounts', type=int, default=1, help="pooled accounts to spread scrapes over")
+    parser.add_argument('--engines', default='instagrapi,instaloader', help="engines whose sessions come up logged in")
+    parser.add_argument('--fixtures', help="recorded fixture directory (default: generate synthetic ones)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--real-budget', action='store_true',
+                        help="keep the configured per-account scrape budget (default: unlimited, to measure the pipeline)")
+    parser.add_argument('--expect-ok', type=float,
+                        help="exit 1 if fewer than this share of scrapes return 200 or any breaker ends up open")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    fixtures_dir = args.fixtures or os.path.join(tmp_dir.name, 'fixtures')
+
+    # Config reads the environment on import, so everything is set before the app is loaded
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}",
+        'INSTAGRAM_BACKEND': 'replay',
+        'INSTAGRAM_FIXTURES_DIR': fixtures_dir,
+        'INSTAGRAM_REPLAY_LATENCY_MS': str(args.latency_ms),
+        'INSTAGRAM_REPLAY_JITTER_MS': str(args.jitter_ms),
+        'INSTAGRAM_REPLAY_429_RATE': args.rate_429,
+        'INSTAGRAM_REPLAY_5XX_RATE': args.rate_5xx,
+        'INSTAGRAM_REPLAY_STALL_RATE': args.stall_rate,
+        'INSTAGRAM_REPLAY_STALL_MS': str(args.stall_ms),
+        'SCRAPE_HEDGE_ENABLED': '1' if args.hedge else '0',
+        'INSTAGRAM_REPLAY_COMMENTS': str(args.comments),
+        'INSTAGRAM_REPLAY_ENGINES': args.engines,
+        'INSTAGRAM_REPLAY_SEED': str(args.seed),
+        'SCRAPE_CACHE_TTL': '0',
+    })
+    if not args.real_budget:
+        os.environ.update({'ACCOUNT_BURST': '1000000', 'ACCOUNT_SCRAPES_PER_MINUTE': '1000000'})
+    for i in range(2, args.accounts + 1):
+        os.environ[f"INSTAGRAPI_SESSION_B64_bench{i}"] = "replay"
+
+    from modules.instagram.backends import FixtureStore
+    shortcodes = [f"BENCH{i:04d}" for i in range(args.shortcodes)]
+    if not args.fixtures:
+        write_synthetic_fixtures(FixtureStore(fixtures_dir), shortcodes, args.comments or 200)
+
+    import app as app_module
+    from modules.database.models import db
+
+    with app_module.app.app_context():
+        db.create_all()
+    app_module.get_scraper()  # build the pool up front so it isn't timed as the first scrape
+
+    def scrape(i):
+        with app_module.app.app_context():
+            start = time.perf_counter()
+            payload, status_code, _ = app_module.run_scrape(shortcodes[i % len(shortcodes)], force_refresh=True)
+            return time.perf_counter() - start, status_code, payload.get("engine")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(scrape, range(args.scrapes)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results if r[1] == 200)
+    statuses = Counter(r[1] for r in results)
+    engines = Counter(r[2] for r in results if r[1] == 200)
+
+    print(f"scrapes={args.scrapes} concurrency={args.concurrency} accounts={args.accounts} comments={args.comments or 'recorded'}")
+    print(f"latency={args.latency_ms}±{args.jitter_ms}ms 429={args.rate_429} 5xx={args.rate_5xx} engines={args.engines}")
+    print(f"stalls={args.stall_rate} x {args.stall_ms:.0f}ms hedge={'on' if args.hedge else 'off'}")
+    print(f"  throughput : {args.scrapes / elapsed:8.1f} scrapes/s ({elapsed:.1f}s total)")
+    if latencies:
+        print(f"  latency    : p50 {statistics.median(latencies) * 1000:7.1f}ms  "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f}ms  "
+              f"p99 {latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000:7.1f}ms")
+    print(f"  status     : {dict(sorted(statuses.items()))}")
+    print(f"  engines    : {dict(engines)}")
+    open_breakers = []
+    for account in app_module.get_scraper().status():
+        print(f"  account {account['name']:<8}: {account['successes']} ok, {account['failures']} failed, "
+              f"cooldown {account['cooldown_remaining']}s")
+        for engine, breaker in account['engines'].items():
+            print(f"    {engine:<12}: {breaker['state']}, success {breaker['success_rate']}, "
+                  f"p50 {breaker['latency_ms']['p50']} ms, trips {breaker['trips']}")
+            if breaker['state'] != 'closed':
+                open_breakers.append(f"{account['name']}/{engine}")
+
+    tmp_dir.cleanup()
+
+    if args.expect_ok is not None:
+        ok_share = statuses.get(200, 0) / args.scrapes
+        if ok_share < args.expect_ok or open_breakers:
+            print(f"FAILED: {ok_share:.0%} of scrapes ok (expected {args.expect_ok:.0%}), "
+                  f"breakers not closed: {', '.join(open_breakers) or 'none'}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
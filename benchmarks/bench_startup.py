@@ -0,0 +1,84 @@
+"""
+Measures the cold-start cost of `import app` (what every gunicorn master, CLI command and
+test run pays before serving anything) and checks that the heavy stacks stay lazy.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 10]
+
+Each run imports the app in a fresh interpreter. DATABASE_URL defaults to a temporary
+SQLite file so no database server (or its driver) is needed.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load on first use (scrape, CSV analysis, migrations, Parquet export)
+LAZY_MODULES = ('pandas', 'numpy', 'pyarrow', 'instagrapi', 'instaloader', 'alembic', 'flask_migrate')
+
+PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))\n"
+) % (LAZY_MODULES,)
+
+
+#==================================== Measurements =================================
+def run_probe(env):
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def top_imports(env, top):
+    """Cumulative import time of the slowest top-level packages, from -X importtime."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        stripped = name.strip()
+        if '.' not in stripped:
+            totals[stripped] = max(totals.get(stripped, 0), int(cumulative))
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+#==================================== Main =================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}")
+
+    runs = [run_probe(env) for _ in range(args.repeat)]
+    seconds = [run['seconds'] for run in runs]
+    loaded = sorted({module for run in runs for module in run['loaded']})
+
+    print(f"import app, {args.repeat} fresh interpreters")
+    print(f"  median : {statistics.median(seconds) * 1000:8.1f} ms")
+    print(f"  best   : {min(seconds) * 1000:8.1f} ms")
+    print(f"  heavy modules loaded at import: {', '.join(loaded) if loaded else 'none'}")
+    print("slowest top-level imports (cumulative):")
+    for name, micros in top_imports(env, args.top):
+        print(f"  {name:<24} {micros / 1000:8.1f} ms")
+
+    tmp_dir.cleanup()
+    if loaded:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Synthetic Instagram-style comment corpora for the benchmarks.
+
+Deterministic for a given seed, so two runs (or two machines) score exactly the same text.
+Real comment sections are a mix of stock one-liners that repeat endlessly ("🔥🔥🔥", "first",
+"W") and longer one-off sentences with slang, emoji, mentions and hashtags; the generator
+mirrors that mix via `repeat_ratio`.
+"""
+import csv
+import random
+from datetime import datetime, timedelta
+
+# Stock comments that show up over and over under popular posts
+STOCK_COMMENTS = [
+    "🔥🔥🔥", "🔥", "😍😍", "❤️", "first", "W", "L", "mid", "goated 🐐", "this is fire 🔥",
+    "🙌🙌", "😂😂😂", "lol", "LMAO 💀", "sheesh", "banger", "peak", "who's here in 2026?",
+    "cringe", "ratio", "💯", "facts", "no way 😳", "scam", "so cute 🥺", "👏👏👏",
+]
+
+OPENERS = [
+    "honestly", "ngl", "bro", "lowkey", "highkey", "not gonna lie", "fr", "tbh", "yo", "omg",
+    "wait", "imagine thinking", "nah", "bestie", "",
+]
+SUBJECTS = [
+    "this edit", "the drop", "this fit", "the new album", "that ending", "this collab", "the lighting",
+    "this recipe", "the price", "the customer service", "this take", "the second slide", "the vibe",
+]
+VERDICTS = [
+    "is fire", "goes hard", "is so mid", "is actually trash", "is peak content", "is a whole scam",
+    "hits different", "is based", "is giving nothing", "is a certified banger", "is cringe",
+    "made my day", "ruined my feed", "is underrated", "is overrated", "is the best thing I've seen all week",
+    "is robbery at this price", "is a W", "is an L", "is clean", "is goated",
+]
+EMOJI = ["🔥", "😍", "💀", "😂", "🙏", "😭", "🐐", "💯", "🤡", "👀", "❤️", "😡", "🥲", "✨", "👎", "👍"]
+TAILS = ["", "!!", "!!!", "...", "?", " fr", " no cap", " lol", " 😤", " tbh", " period"]
+HASHTAGS = ["#fyp", "#explore", "#viral", "#reels", "#ootd", "#foodie", "#travel", "#music"]
+
+
+#==================================== Generators =================================
+# 1. Function to build a single one-off comment
+def _composed_comment(rng):
+    words = [rng.choice(OPENERS), rng.choice(SUBJECTS), rng.choice(VERDICTS)]
+    text = " ".join(w for w in words if w)
+    if rng.random() < 0.15:
+        text = text.upper()
+    text += rng.choice(TAILS)
+    if rng.random() < 0.6:
+        text += " " + rng.choice(EMOJI) * rng.randint(1, 4)
+    if rng.random() < 0.2:
+        text = f"@user{rng.randint(1, 5000)} " + text
+    if rng.random() < 0.15:
+        text += " " + " ".join(rng.sample(HASHTAGS, rng.randint(1, 3)))
+    return text
+
+# 2. Function to get `n` comment texts
+def comment_texts(n, seed=0, repeat_ratio=0.3):
+    rng = random.Random(seed)
+    return [
+        rng.choice(STOCK_COMMENTS) if rng.random() < repeat_ratio else _composed_comment(rng)
+        for _ in range(n)
+    ]
+
+# 3. Function to get `n` comment dicts shaped like a scrape result
+def comment_records(n, seed=0, repeat_ratio=0.3):
+    rng = random.Random(seed + 1)
+    start = datetime(2026, 1, 1)
+    return [
+        {
+            "comment_id": str(10**17 + i),
+            "username": f"user_{rng.randint(1, n * 2)}",
+            "comment": text,
+            "created_at": (start + timedelta(seconds=i * 37)).isoformat(),
+        }
+        for i, text in enumerate(comment_texts(n, seed, repeat_ratio))
+    ]
+
+# 4. Function to write an upload-style CSV (Username, Comment headers as users export them)
+def write_csv(path, n, seed=0, repeat_ratio=0.3):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Username", "Comment"])
+        for record in comment_records(n, seed, repeat_ratio):
+            writer.writerow([record["username"], record["comment"]])
+    return path
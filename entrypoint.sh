@@ -0,0 +1,21 @@
+#!/bin/sh
+# Container start-up: turn a mounted cookie.json into session variables, then start the server.
+# (Session extraction used to run on every import of app.py; it is an explicit step now.)
+set -e
+
+if [ -s cookie.json ]; then
+    if flask --app app extract-sessions; then
+        # The sessions were written to .env, but docker-compose's env_file already put the old
+        # values in the environment and load_dotenv() never overrides those, so export them here
+        for key in INSTAGRAPI_SESSION_B64 INSTALOADER_SESSION_B64; do
+            value=$(sed -n "s/^$key *= *//p" .env 2>/dev/null | tail -n 1)
+            if [ -n "$value" ]; then
+                export "$key=$value"
+            fi
+        done
+    else
+        echo "Warning: Session extraction failed"
+    fi
+fi
+
+exec "$@"
@@ -1,9 +1,7 @@
 import os
 import json
 import base64
-import instaloader
-from instagrapi import Client
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values
 
 # Load variables from .env if present
 load_dotenv()
@@ -37,6 +35,9 @@ def _write_env_var(key: str, value: str, env_path: str = '.env'):
 
 
 def generate_from_json():
+    import instaloader
+    from instagrapi import Client
+
     print("="*50)
     print(f" [>] EXTRACTING FROM COOKIE.JSON")
     print("="*50)
@@ -146,5 +147,28 @@ def generate_from_json():
         preview = f"{instaloader_b64[:20]}...{instaloader_b64[-20:]}"
         print(f"INSTALOADER_SESSION_B64 = {preview}")
 
+def bootstrap_from_cookie_file(path='cookie.json', env_path='.env'):
+    """
+    Runs generate_from_json() if a non-empty cookie export exists, then copies the new
+    session variables into os.environ so the current process picks them up.
+    Used by `flask --app app extract-sessions` and `python app.py`; the Docker entrypoint runs the
+    former in its own process and exports the new values itself before starting gunicorn.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) <= 10:
+        return False
+
+    print("Running session extraction from cookie.json...")
+    try:
+        generate_from_json()
+    except Exception as e:
+        print(f"Warning: Session extraction failed: {e}")
+        return False
+
+    values = dotenv_values(env_path)
+    for key in ('INSTAGRAPI_SESSION_B64', 'INSTALOADER_SESSION_B64'):
+        if values.get(key):
+            os.environ[key] = values[key]
+    return True
+
 if __name__ == "__main__":
     generate_from_json()
@@ -0,0 +1,69 @@
+import os
+import multiprocessing
+import tempfile
+
+#=======================================    Gunicorn (Production Server)    =======================================
+# Usage: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# - preload_app imports the app once in the master: configuration, migrations and the VADER
+#   analyzer are loaded before forking, so workers share those pages copy-on-write.
+# - Workers are processes (sentiment scoring is CPU bound), each with a few threads for the
+#   I/O-bound scrapes. Scraper sessions are built lazily inside each worker on first use.
+# - Account health and the rate-limit backoff live in shared memory allocated below, so a
+#   429 seen by one worker cools the account down for all of them.
+# - Prometheus metrics run in multi-process mode: each worker writes samples to files in
+#   PROMETHEUS_MULTIPROC_DIR and /metrics adds them up across workers.
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS') or os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count())
+threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+worker_class = 'gthread'
+preload_app = True
+
+# Scrapes of large posts can take a while; nginx's proxy_read_timeout should stay above this
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 180)
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth (cheap with preload_app)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 1000)
+max_requests_jitter = max_requests // 10
+
+# Each worker keeps its own sentiment scoring pool; share the CPUs out instead of giving every
+# worker cpu_count processes. Like the line below, this must be set before the app is imported.
+os.environ.setdefault('SENTIMENT_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+# Must be set before the app (and prometheus_client) is imported, i.e. here rather than in a hook
+os.environ['PROMETHEUS_MULTIPROC_DIR'] = (
+    os.environ.get('PROMETHEUS_MULTIPROC_DIR') or tempfile.mkdtemp(prefix='social_pulse_metrics_')
+)
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+#=======================================    Server Hooks    =======================================
+# Runs in the master after the app is preloaded and before any worker is forked
+def on_starting(server):
+    from modules.configuration.config import Config
+    from modules.instagram.shared_state import enable_shared_state
+    from modules.metrics.prometheus import reset_multiprocess_dir
+    enable_shared_state([account["name"] for account in Config.instagram_accounts()])
+    reset_multiprocess_dir(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+# Runs in each worker right after fork
+def post_fork(server, worker):
+    from app import app
+    from modules.database.models import db
+
+    # Connections opened by the master (migrations) must not be shared with the children
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+# Runs in the master when a worker exits (crash, timeout or max_requests recycling)
+def child_exit(server, worker):
+    from modules.metrics.prometheus import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -0,0 +1,40 @@
+import logging
+from alembic import context
+from flask import current_app
+
+logger = logging.getLogger('alembic.env')
+
+#==================================== Alembic Environment =================================
+# Runs inside the Flask app context that Flask-Migrate sets up, so the engine and the
+# model metadata (for autogenerate) both come from modules.database.models.db.
+# Logging is left to the app; alembic.ini has no logging sections on purpose.
+config = context.config
+db = current_app.extensions['migrate'].db
+target_metadata = db.metadata
+
+config.set_main_option('sqlalchemy.url', db.engine.url.render_as_string(hide_password=False).replace('%', '%%'))
+
+
+def run_migrations_offline():
+    context.configure(url=config.get_main_option('sqlalchemy.url'), target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with db.engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+            # SQLite cannot ALTER most things in place; batch mode rebuilds the table instead
+            render_as_batch=connection.dialect.name == 'sqlite'
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
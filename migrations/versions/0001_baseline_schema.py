@@ -0,0 +1,111 @@
+"""Baseline schema (create-or-patch snapshot of the last create_all() schema)
+
+Not the original schema: this is the schema the models had when migrations were introduced,
+i.e. after sentiment rollups were added. Besides the original instagram_scrape,
+instagram_comment, csv_upload and csv_comment tables it already contains what was added
+under create_all():
+- instagram_scrape: updated_at, engine, next_cursor, newest_comment_at
+- instagram_comment: ig_comment_id, commented_at
+- the scrape_job table and both rollup tables
+Changes made after that point live in their own revisions (0002 onwards).
+
+Before migrations, tables were created with db.create_all(), which never alters a table that
+already exists. Databases from older releases therefore have the original tables without the
+columns added since. This revision creates whatever table is missing and adds whatever column
+is missing, so it is safe on an empty database and on any create_all()-era one. Downgrading
+it drops every table.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    _create_or_patch(
+        'instagram_scrape',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('shortcode', sa.String(255), nullable=False),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('engine', sa.String(20)),
+        sa.Column('next_cursor', sa.Text()),
+        sa.Column('newest_comment_at', sa.DateTime())
+    )
+    _create_or_patch(
+        'instagram_comment',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('scrape_id', sa.Integer(), sa.ForeignKey('instagram_scrape.id'), nullable=False),
+        sa.Column('ig_comment_id', sa.String(64)),
+        sa.Column('username', sa.String(255)),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('sentiment', sa.String(50)),
+        sa.Column('commented_at', sa.DateTime()),
+        sa.Column('created_at', sa.DateTime())
+    )
+    _create_or_patch(
+        'csv_upload',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('filename', sa.String(255), nullable=False),
+        sa.Column('created_at', sa.DateTime())
+    )
+    _create_or_patch(
+        'csv_comment',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('upload_id', sa.Integer(), sa.ForeignKey('csv_upload.id'), nullable=False),
+        sa.Column('username', sa.String(255)),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('sentiment', sa.String(50)),
+        sa.Column('created_at', sa.DateTime())
+    )
+    _create_or_patch(
+        'scrape_job',
+        sa.Column('id', sa.String(32), primary_key=True),
+        sa.Column('shortcode', sa.String(255), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('progress', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text()),
+        sa.Column('scrape_id', sa.Integer(), sa.ForeignKey('instagram_scrape.id')),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('updated_at', sa.DateTime())
+    )
+    _create_or_patch(
+        'scrape_sentiment_rollup',
+        sa.Column('scrape_id', sa.Integer(), sa.ForeignKey('instagram_scrape.id'), primary_key=True),
+        sa.Column('sentiment', sa.String(50), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False)
+    )
+    _create_or_patch(
+        'shortcode_sentiment_hourly',
+        sa.Column('shortcode', sa.String(255), primary_key=True),
+        sa.Column('hour', sa.DateTime(), primary_key=True),
+        sa.Column('sentiment', sa.String(50), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('scrape_id', sa.Integer(), sa.ForeignKey('instagram_scrape.id'))
+    )
+
+
+def downgrade():
+    for table in ('shortcode_sentiment_hourly', 'scrape_sentiment_rollup', 'scrape_job',
+                  'csv_comment', 'csv_upload', 'instagram_comment', 'instagram_scrape'):
+        op.drop_table(table)
+
+
+# Helper to create a table, or add the columns an existing copy of it is missing
+def _create_or_patch(name, *columns):
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(name):
+        op.create_table(name, *columns)
+        return
+    existing = {column['name'] for column in inspector.get_columns(name)}
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(name, column)
@@ -0,0 +1,63 @@
+"""Indexes for history lookups, smallint sentiment codes and compound scores
+
+- Composite indexes for the queries the app actually runs (comments of a scrape/upload in id
+  order, the newest scrape of a shortcode, the incremental-scrape watermark lookup).
+- instagram_comment.sentiment / csv_comment.sentiment go from VARCHAR(50) labels to SMALLINT
+  codes (1 Positive, 0 Neutral, -1 Negative, NULL anything else), converted in place.
+- New sentiment_score column holding the VADER compound score (filled by 0003).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+COMMENT_TABLES = ('instagram_comment', 'csv_comment')
+
+INDEXES = [
+    ('ix_instagram_scrape_shortcode_created_at', 'instagram_scrape', ['shortcode', 'created_at']),
+    ('ix_instagram_comment_scrape_id_id', 'instagram_comment', ['scrape_id', 'id']),
+    ('ix_instagram_comment_scrape_id_commented_at', 'instagram_comment', ['scrape_id', 'commented_at']),
+    ('ix_csv_comment_upload_id_id', 'csv_comment', ['upload_id', 'id']),
+    ('ix_csv_upload_created_at', 'csv_upload', ['created_at']),
+    ('ix_scrape_job_created_at', 'scrape_job', ['created_at']),
+]
+
+
+def upgrade():
+    for table in COMMENT_TABLES:
+        op.add_column(table, sa.Column('sentiment_code', sa.SmallInteger()))
+        op.execute(
+            f"UPDATE {table} SET sentiment_code = CASE LOWER(sentiment) "
+            "WHEN 'positive' THEN 1 WHEN 'neutral' THEN 0 WHEN 'negative' THEN -1 END"
+        )
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column('sentiment')
+            batch.alter_column('sentiment_code', new_column_name='sentiment', existing_type=sa.SmallInteger())
+            batch.add_column(sa.Column('sentiment_score', sa.Float()))
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
+
+    for table in COMMENT_TABLES:
+        op.add_column(table, sa.Column('sentiment_label', sa.String(50)))
+        op.execute(
+            f"UPDATE {table} SET sentiment_label = CASE sentiment "
+            "WHEN 1 THEN 'Positive' WHEN 0 THEN 'Neutral' WHEN -1 THEN 'Negative' ELSE 'N/A' END"
+        )
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column('sentiment_score')
+            batch.drop_column('sentiment')
+            batch.alter_column('sentiment_label', new_column_name='sentiment', existing_type=sa.String(50))
@@ -0,0 +1,106 @@
+"""Backfill sentiment rollups for existing rows
+
+- Scrapes without a scrape_sentiment_rollup entry get one, and shortcodes without hourly
+  buckets get them from their newest scrape (same rules as modules/database/persistence.py).
+
+sentiment_score stays NULL on rows that predate it: scoring needs the sentiment model, whose
+lexicon and VADER version move on with the code, and a migration has to give the same data
+on every checkout. Fill it afterwards with `flask --app app backfill-scores`.
+
+Data only: re-running it is a no-op and downgrade leaves the values in place.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from collections import Counter
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+LABELS = {1: 'Positive', 0: 'Neutral', -1: 'Negative'}
+
+instagram_scrape = sa.table(
+    'instagram_scrape',
+    sa.column('id', sa.Integer), sa.column('shortcode', sa.String), sa.column('created_at', sa.DateTime)
+)
+instagram_comment = sa.table(
+    'instagram_comment',
+    sa.column('id', sa.Integer), sa.column('scrape_id', sa.Integer),
+    sa.column('sentiment', sa.SmallInteger), sa.column('commented_at', sa.DateTime)
+)
+scrape_sentiment_rollup = sa.table(
+    'scrape_sentiment_rollup',
+    sa.column('scrape_id', sa.Integer), sa.column('sentiment', sa.String), sa.column('count', sa.Integer)
+)
+shortcode_sentiment_hourly = sa.table(
+    'shortcode_sentiment_hourly',
+    sa.column('shortcode', sa.String), sa.column('hour', sa.DateTime), sa.column('sentiment', sa.String),
+    sa.column('count', sa.Integer), sa.column('scrape_id', sa.Integer)
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    _backfill_scrape_rollups(bind)
+    _backfill_hourly_rollups(bind)
+
+
+def downgrade():
+    pass
+
+
+# 1. Function to add per-scrape counts for scrapes that have none
+def _backfill_scrape_rollups(bind):
+    done = sa.select(scrape_sentiment_rollup.c.scrape_id).distinct()
+    counts = bind.execute(
+        sa.select(instagram_comment.c.scrape_id, instagram_comment.c.sentiment, sa.func.count())
+        .where(instagram_comment.c.scrape_id.not_in(done))
+        .group_by(instagram_comment.c.scrape_id, instagram_comment.c.sentiment)
+    ).fetchall()
+
+    # NULL and unknown codes both read back as 'N/A', so fold them into one row
+    rows = Counter()
+    for scrape_id, code, count in counts:
+        rows[(scrape_id, LABELS.get(code, 'N/A'))] += count
+    if rows:
+        bind.execute(scrape_sentiment_rollup.insert(), [
+            {"scrape_id": scrape_id, "sentiment": sentiment, "count": count}
+            for (scrape_id, sentiment), count in rows.items()
+        ])
+
+
+# 2. Function to add hourly buckets for shortcodes that have none, from their newest scrape
+def _backfill_hourly_rollups(bind):
+    newest = sa.select(sa.func.max(instagram_scrape.c.id)).group_by(instagram_scrape.c.shortcode)
+    done = sa.select(shortcode_sentiment_hourly.c.shortcode).distinct()
+    scrapes = bind.execute(
+        sa.select(instagram_scrape.c.id, instagram_scrape.c.shortcode, instagram_scrape.c.created_at)
+        .where(instagram_scrape.c.id.in_(newest), instagram_scrape.c.shortcode.not_in(done))
+    ).fetchall()
+
+    for scrape_id, shortcode, created_at in scrapes:
+        fallback_hour = _hour_bucket(created_at) if created_at else None
+        buckets = Counter()
+        comments = bind.execute(
+            sa.select(instagram_comment.c.commented_at, instagram_comment.c.sentiment)
+            .where(instagram_comment.c.scrape_id == scrape_id)
+        )
+        for commented_at, code in comments:
+            hour = _hour_bucket(commented_at) if commented_at else fallback_hour
+            if hour is not None:
+                buckets[(hour, LABELS.get(code, 'N/A'))] += 1
+        if buckets:
+            bind.execute(shortcode_sentiment_hourly.insert(), [
+                {"shortcode": shortcode, "hour": hour, "sentiment": sentiment, "count": count, "scrape_id": scrape_id}
+                for (hour, sentiment), count in buckets.items()
+            ])
+
+
+def _hour_bucket(value):
+    return value.replace(minute=0, second=0, microsecond=0)
@@ -0,0 +1,33 @@
+"""Shared Instagram session store
+
+- instagram_session holds the newest session state per account and engine, so cookies
+  Instagram refreshes survive restarts and every worker picks them up.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'instagram_session',
+        sa.Column('account', sa.String(64), primary_key=True),
+        sa.Column('engine', sa.String(20), primary_key=True),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('source_hash', sa.String(64)),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime())
+    )
+
+
+def downgrade():
+    op.drop_table('instagram_session')
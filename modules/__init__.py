@@ -1,5 +0,0 @@
-from modules.analysis.sentiment import process_csv_sentiment
-from modules.instagram.scraper import InstagramScraper
-from modules.configuration.config import Config
-
-print("All Modules imported successfully")
\ No newline at end of file
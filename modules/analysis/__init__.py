@@ -1,3 +1,17 @@
-from modules.analysis.sentiment import process_csv_sentiment
+# Public names load their submodule on first use (PEP 562), so importing modules.analysis.cache
+# does not load VADER
+import importlib
 
-print("Sentiment analysis module imported successfully")
\ No newline at end of file
+_EXPORTS = {
+    'process_csv_sentiment': 'modules.analysis.sentiment',
+    'analyze_sentiment_batch': 'modules.analysis.sentiment',
+    'analyze_sentiment_scores': 'modules.analysis.sentiment',
+    'analyze_comment_records': 'modules.analysis.sentiment',
+}
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
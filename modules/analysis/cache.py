@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+
+
+#==================================== SentimentCache Class =================================
+# Bounded in-memory cache of sentiment scores keyed by normalized comment text
+class SentimentCache:
+    """
+    Thread-safe bounded cache.
+    policy='lru'  -> a hit refreshes the entry, least recently used is evicted.
+    policy='fifo' -> hits do not reorder, oldest inserted entry is evicted.
+    maxsize=0 disables caching entirely.
+    """
+    POLICIES = ('lru', 'fifo')
+
+    def __init__(self, maxsize=10000, policy='lru'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown cache policy '{policy}', expected one of {self.POLICIES}")
+        self.maxsize = max(0, int(maxsize))
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+#---------------------------------------------------------------------------------
+# 1. Function to normalize text into a cache key
+    @staticmethod
+    def normalize(text):
+        # VADER tokenizes on whitespace, so collapsing it never changes the score.
+        # Case is kept because VADER boosts ALL-CAPS words.
+        return " ".join(str(text).split())
+
+#---------------------------------------------------------------------------------
+# 2. Function to look up a key (returns None on miss)
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                if self.policy == 'lru':
+                    self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+            return None
+
+#---------------------------------------------------------------------------------
+# 3. Function to store a value, evicting when full
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            if key in self._data:
+                self._data[key] = value
+                if self.policy == 'lru':
+                    self._data.move_to_end(key)
+                return
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+#---------------------------------------------------------------------------------
+# 4. Function to drop every entry when the scoring inputs change
+    def ensure_version(self, version):
+        """Clears the cache if `version` differs from the one it was filled under. Returns True if cleared."""
+        if version == self._version:
+            return False
+        with self._lock:
+            if version == self._version:
+                return False
+            self._data.clear()
+            self._version = version
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+#---------------------------------------------------------------------------------
+# 5. Function to report counters
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "policy": self.policy,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
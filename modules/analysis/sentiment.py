@@ -1,8 +1,15 @@
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import codecs
+import logging
+import multiprocessing
+import threading
+from collections import Counter
+from modules.configuration.config import Config
+from modules.analysis.cache import SentimentCache
 
-# Initialize VADER analyzer globally to avoid overhead on every call
-analyzer = SentimentIntensityAnalyzer()
+logger = logging.getLogger(__name__)
 
 #==================================== CUSTOM LEXICON UPDATE =================================
 # To fix and customize inverted scores for common slang/emojis
@@ -31,20 +38,58 @@ modern_slang = {
     'rip': -1.5,    
 }
 
-analyzer.lexicon.update(modern_slang)
+# Build a VADER analyzer with the custom slang lexicon applied
+def build_analyzer():
+    sia = SentimentIntensityAnalyzer()
+    sia.lexicon.update(modern_slang)
+    return sia
+
+# Fingerprint of the slang lexicon, used to detect runtime edits to modern_slang
+def _lexicon_version():
+    return hash(frozenset(modern_slang.items()))
+
+# Global VADER analyzer, built on first use (or by warm_up() before a server forks)
+analyzer = None
+
+#==================================== Sentiment Cache =================================
+# Comment sections repeat themselves ("🔥🔥🔥", "W", "first"), so compound scores are memoized
+sentiment_cache = SentimentCache(maxsize=Config.SENTIMENT_CACHE_SIZE, policy=Config.SENTIMENT_CACHE_POLICY)
+sentiment_cache.ensure_version(_lexicon_version())
+
+# Builds the analyzer on first use; clears the cache and rebuilds it if modern_slang was edited since the last call
+def _sync_lexicon():
+    global analyzer
+    if sentiment_cache.ensure_version(_lexicon_version()):
+        logger.info("Slang lexicon changed, rebuilding analyzer and clearing sentiment cache.")
+        analyzer = build_analyzer()
+    elif analyzer is None:
+        analyzer = build_analyzer()
+
+# Function to build the analyzer ahead of the first request (wsgi.py calls it before gunicorn forks)
+def warm_up():
+    _sync_lexicon()
+
+# Function to report sentiment cache counters
+def get_sentiment_cache_stats():
+    return sentiment_cache.stats()
 
 #==================================== Sentiment Analysis Functions ================================
 # 1. Function to analyze sentiment of a single string
 def analyze_sentiment_text(text):
-    # Convert to string if necessary
-    if isinstance(text, (float, int)):
-        text = str(text)
-    
-    # Score the text
-    scores = analyzer.polarity_scores(text)
-    compound = scores['compound']
-    
-    # Return sentiment based on compound score
+    return sentiment_label(analyze_sentiment_score(text))
+
+# Function to get the VADER compound score (-1.0 .. 1.0) of a single string
+def analyze_sentiment_score(text):
+    _sync_lexicon()
+    key = SentimentCache.normalize(text)
+    compound = sentiment_cache.get(key)
+    if compound is None:
+        compound = _score_text(analyzer, text)
+        sentiment_cache.put(key, compound)
+    return compound
+
+# Function to turn a compound score into its label
+def sentiment_label(compound):
     if compound >= 0.05:
         return 'Positive'
     elif compound <= -0.05:
@@ -52,9 +97,146 @@ def analyze_sentiment_text(text):
     else:
         return 'Neutral'
 
+# Shared scoring logic so the serial and pooled paths return identical scores
+def _score_text(sia, text):
+    # Convert to string if necessary
+    if isinstance(text, (float, int)):
+        text = str(text)
+    
+    # Score the text
+    return sia.polarity_scores(text)['compound']
+
 #-----------------------------------------------------------------------------------
-# 2. Function to process CSV file and add sentiment analysis
+# 2. Function to analyze sentiment of many strings, sharded across a process pool
+def analyze_sentiment_batch(texts, workers=None):
+    """Labels for `texts`, in order. See analyze_sentiment_scores for how work is split."""
+    return [sentiment_label(compound) for compound in analyze_sentiment_scores(texts, workers)]
+
+def analyze_sentiment_scores(texts, workers=None):
+    """
+    Scores a list of texts and returns compound scores in the same order.
+    Inputs smaller than Config.SENTIMENT_PARALLEL_THRESHOLD (or workers <= 1)
+    are scored serially; larger ones are split into one contiguous shard per worker.
+    """
+    texts = list(texts)
+    workers = Config.SENTIMENT_WORKERS if workers is None else workers
+
+    if workers <= 1 or len(texts) < Config.SENTIMENT_PARALLEL_THRESHOLD:
+        return [analyze_sentiment_score(t) for t in texts]
+
+    # Resolve cache hits up front and only ship each distinct uncached text to the pool once
+    _sync_lexicon()
+    keys = [SentimentCache.normalize(t) for t in texts]
+    scores = {}
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key in scores or key in pending:
+            continue
+        compound = sentiment_cache.get(key)
+        if compound is None:
+            pending[key] = text
+        else:
+            scores[key] = compound
+
+    if len(pending) < Config.SENTIMENT_PARALLEL_THRESHOLD:
+        for key, text in pending.items():
+            scores[key] = _score_text(analyzer, text)
+            sentiment_cache.put(key, scores[key])
+        return [scores[key] for key in keys]
+
+    pending_keys = list(pending)
+    pending_texts = list(pending.values())
+    workers = min(workers, len(pending_texts))
+    shard_size = -(-len(pending_texts) // workers)
+    shards = [pending_texts[i:i + shard_size] for i in range(0, len(pending_texts), shard_size)]
+
+    try:
+        scored = []
+        for shard_scores in _get_pool(workers).map(_score_shard, shards):
+            scored.extend(shard_scores)
+    except Exception as e:
+        logger.warning(f"Parallel sentiment scoring failed, falling back to serial: {e}")
+        if isinstance(e, BrokenProcessPool):
+            _discard_pool()
+        scored = [_score_text(analyzer, t) for t in pending_texts]
+
+    for key, compound in zip(pending_keys, scored):
+        scores[key] = compound
+        sentiment_cache.put(key, compound)
+    return [scores[key] for key in keys]
+
+# One pool per process, created on first use and reused by every request thread. Its processes
+# come from a forkserver (or spawn), never a fork of this multithreaded server process.
+_pool = None
+_pool_key = None # (workers, lexicon version) the pool was built for
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    global _pool, _pool_key
+    key = (workers, _lexicon_version())
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                # Shards already submitted to the old pool still finish
+                _pool.shutdown(wait=False)
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                # Preload only this module, not __main__ (which may be app.py with the whole app)
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=context,
+                initializer=_init_worker, initargs=(dict(modern_slang),)
+            )
+            _pool_key = key
+        return _pool
+
+def _discard_pool():
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool, _pool_key = None, None
+
+# Per-process analyzer, built once by the pool initializer. The slang lexicon is passed in
+# because worker processes start from a fresh import and would not see runtime edits.
+_worker_analyzer = None
+
+def _init_worker(slang):
+    global _worker_analyzer
+    _worker_analyzer = SentimentIntensityAnalyzer()
+    _worker_analyzer.lexicon.update(slang)
+
+def _score_shard(texts):
+    return [_score_text(_worker_analyzer, t) for t in texts]
+
+#-----------------------------------------------------------------------------------
+# 3. Function to analyze a list of comment dicts without going through pandas
+def analyze_comment_records(comments, text_key='comment'):
+    """
+    Returns (analyzed, counts) for a list of dicts such as a scrape result.
+    `analyzed` holds copies of the input dicts with 'sentiment' and 'sentiment_score' added
+    (the inputs are left untouched); `counts` maps label -> count, most common first.
+    For scrape-sized inputs this skips the DataFrame build/convert round trip entirely.
+    """
+    if not comments:
+        return [], {}
+
+    scores = analyze_sentiment_scores([c.get(text_key) or '' for c in comments])
+    analyzed = []
+    counts = Counter()
+    for c, compound in zip(comments, scores):
+        label = sentiment_label(compound)
+        counts[label] += 1
+        analyzed.append({**c, 'sentiment': label, 'sentiment_score': compound})
+    return analyzed, dict(counts.most_common())
+
+#-----------------------------------------------------------------------------------
+# 4. Function to process CSV file and add sentiment analysis
 def process_csv_sentiment(filepath):
+    import pandas as pd
+
     # Try evaluating with utf-8-sig to handle BOM if present, and replace errors to avoid crash
     try:
         try:
@@ -64,21 +246,12 @@ def process_csv_sentiment(filepath):
         except UnicodeDecodeError:
              df = pd.read_csv(filepath, encoding='cp1252', encoding_errors='replace')
         
-        # Normalize column names
-        if 'Comment' in df.columns:
-            df.rename(columns={'Comment': 'comment'}, inplace=True)
-        if 'Username' in df.columns:
-            df.rename(columns={'Username': 'username'}, inplace=True)    
-        if 'comment' not in df.columns:
-            return None, None, "CSV must have a 'comment' or 'Comment' column."
-
-        # Filter empty rows BEFORE analysis to avoid Neutral tags on blanks
-        df.dropna(subset=['comment'], inplace=True)
-        df['comment'] = df['comment'].astype(str)
-        df = df[df['comment'].str.strip() != '']
+        df, error = _prepare_comments_frame(df)
+        if error:
+            return None, None, error
 
         # Analyze
-        df['sentiment'] = df['comment'].apply(analyze_sentiment_text)
+        _add_sentiment_columns(df)
         
         # Fill NaNs in OTHER columns (like username if missing) to avoid JSON errors
         df = df.fillna('')
@@ -95,3 +268,65 @@ def process_csv_sentiment(filepath):
     # Exception Handling for any other errors     
     except Exception as e:
         return None, None, f"Processing Error: {str(e)}"
+
+#-----------------------------------------------------------------------------------
+# 5. Function to stream a CSV file in chunks and add sentiment analysis
+def iter_csv_sentiment(filepath, chunksize=None):
+    """
+    Generator version of process_csv_sentiment for large uploads.
+    Reads `chunksize` rows at a time and yields each scored chunk as a list of records,
+    so peak memory follows the chunk size instead of the file size.
+    Raises ValueError if the CSV has no comment column.
+    """
+    import pandas as pd
+
+    chunksize = chunksize or Config.CSV_CHUNK_SIZE
+    encoding, encoding_errors = _detect_csv_encoding(filepath)
+
+    with pd.read_csv(filepath, encoding=encoding, encoding_errors=encoding_errors, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk, error = _prepare_comments_frame(chunk)
+            if error:
+                raise ValueError(error)
+            if chunk.empty:
+                continue
+            _add_sentiment_columns(chunk)
+            yield chunk.fillna('').to_dict(orient='records')
+
+#-----------------------------------------------------------------------------------
+# Helper to add the 'sentiment' label and 'sentiment_score' compound columns in place
+def _add_sentiment_columns(df):
+    scores = analyze_sentiment_scores(df['comment'].tolist())
+    df['sentiment'] = [sentiment_label(compound) for compound in scores]
+    df['sentiment_score'] = scores
+
+# Helper to normalize column names and drop blank comments
+def _prepare_comments_frame(df):
+    # Normalize column names
+    if 'Comment' in df.columns:
+        df = df.rename(columns={'Comment': 'comment'})
+    if 'Username' in df.columns:
+        df = df.rename(columns={'Username': 'username'})
+    if 'comment' not in df.columns:
+        return None, "CSV must have a 'comment' or 'Comment' column."
+
+    # Filter empty rows BEFORE analysis to avoid Neutral tags on blanks
+    df = df.dropna(subset=['comment'])
+    df['comment'] = df['comment'].astype(str)
+    df = df[df['comment'].str.strip() != ''].copy()
+    return df, None
+
+# Helper to pick the CSV encoding without loading the whole file
+def _detect_csv_encoding(filepath, block_size=1024 * 1024):
+    """Returns (encoding, encoding_errors): utf-8 if the whole file decodes, else cp1252 with replacement."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(filepath, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                decoder.decode(block, final=not block)
+                if not block:
+                    break
+        return 'utf-8', 'strict'
+    except UnicodeDecodeError:
+        return 'cp1252', 'replace'
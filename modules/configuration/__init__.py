@@ -1,3 +1 @@
 from modules.configuration.config import Config
-
-print("Configuration module imported successfully")
\ No newline at end of file
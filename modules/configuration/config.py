@@ -27,21 +27,128 @@ class Config:
     # User Agent
     USER_AGENT = os.environ.get('INSTAGRAM_USER_AGENT', 'Instagram 123.0.0.26.121 Android (28/9; 320dpi; 720x1280; Xiaomi; Redmi Note 7; lavender; qcom; en_US)')
 
-    # Validation & Debugging
-    _logger = logging.getLogger(__name__)
-
-    # Validation: Log warning if credentials are missing
-    if not INSTAGRAM_USERNAME:
-        _logger.warning("Instagram username not found in environment variables!")
-    
     # ── Session Management ─────────────────────────────────────────────────────
-    # Sessions are exclusively loaded from Base64 environment variables
-    # (INSTALOADER_SESSION_B64 and INSTAGRAPI_SESSION_B64). No local files are used.
+    # Sessions are seeded from Base64 environment variables (INSTALOADER_SESSION_B64 and
+    # INSTAGRAPI_SESSION_B64) and loaded in memory. Extra accounts for the session pool use
+    # suffixed variables, e.g. INSTAGRAPI_SESSION_B64_2 / INSTALOADER_SESSION_B64_2 / INSTAGRAM_USERNAME_2.
+
+    # Session store: where refreshed session state is saved after scrapes so it survives restarts
+    # and reaches every worker ('database' table, 'file' under SESSION_STORE_DIR, or 'off' for env
+    # variables only). A changed env variable replaces the stored session. Workers check the store
+    # for newer sessions at most every SESSION_STORE_SYNC_INTERVAL seconds.
+    SESSION_STORE = (os.environ.get('SESSION_STORE') or 'database').lower()
+    SESSION_STORE_DIR = os.environ.get('SESSION_STORE_DIR') or os.path.join(os.getcwd(), 'webdata', 'sessions')
+    SESSION_STORE_SYNC_INTERVAL = float(os.environ.get('SESSION_STORE_SYNC_INTERVAL') or 30)
+
+    # Per-account scrape budget (token bucket) and cooldowns after failures, in seconds
+    ACCOUNT_SCRAPES_PER_MINUTE = float(os.environ.get('ACCOUNT_SCRAPES_PER_MINUTE') or 10)
+    ACCOUNT_BURST = int(os.environ.get('ACCOUNT_BURST') or 10)
+    ACCOUNT_FAILURE_THRESHOLD = int(os.environ.get('ACCOUNT_FAILURE_THRESHOLD') or 3)
+    ACCOUNT_FAILURE_COOLDOWN = float(os.environ.get('ACCOUNT_FAILURE_COOLDOWN') or 30)
+    ACCOUNT_RATE_LIMIT_COOLDOWN = float(os.environ.get('ACCOUNT_RATE_LIMIT_COOLDOWN') or 600)
+    ACCOUNT_MAX_COOLDOWN = float(os.environ.get('ACCOUNT_MAX_COOLDOWN') or 1800)
+    # How long a scrape waits for an account with spare budget before giving up
+    SESSION_POOL_ACQUIRE_TIMEOUT = float(os.environ.get('SESSION_POOL_ACQUIRE_TIMEOUT') or 10)
+
+    # ── Engine Health ──────────────────────────────────────────────────────────
+    # Per-account, per-engine circuit breaker: it opens when at least ENGINE_BREAKER_FAILURE_RATE
+    # of the upstream requests (API pages, not whole scrapes) in the last ENGINE_BREAKER_WINDOW
+    # seconds failed (with at least ENGINE_BREAKER_MIN_REQUESTS of them) or on a rate limit, then
+    # stays open for a backoff that doubles on every failed trial (seconds)
+    ENGINE_BREAKER_WINDOW = float(os.environ.get('ENGINE_BREAKER_WINDOW') or 300)
+    ENGINE_BREAKER_MIN_REQUESTS = int(os.environ.get('ENGINE_BREAKER_MIN_REQUESTS') or 4)
+    ENGINE_BREAKER_FAILURE_RATE = float(os.environ.get('ENGINE_BREAKER_FAILURE_RATE') or 0.5)
+    ENGINE_BREAKER_BASE_BACKOFF = float(os.environ.get('ENGINE_BREAKER_BASE_BACKOFF') or 30)
+    ENGINE_BREAKER_MAX_BACKOFF = float(os.environ.get('ENGINE_BREAKER_MAX_BACKOFF') or 1800)
+    # Background health probe: engines idle this long (or due a half-open trial) get one light
+    # request against ENGINE_PROBE_SHORTCODE, or the account's last scraped post (0 disables)
+    ENGINE_PROBE_INTERVAL = float(os.environ.get('ENGINE_PROBE_INTERVAL') or 120)
+    ENGINE_PROBE_SHORTCODE = os.environ.get('ENGINE_PROBE_SHORTCODE', '').strip() or None
+
+    # Retries of a single upstream request (a comments page) after a 5xx or dropped connection,
+    # waiting SCRAPE_REQUEST_RETRY_DELAY seconds times the attempt number; rate limits are not retried
+    SCRAPE_REQUEST_RETRIES = int(os.environ.get('SCRAPE_REQUEST_RETRIES') or 1)
+    SCRAPE_REQUEST_RETRY_DELAY = float(os.environ.get('SCRAPE_REQUEST_RETRY_DELAY') or 0.5)
+
+    # Hedged scrapes (off by default): when the first-choice engine has not answered after its
+    # recent p95 scrape time (at least SCRAPE_HEDGE_MIN_DELAY, or SCRAPE_HEDGE_DEFAULT_DELAY
+    # before there is any history), the other engine starts too and the first success wins.
+    # SCRAPE_HEDGE_WORKERS threads per worker process run the engine attempts.
+    SCRAPE_HEDGE_ENABLED = os.environ.get('SCRAPE_HEDGE_ENABLED', '0') == '1'
+    SCRAPE_HEDGE_MIN_DELAY = float(os.environ.get('SCRAPE_HEDGE_MIN_DELAY') or 1)
+    SCRAPE_HEDGE_DEFAULT_DELAY = float(os.environ.get('SCRAPE_HEDGE_DEFAULT_DELAY') or 10)
+    SCRAPE_HEDGE_WORKERS = int(os.environ.get('SCRAPE_HEDGE_WORKERS') or 16)
+
+    # ── Instagram Backend (offline load testing) ───────────────────────────────
+    # 'live' talks to Instagram; 'record' does too and saves every response it gets under
+    # INSTAGRAM_FIXTURES_DIR; 'replay' serves those fixtures without any network access
+    INSTAGRAM_BACKEND = (os.environ.get('INSTAGRAM_BACKEND') or 'live').lower()
+    INSTAGRAM_FIXTURES_DIR = os.environ.get('INSTAGRAM_FIXTURES_DIR') or os.path.join(os.getcwd(), 'webdata', 'instagram fixtures')
+    # Replay conditions: latency per simulated request (mean and std-dev, ms), error rates per
+    # request as "0.05" or per engine as "instagrapi:0.3,instaloader:0", comments per post
+    # (0 = as recorded; more repeats the recorded ones), engines whose sessions come up
+    # logged in, and the random seed (blank = different every run)
+    INSTAGRAM_REPLAY_LATENCY_MS = float(os.environ.get('INSTAGRAM_REPLAY_LATENCY_MS') or 0)
+    INSTAGRAM_REPLAY_JITTER_MS = float(os.environ.get('INSTAGRAM_REPLAY_JITTER_MS') or 0)
+    INSTAGRAM_REPLAY_429_RATE = os.environ.get('INSTAGRAM_REPLAY_429_RATE') or '0'
+    INSTAGRAM_REPLAY_5XX_RATE = os.environ.get('INSTAGRAM_REPLAY_5XX_RATE') or '0'
+    # Share of requests (same format as the error rates) that hang for an extra STALL_MS
+    INSTAGRAM_REPLAY_STALL_RATE = os.environ.get('INSTAGRAM_REPLAY_STALL_RATE') or '0'
+    INSTAGRAM_REPLAY_STALL_MS = float(os.environ.get('INSTAGRAM_REPLAY_STALL_MS') or 0)
+    INSTAGRAM_REPLAY_COMMENTS = int(os.environ.get('INSTAGRAM_REPLAY_COMMENTS') or 0)
+    INSTAGRAM_REPLAY_ENGINES = os.environ.get('INSTAGRAM_REPLAY_ENGINES') or 'instagrapi,instaloader'
+    INSTAGRAM_REPLAY_SEED = os.environ.get('INSTAGRAM_REPLAY_SEED')
 
 
     # Comment limit
     MAX_COMMENTS = 200
 
+    # Comments per page for paginated scraping when the caller gives no page_size (Instagrapi
+    # pages then follow the API's own size)
+    COMMENT_PAGE_SIZE = int(os.environ.get('COMMENT_PAGE_SIZE') or 50)
+
+    # Serve a shortcode from its newest stored scrape if younger than this many seconds (0 disables)
+    SCRAPE_CACHE_TTL = int(os.environ.get('SCRAPE_CACHE_TTL') or 300)
+
+    # Background threads per worker process for asynchronous scrape jobs
+    SCRAPE_JOB_WORKERS = int(os.environ.get('SCRAPE_JOB_WORKERS') or 2)
+
+    # Batch scraping: shortcodes per request, concurrent scrapes, and retries after a 429
+    BATCH_SCRAPE_MAX_SHORTCODES = int(os.environ.get('BATCH_SCRAPE_MAX_SHORTCODES') or 50)
+    BATCH_SCRAPE_CONCURRENCY = int(os.environ.get('BATCH_SCRAPE_CONCURRENCY') or 4)
+    BATCH_SCRAPE_MAX_RETRIES = int(os.environ.get('BATCH_SCRAPE_MAX_RETRIES') or 2)
+    # Longest backoff (seconds) a batch waits out in the request; longer ones return the
+    # remaining shortcodes as rate limited instead of running past the gunicorn/nginx timeouts
+    BATCH_SCRAPE_MAX_WAIT = float(os.environ.get('BATCH_SCRAPE_MAX_WAIT') or 0)
+
+    # Global backoff after Instagram returns 429 (doubles per consecutive 429, in seconds)
+    RATE_LIMIT_BASE_BACKOFF = float(os.environ.get('RATE_LIMIT_BASE_BACKOFF') or 30)
+    RATE_LIMIT_MAX_BACKOFF = float(os.environ.get('RATE_LIMIT_MAX_BACKOFF') or 300)
+
+    # ── Sentiment Analysis ─────────────────────────────────────────────────────
+    # Worker processes used to score large CSV uploads (one pool per server process, so
+    # gunicorn.conf.py divides the CPUs among its workers), and the row count below
+    # which scoring stays serial (pool start-up costs more than it saves)
+    SENTIMENT_WORKERS = int(os.environ.get('SENTIMENT_WORKERS') or os.cpu_count() or 1)
+    SENTIMENT_PARALLEL_THRESHOLD = int(os.environ.get('SENTIMENT_PARALLEL_THRESHOLD') or 5000)
+
+    # Memoized scores for repeated comment texts (size 0 disables; policy is 'lru' or 'fifo')
+    SENTIMENT_CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE') or 50000)
+    SENTIMENT_CACHE_POLICY = (os.environ.get('SENTIMENT_CACHE_POLICY') or 'lru').lower()
+
+    # ── CSV Uploads ────────────────────────────────────────────────────────────
+    # Maximum upload size, and rows read per chunk when streaming an upload
+    MAX_UPLOAD_MB = int(os.environ.get('MAX_UPLOAD_MB') or 10)
+    CSV_CHUNK_SIZE = int(os.environ.get('CSV_CHUNK_SIZE') or 10000)
+
+    # ── Response Encoding ──────────────────────────────────────────────────────
+    # /scrape and /analyze_upload responses of at least RESPONSE_COMPRESS_MIN_BYTES are gzip- or
+    # brotli-compressed (brotli only if the package is installed) when the client accepts it
+    RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', '1') == '1'
+    RESPONSE_COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES') or 1024)
+    RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL') or 6)
+    RESPONSE_BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY') or 5)
+
     # ── Database Management ────────────────────────────────────────────────────
     DATABASE_URL = os.environ.get('DATABASE_URL')
     if DATABASE_URL:
@@ -57,10 +164,50 @@ class Config:
         
         SQLALCHEMY_DATABASE_URI = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Rows per INSERT batch when persisting comments
+    DB_BATCH_SIZE = int(os.environ.get('DB_BATCH_SIZE') or 1000)
+
+    # Apply pending schema migrations (migrations/) when the app starts; set to 0 to
+    # run `flask --app app db upgrade` as a separate deploy step instead
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') == '1'
+
+    # ── Monitoring ─────────────────────────────────────────────────────────────
+    # Bearer token Prometheus must send to GET /metrics (blank leaves it open, so keep the
+    # route off the public proxy in that case)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
     
+    #=======================================   Instagram Accounts    =======================================
+    # Static method to list configured accounts: the unsuffixed pair first, then every _<suffix> pair
+    @staticmethod
+    def instagram_accounts():
+        accounts = [{
+            "name": "default",
+            "username": Config.INSTAGRAM_USERNAME,
+            "instagrapi_env": "INSTAGRAPI_SESSION_B64",
+            "instaloader_env": "INSTALOADER_SESSION_B64"
+        }]
+        suffixes = set()
+        for key in os.environ:
+            for prefix in ("INSTAGRAPI_SESSION_B64_", "INSTALOADER_SESSION_B64_"):
+                if key.startswith(prefix) and key[len(prefix):]:
+                    suffixes.add(key[len(prefix):])
+        for suffix in sorted(suffixes):
+            accounts.append({
+                "name": suffix,
+                "username": os.environ.get(f"INSTAGRAM_USERNAME_{suffix}", '').strip() or Config.INSTAGRAM_USERNAME,
+                "instagrapi_env": f"INSTAGRAPI_SESSION_B64_{suffix}",
+                "instaloader_env": f"INSTALOADER_SESSION_B64_{suffix}"
+            })
+        return accounts
+
     #=======================================   Create directories    =======================================
     # Static method to initialize app - Create upload and download folders if they don't exist
     @staticmethod
     def init_app(app):
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
-        os.makedirs(Config.DOWNLOAD_FOLDER, exist_ok=True)
\ No newline at end of file
+        os.makedirs(Config.DOWNLOAD_FOLDER, exist_ok=True)
+
+        # Validation: Log warning if credentials are missing
+        if not Config.INSTAGRAM_USERNAME:
+            logging.getLogger(__name__).warning("Instagram username not found in environment variables!")
\ No newline at end of file
@@ -3,6 +3,24 @@ from datetime import datetime
 
 db = SQLAlchemy()
 
+# ====================================================================
+# Column Types
+# ====================================================================
+# Sentiment labels are stored as a SMALLINT code instead of repeating the string on every row
+SENTIMENT_CODES = {'Negative': -1, 'Neutral': 0, 'Positive': 1}
+SENTIMENT_LABELS = {code: label for label, code in SENTIMENT_CODES.items()}
+
+class SentimentLabel(db.TypeDecorator):
+    """'Positive'/'Neutral'/'Negative' <-> 1/0/-1. Anything else (e.g. 'N/A') is stored as NULL."""
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return SENTIMENT_CODES.get(value)
+
+    def process_result_value(self, value, dialect):
+        return SENTIMENT_LABELS.get(value, 'N/A')
+
 # ====================================================================
 # Instagram Scraping Models
 # ====================================================================
@@ -11,20 +29,39 @@ class InstagramScrape(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     shortcode = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow) # bumped when incremental re-scrapes merge in
+
+    # Incremental re-scrape state
+    engine = db.Column(db.String(20)) # 'instagrapi', 'instaloader'
+    next_cursor = db.Column(db.Text) # where paging stopped, for resuming older comments
+    newest_comment_at = db.Column(db.DateTime) # watermark: newest stored comment time (UTC)
     
     # Relationship to comments
     comments = db.relationship('InstagramComment', backref='scrape', cascade="all, delete-orphan")
+    sentiment_rollup = db.relationship('ScrapeSentimentRollup', cascade="all, delete-orphan")
+
+    __table_args__ = (
+        db.Index('ix_instagram_scrape_shortcode_created_at', 'shortcode', 'created_at'),
+    )
 
 class InstagramComment(db.Model):
     __tablename__ = 'instagram_comment'
     id = db.Column(db.Integer, primary_key=True)
     scrape_id = db.Column(db.Integer, db.ForeignKey('instagram_scrape.id'), nullable=False)
+    ig_comment_id = db.Column(db.String(64)) # Instagram comment pk
     username = db.Column(db.String(255))
     text = db.Column(db.Text, nullable=False)
-    sentiment = db.Column(db.String(50)) # 'positive', 'neutral', 'negative', 'N/A'
+    sentiment = db.Column(SentimentLabel) # 'Positive', 'Neutral', 'Negative', 'N/A'
+    sentiment_score = db.Column(db.Float) # VADER compound score, -1.0 .. 1.0
+    commented_at = db.Column(db.DateTime) # when the comment was posted (UTC)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_instagram_comment_scrape_id_id', 'scrape_id', 'id'),
+        db.Index('ix_instagram_comment_scrape_id_commented_at', 'scrape_id', 'commented_at'),
+    )
+
 # ====================================================================
 # CSV Upload Models
 # ====================================================================
@@ -32,7 +69,7 @@ class CsvUpload(db.Model):
     __tablename__ = 'csv_upload'
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Relationship to comments
     comments = db.relationship('CsvComment', backref='upload', cascade="all, delete-orphan")
@@ -43,6 +80,63 @@ class CsvComment(db.Model):
     upload_id = db.Column(db.Integer, db.ForeignKey('csv_upload.id'), nullable=False)
     username = db.Column(db.String(255))
     text = db.Column(db.Text, nullable=False)
-    sentiment = db.Column(db.String(50)) # 'positive', 'neutral', 'negative', 'N/A'
+    sentiment = db.Column(SentimentLabel) # 'Positive', 'Neutral', 'Negative', 'N/A'
+    sentiment_score = db.Column(db.Float) # VADER compound score, -1.0 .. 1.0
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_csv_comment_upload_id_id', 'upload_id', 'id'),
+    )
+
+
+# ====================================================================
+# Instagram Session Models
+# ====================================================================
+# Latest session state per account and engine, shared by every worker and kept across restarts
+# (see modules/instagram/session_store.py)
+class InstagramSession(db.Model):
+    __tablename__ = 'instagram_session'
+    account = db.Column(db.String(64), primary_key=True) # Config.instagram_accounts() name
+    engine = db.Column(db.String(20), primary_key=True) # 'instagrapi', 'instaloader'
+    data = db.Column(db.Text, nullable=False) # JSON: Instagrapi settings or Instaloader cookies
+    source_hash = db.Column(db.String(64)) # sha256 of the *_SESSION_B64 value it was seeded from
+    version = db.Column(db.Integer, nullable=False, default=1) # bumped on every save
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# ====================================================================
+# Background Job Models
+# ====================================================================
+class ScrapeJob(db.Model):
+    __tablename__ = 'scrape_job'
+    id = db.Column(db.String(32), primary_key=True) # uuid4 hex
+    shortcode = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued') # 'queued', 'running', 'done', 'failed'
+    progress = db.Column(db.Integer, nullable=False, default=0) # 0-100
+    error = db.Column(db.Text)
+    scrape_id = db.Column(db.Integer, db.ForeignKey('instagram_scrape.id'))
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Result of a finished job
+    scrape = db.relationship('InstagramScrape')
+
+
+# ====================================================================
+# Analytics Rollup Models (maintained by update_sentiment_rollups in modules/database/persistence.py)
+# ====================================================================
+class ScrapeSentimentRollup(db.Model):
+    __tablename__ = 'scrape_sentiment_rollup'
+    scrape_id = db.Column(db.Integer, db.ForeignKey('instagram_scrape.id'), primary_key=True)
+    sentiment = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ShortcodeSentimentHourly(db.Model):
+    __tablename__ = 'shortcode_sentiment_hourly'
+    shortcode = db.Column(db.String(255), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True) # comment time truncated to the hour (UTC)
+    sentiment = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    scrape_id = db.Column(db.Integer, db.ForeignKey('instagram_scrape.id')) # scrape the counts were taken from
@@ -0,0 +1,422 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from modules.configuration.config import Config
+from modules.database.models import (
+    db, InstagramScrape, InstagramComment, CsvUpload, CsvComment, ScrapeSentimentRollup, ShortcodeSentimentHourly
+)
+from modules.metrics.prometheus import stage_timer, record_db_batch
+
+#==================================== Bulk Comment Persistence =================================
+# Shared by /scrape and /analyze_upload. Rows are written in batches of Config.DB_BATCH_SIZE:
+#   - PostgreSQL: psycopg2 execute_values (one multi-row INSERT per page, no ORM objects)
+#   - Other backends: one Core insert() executed with the batch's parameter list, which
+#     SQLAlchemy renders as multi-row VALUES ("insertmanyvalues") from a single cached
+#     statement; an inline insert().values([...]) gets recompiled for every batch and
+#     measured no faster than the per-row ORM path
+# Everything runs on the session's connection, so the caller's commit/rollback still applies.
+
+# 1. Function to build the insert row for one analyzed comment dict
+def comment_row(model, parent_column, parent_id, comment, created_at):
+    row = {
+        parent_column: parent_id,
+        "username": comment.get('username', 'unknown'),
+        "text": comment.get('comment', ''),
+        "sentiment": comment.get('sentiment', 'N/A'),
+        "sentiment_score": comment.get('sentiment_score'),
+        "created_at": created_at
+    }
+    if model is InstagramComment:
+        row["ig_comment_id"] = comment.get('comment_id')
+        row["commented_at"] = _parse_datetime(comment.get('created_at'))
+    return row
+
+#-----------------------------------------------------------------------------------
+# 2. Function to bulk insert comments for one parent scrape/upload
+def bulk_insert_comments(model, parent_column, parent_id, comments, batch_size=None):
+    """
+    Inserts analyzed comment dicts into `model` (InstagramComment or CsvComment) in batches.
+    Does not commit. Returns the number of rows written.
+    """
+    batch_size = batch_size or Config.DB_BATCH_SIZE
+    created_at = datetime.utcnow()
+    # execute_values is psycopg2's; other PostgreSQL drivers (psycopg 3, pg8000) use Core executemany
+    use_execute_values = db.session.get_bind().dialect.driver == 'psycopg2'
+
+    written = 0
+    batch = []
+    for c in comments:
+        batch.append(comment_row(model, parent_column, parent_id, c, created_at))
+        if len(batch) >= batch_size:
+            written += _write_batch(model, batch, use_execute_values)
+            batch = []
+    if batch:
+        written += _write_batch(model, batch, use_execute_values)
+    return written
+
+#-----------------------------------------------------------------------------------
+# 3. Function to create a scrape row and bulk insert its comments
+def save_instagram_scrape(shortcode, comments, engine=None, cursor=None):
+    """Returns the new InstagramScrape. Commits on success, rolls back and re-raises on failure."""
+    try:
+        scrape_job = InstagramScrape(
+            shortcode=shortcode,
+            engine=engine,
+            next_cursor=cursor,
+            newest_comment_at=_newest_comment_at(comments)
+        )
+        db.session.add(scrape_job)
+        db.session.flush()
+        bulk_insert_comments(InstagramComment, 'scrape_id', scrape_job.id, comments)
+        update_sentiment_rollups(scrape_job, comments, new_snapshot=True)
+        db.session.commit()
+        return scrape_job
+    except Exception:
+        db.session.rollback()
+        raise
+
+#-----------------------------------------------------------------------------------
+# 4. Function to create an upload row and bulk insert its comments
+def save_csv_upload(filename, comments):
+    """Returns the new CsvUpload. Commits on success, rolls back and re-raises on failure."""
+    try:
+        upload_job = CsvUpload(filename=filename)
+        db.session.add(upload_job)
+        db.session.flush()
+        bulk_insert_comments(CsvComment, 'upload_id', upload_job.id, comments)
+        db.session.commit()
+        return upload_job
+    except Exception:
+        db.session.rollback()
+        raise
+
+#-----------------------------------------------------------------------------------
+# 5. Function to find the newest stored scrape of a shortcode younger than `ttl_seconds`
+def find_fresh_scrape(shortcode, ttl_seconds):
+    if not ttl_seconds or ttl_seconds <= 0:
+        return None
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl_seconds)
+    refreshed_at = db.func.coalesce(InstagramScrape.updated_at, InstagramScrape.created_at)
+    return (InstagramScrape.query
+            .filter(InstagramScrape.shortcode == shortcode, refreshed_at >= cutoff)
+            .order_by(refreshed_at.desc(), InstagramScrape.id.desc())
+            .first())
+
+#-----------------------------------------------------------------------------------
+# 6. Function to rebuild the /scrape response payload from stored rows
+def load_scrape_payload(scrape_id):
+    """Comments have the same fields as a live scrape's (see the scraper's _comment_dict)."""
+    rows = InstagramComment.query.filter_by(scrape_id=scrape_id).order_by(InstagramComment.id)
+    comments = []
+    analyzed_comments = []
+    for c in rows:
+        comment = {
+            "username": c.username,
+            "comment": c.text,
+            "comment_id": c.ig_comment_id,
+            "created_at": c.commented_at.isoformat() if c.commented_at else None
+        }
+        comments.append(comment)
+        analyzed_comments.append({**comment, "sentiment": c.sentiment, "sentiment_score": c.sentiment_score})
+    return {
+        "comments": comments,
+        "analyzed_comments": analyzed_comments,
+        "sentiment_counts": dict(Counter(c["sentiment"] for c in analyzed_comments))
+    }
+
+#-----------------------------------------------------------------------------------
+# 7. Function to find the newest stored scrape of a shortcode, regardless of age
+def find_latest_scrape(shortcode):
+    return (InstagramScrape.query
+            .filter_by(shortcode=shortcode)
+            .order_by(InstagramScrape.created_at.desc(), InstagramScrape.id.desc())
+            .first())
+
+#-----------------------------------------------------------------------------------
+# 8. Function to list stored Instagram comment ids at/after the scrape's watermark
+def known_comment_ids(scrape):
+    """Only comments tied with the watermark need deduplicating; older ones are filtered by time."""
+    query = db.session.query(InstagramComment.ig_comment_id).filter(
+        InstagramComment.scrape_id == scrape.id,
+        InstagramComment.ig_comment_id.isnot(None)
+    )
+    if scrape.newest_comment_at is not None:
+        query = query.filter(InstagramComment.commented_at >= scrape.newest_comment_at)
+    return {row[0] for row in query}
+
+#-----------------------------------------------------------------------------------
+# 9. Function to merge newly fetched comments into an existing scrape
+def merge_incremental_scrape(scrape, comments):
+    """Appends `comments` to `scrape`, advances its watermark and commits. Rolls back and re-raises on failure."""
+    try:
+        bulk_insert_comments(InstagramComment, 'scrape_id', scrape.id, comments)
+        update_sentiment_rollups(scrape, comments)
+        newest = _newest_comment_at(comments)
+        if newest is not None and (scrape.newest_comment_at is None or newest > scrape.newest_comment_at):
+            scrape.newest_comment_at = newest
+        scrape.updated_at = datetime.utcnow()
+        db.session.commit()
+        return scrape
+    except Exception:
+        db.session.rollback()
+        raise
+
+#-----------------------------------------------------------------------------------
+# 10. Function to count sentiments across every comment stored for a scrape (reads the rollup)
+def scrape_sentiment_counts(scrape_id):
+    rows = (db.session.query(ScrapeSentimentRollup.sentiment, ScrapeSentimentRollup.count)
+            .filter(ScrapeSentimentRollup.scrape_id == scrape_id))
+    return {sentiment: count for sentiment, count in rows if count}
+
+#-----------------------------------------------------------------------------------
+# 11. Functions to stream stored comments for export without loading them all
+# yield_per keeps a server-side cursor open (psycopg2 named cursor) and fetches in batches
+SCRAPE_EXPORT_COLUMNS = ["username", "comment", "sentiment", "sentiment_score", "comment_id", "commented_at"]
+UPLOAD_EXPORT_COLUMNS = ["username", "comment", "sentiment", "sentiment_score"]
+
+def iter_scrape_rows(scrape_id, batch_size=None):
+    query = (db.select(InstagramComment.username, InstagramComment.text, InstagramComment.sentiment,
+                       InstagramComment.sentiment_score, InstagramComment.ig_comment_id,
+                       InstagramComment.commented_at)
+             .where(InstagramComment.scrape_id == scrape_id)
+             .order_by(InstagramComment.id)
+             .execution_options(yield_per=batch_size or Config.DB_BATCH_SIZE))
+    for row in db.session.execute(query):
+        yield tuple(row)
+
+def iter_upload_rows(upload_id, batch_size=None):
+    query = (db.select(CsvComment.username, CsvComment.text, CsvComment.sentiment, CsvComment.sentiment_score)
+             .where(CsvComment.upload_id == upload_id)
+             .order_by(CsvComment.id)
+             .execution_options(yield_per=batch_size or Config.DB_BATCH_SIZE))
+    for row in db.session.execute(query):
+        yield tuple(row)
+
+#==================================== Sentiment Rollups =================================
+# Pre-aggregated counts so analytics never scan instagram_comment:
+#   - scrape_sentiment_rollup:    (scrape_id, sentiment) -> count
+#   - shortcode_sentiment_hourly: (shortcode, hour, sentiment) -> count, bucketed by comment time
+# Both are updated in the same transaction that writes the comments. The hourly table follows
+# the newest scrape of each shortcode: a new scrape replaces the shortcode's buckets, and merges
+# into that scrape add to them, so re-scraping a post never double counts its comments.
+
+# 12. Function to fold freshly persisted comments into the rollups (does not commit)
+def update_sentiment_rollups(scrape, comments, new_snapshot=False):
+    per_scrape = Counter()
+    per_hour = Counter()
+    fallback_hour = _hour_bucket(scrape.created_at or datetime.utcnow())
+    for c in comments:
+        sentiment = c.get('sentiment', 'N/A')
+        per_scrape[sentiment] += 1
+        commented_at = _parse_datetime(c.get('created_at'))
+        hour = _hour_bucket(commented_at) if commented_at is not None else fallback_hour
+        per_hour[(hour, sentiment)] += 1
+
+    if per_scrape:
+        _increment_counts(ScrapeSentimentRollup, ["scrape_id", "sentiment"], [
+            {"scrape_id": scrape.id, "sentiment": sentiment, "count": count}
+            for sentiment, count in per_scrape.items()
+        ])
+
+    if new_snapshot:
+        ShortcodeSentimentHourly.query.filter_by(shortcode=scrape.shortcode).delete(synchronize_session=False)
+    elif find_latest_scrape(scrape.shortcode).id != scrape.id:
+        return # merging into an older scrape: the hourly buckets belong to a newer one
+    if per_hour:
+        _increment_counts(ShortcodeSentimentHourly, ["shortcode", "hour", "sentiment"], [
+            {"shortcode": scrape.shortcode, "hour": hour, "sentiment": sentiment, "count": count, "scrape_id": scrape.id}
+            for (hour, sentiment), count in per_hour.items()
+        ])
+
+#-----------------------------------------------------------------------------------
+# 13. Function to read a shortcode's sentiment trend from the hourly rollup
+def sentiment_timeseries(shortcode, since=None, bucket='hour'):
+    """
+    Returns [{"bucket": datetime, "counts": {sentiment: n}, "total": n}, ...] oldest first.
+    bucket='day' folds the hourly rows together; cost is O(buckets), never O(comments).
+    """
+    query = (db.session.query(ShortcodeSentimentHourly.hour, ShortcodeSentimentHourly.sentiment,
+                              ShortcodeSentimentHourly.count)
+             .filter(ShortcodeSentimentHourly.shortcode == shortcode))
+    if since is not None:
+        query = query.filter(ShortcodeSentimentHourly.hour >= since)
+
+    series = {}
+    for hour, sentiment, count in query.order_by(ShortcodeSentimentHourly.hour):
+        key = hour.replace(hour=0) if bucket == 'day' else hour
+        point = series.setdefault(key, {"bucket": key, "counts": Counter(), "total": 0})
+        point["counts"][sentiment] += count
+        point["total"] += count
+    for point in series.values():
+        point["counts"] = dict(point["counts"])
+    return list(series.values())
+
+#-----------------------------------------------------------------------------------
+# 14. Function to list a shortcode's most recent scrapes with their rolled-up counts
+def recent_scrape_rollups(shortcode, limit=10):
+    scrapes = (InstagramScrape.query
+               .filter_by(shortcode=shortcode)
+               .order_by(InstagramScrape.created_at.desc(), InstagramScrape.id.desc())
+               .limit(limit)
+               .all())
+    counts = {s.id: {} for s in scrapes}
+    rows = (db.session.query(ScrapeSentimentRollup.scrape_id, ScrapeSentimentRollup.sentiment,
+                             ScrapeSentimentRollup.count)
+            .filter(ScrapeSentimentRollup.scrape_id.in_(list(counts))))
+    for scrape_id, sentiment, count in rows:
+        counts[scrape_id][sentiment] = count
+    return [
+        {
+            "scrape_id": s.id,
+            "created_at": s.created_at.isoformat() if s.created_at else None,
+            "updated_at": s.updated_at.isoformat() if s.updated_at else None,
+            "sentiment_counts": counts[s.id]
+        }
+        for s in scrapes
+    ]
+
+#-----------------------------------------------------------------------------------
+# 15. Function to rebuild every rollup from stored comments (one-off backfill for old data)
+def rebuild_sentiment_rollups():
+    """Full scan of instagram_comment; use `flask --app app rebuild-rollups`. Commits."""
+    try:
+        ShortcodeSentimentHourly.query.delete(synchronize_session=False)
+        ScrapeSentimentRollup.query.delete(synchronize_session=False)
+
+        per_scrape = (db.session.query(InstagramComment.scrape_id, InstagramComment.sentiment,
+                                       db.func.count(InstagramComment.id))
+                      .group_by(InstagramComment.scrape_id, InstagramComment.sentiment))
+        rows = [{"scrape_id": scrape_id, "sentiment": sentiment or 'N/A', "count": count}
+                for scrape_id, sentiment, count in per_scrape]
+        if rows:
+            _increment_counts(ScrapeSentimentRollup, ["scrape_id", "sentiment"], rows)
+
+        latest_ids = (db.session.query(db.func.max(InstagramScrape.id))
+                      .group_by(InstagramScrape.shortcode))
+        latest = InstagramScrape.query.filter(InstagramScrape.id.in_(latest_ids)).all()
+        for scrape in latest:
+            fallback_hour = _hour_bucket(scrape.created_at or datetime.utcnow())
+            per_hour = Counter()
+            query = (db.select(InstagramComment.commented_at, InstagramComment.sentiment)
+                     .where(InstagramComment.scrape_id == scrape.id)
+                     .execution_options(yield_per=Config.DB_BATCH_SIZE))
+            for commented_at, sentiment in db.session.execute(query):
+                hour = _hour_bucket(commented_at) if commented_at is not None else fallback_hour
+                per_hour[(hour, sentiment or 'N/A')] += 1
+            if per_hour:
+                _increment_counts(ShortcodeSentimentHourly, ["shortcode", "hour", "sentiment"], [
+                    {"shortcode": scrape.shortcode, "hour": hour, "sentiment": sentiment, "count": count, "scrape_id": scrape.id}
+                    for (hour, sentiment), count in per_hour.items()
+                ])
+        db.session.commit()
+        return len(latest)
+    except Exception:
+        db.session.rollback()
+        raise
+
+#-----------------------------------------------------------------------------------
+# 16. Function to score stored comments that have no sentiment_score (rows that predate the column)
+def backfill_sentiment_scores(batch_size=None):
+    """
+    Uses the current sentiment model; use `flask --app app backfill-scores`. Labels stay as
+    stored, so history keeps the label it was shown with. Commits per batch, so an interrupted
+    run resumes where it stopped. Returns the number of comments scored.
+    """
+    from modules.analysis.sentiment import analyze_sentiment_scores
+
+    batch_size = batch_size or Config.DB_BATCH_SIZE
+    scored = 0
+    for model in (InstagramComment, CsvComment):
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(model.id, model.text)
+                .where(model.sentiment_score.is_(None), model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            scores = analyze_sentiment_scores([text for _, text in rows])
+            db.session.execute(db.update(model), [
+                {"id": row_id, "sentiment_score": score} for (row_id, _), score in zip(rows, scores)
+            ])
+            db.session.commit()
+            scored += len(rows)
+            last_id = rows[-1].id
+    return scored
+
+#-----------------------------------------------------------------------------------
+# Helper to add counts to rollup rows, inserting the ones that do not exist yet
+# Backends with INSERT .. ON CONFLICT DO UPDATE; the rest take the ORM read-modify-write path
+UPSERT_DIALECTS = ('postgresql', 'sqlite')
+
+def _increment_counts(model, key_columns, rows):
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in UPSERT_DIALECTS:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        updates = {"count": table.c.count + stmt.excluded.count}
+        if "scrape_id" in table.c and "scrape_id" not in key_columns:
+            updates["scrape_id"] = stmt.excluded.scrape_id
+        db.session.execute(stmt.on_conflict_do_update(index_elements=key_columns, set_=updates), rows)
+        return
+
+    # Other backends: read-modify-write through the ORM
+    for row in rows:
+        existing = db.session.get(model, tuple(row[c] for c in key_columns))
+        if existing is None:
+            db.session.add(model(**row))
+        else:
+            existing.count += row["count"]
+    db.session.flush()
+
+def _hour_bucket(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+#-----------------------------------------------------------------------------------
+# Helpers for comment timestamps (scraper emits naive UTC ISO strings)
+def _parse_datetime(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def _newest_comment_at(comments):
+    timestamps = [t for t in (_parse_datetime(c.get('created_at')) for c in comments) if t is not None]
+    return max(timestamps) if timestamps else None
+
+#-----------------------------------------------------------------------------------
+# Helper to write one batch with the fastest path the backend supports
+def _write_batch(model, rows, use_execute_values):
+    record_db_batch(model.__tablename__, len(rows))
+    with stage_timer('db_batch_insert'):
+        _execute_batch(model, rows, use_execute_values)
+    return len(rows)
+
+def _execute_batch(model, rows, use_execute_values):
+    if use_execute_values:
+        from psycopg2.extras import execute_values
+        columns = list(rows[0].keys())
+        sql = f"INSERT INTO {model.__tablename__} ({', '.join(columns)}) VALUES %s"
+        # Raw DBAPI path: apply column types ourselves (e.g. sentiment label -> smallint code)
+        dialect = db.session.get_bind().dialect
+        processors = [model.__table__.c[c].type.bind_processor(dialect) for c in columns]
+        values = [
+            tuple(p(r[c]) if p else r[c] for c, p in zip(columns, processors))
+            for r in rows
+        ]
+        cursor = db.session.connection().connection.cursor()
+        try:
+            execute_values(cursor, sql, values, page_size=len(rows))
+        finally:
+            cursor.close()
+    else:
+        db.session.execute(model.__table__.insert(), rows)
@@ -0,0 +1,2 @@
+from modules.export.writers import EXPORT_FORMATS, negotiate_format, stream_export, stream_csv
+from modules.export.compact import columnar, dumps, negotiate_encoding, compress
@@ -0,0 +1,69 @@
+import gzip
+import importlib.util
+import json
+from modules.configuration.config import Config
+
+#==================================== Compact Response Encoding =================================
+# Smaller, faster-to-parse JSON for the row-heavy /scrape and /analyze_upload responses:
+# rows become one columnar table with repetitive columns dictionary-encoded, the body is
+# serialized with orjson when it is installed, and compressed as the client's Accept-Encoding allows.
+
+# Columns whose values repeat a lot: sent once in "dictionaries", rows carry indexes into them
+DICTIONARY_COLUMNS = ("username", "sentiment")
+
+_HAS_ORJSON = importlib.util.find_spec('orjson') is not None
+_HAS_BROTLI = importlib.util.find_spec('brotli') is not None
+
+# 1. Function to turn a list of row dicts into a columnar table
+def columnar(records, dictionary_columns=DICTIONARY_COLUMNS):
+    """
+    Returns {"length": n, "columns": {name: [values...]}, "dictionaries": {name: [distinct values...]}}.
+    Every column holds one value per row (None where a row lacks the key); for the
+    dictionary columns that value is an index into dictionaries[name], so row i of
+    "username" is dictionaries["username"][columns["username"][i]].
+    """
+    names = {}
+    for record in records:
+        names.update(dict.fromkeys(record))
+    columns = {name: [record.get(name) for record in records] for name in names}
+
+    dictionaries = {}
+    for name in dictionary_columns:
+        if name not in columns:
+            continue
+        index = {}
+        columns[name] = [index.setdefault(value, len(index)) for value in columns[name]]
+        dictionaries[name] = list(index)
+    return {"length": len(records), "columns": columns, "dictionaries": dictionaries}
+
+#-----------------------------------------------------------------------------------
+# 2. Function to serialize a payload to UTF-8 JSON bytes (orjson when available, else json)
+def dumps(payload):
+    if _HAS_ORJSON:
+        import orjson
+        return orjson.dumps(payload, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+#-----------------------------------------------------------------------------------
+# 3. Function to pick a Content-Encoding from the request's Accept-Encoding ('br', 'gzip' or None)
+def negotiate_encoding(accept_encodings):
+    """`accept_encodings` is werkzeug's request.accept_encodings; brotli is only offered if installed."""
+    if not Config.RESPONSE_COMPRESSION:
+        return None
+    gzip_quality = accept_encodings.quality('gzip')
+    if _HAS_BROTLI:
+        br_quality = accept_encodings.quality('br')
+        if br_quality > 0 and br_quality >= gzip_quality:
+            return 'br'
+    return 'gzip' if gzip_quality > 0 else None
+
+#-----------------------------------------------------------------------------------
+# 4. Function to compress a body with the negotiated encoding
+def compress(body, encoding):
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body, quality=Config.RESPONSE_BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output identical for identical bodies
+        return gzip.compress(body, compresslevel=Config.RESPONSE_GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
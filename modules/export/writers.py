@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+#==================================== Streaming Export Writers =================================
+# Writers take a column list and an iterable of row tuples and yield encoded chunks, so a
+# Flask Response can stream an export without ever holding the whole result in memory.
+
+# Supported formats: name -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "csv.gz": ("application/gzip", "csv.gz"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Accept header values mapped to format names
+_ACCEPT_TYPES = {
+    "text/csv": "csv",
+    "application/gzip": "csv.gz",
+    "application/x-ndjson": "ndjson",
+    "application/vnd.apache.parquet": "parquet",
+    "application/parquet": "parquet",
+}
+
+# 1. Function to pick an export format from an explicit name or the Accept header
+def negotiate_format(requested=None, accept_mimetypes=None, default="csv"):
+    """
+    `requested` (e.g. ?format=parquet) wins; otherwise the best Accept match is used.
+    Returns the format name, or None if `requested` is not supported.
+    """
+    if requested:
+        requested = requested.lower()
+        aliases = {"gzip": "csv.gz", "csv_gz": "csv.gz", "jsonl": "ndjson"}
+        requested = aliases.get(requested, requested)
+        return requested if requested in EXPORT_FORMATS else None
+    if accept_mimetypes is not None:
+        best = accept_mimetypes.best_match(list(_ACCEPT_TYPES))
+        # Only honour types the client listed explicitly, not ones matched through */*
+        if best and best in accept_mimetypes.values():
+            return _ACCEPT_TYPES[best]
+    return default
+
+#-----------------------------------------------------------------------------------
+# 2. Function to stream rows in the given format
+def stream_export(fmt, columns, rows):
+    if fmt == "csv":
+        return _encode(stream_csv(columns, rows))
+    if fmt == "csv.gz":
+        return stream_gzip(_encode(stream_csv(columns, rows)))
+    if fmt == "ndjson":
+        return _encode(stream_ndjson(columns, rows))
+    if fmt == "parquet":
+        return stream_parquet(columns, rows)
+    raise ValueError(f"Unsupported export format '{fmt}'")
+
+#-----------------------------------------------------------------------------------
+# 3. Function to stream rows as CSV text, flushing every `chunk_rows` rows
+def stream_csv(columns, rows, chunk_rows=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    yield buffer.getvalue()
+
+#-----------------------------------------------------------------------------------
+# 4. Function to stream rows as newline-delimited JSON objects
+def stream_ndjson(columns, rows, chunk_rows=1000):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default))
+        if len(lines) >= chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+#-----------------------------------------------------------------------------------
+# 5. Function to gzip a byte stream on the fly
+def stream_gzip(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+#-----------------------------------------------------------------------------------
+# 6. Function to stream rows as Parquet, one row group per chunk
+def stream_parquet(columns, rows, chunk_rows=50000):
+    """
+    Requires pyarrow. `sentiment` and `username` are dictionary encoded (they repeat heavily).
+    Columns holding datetimes become timestamps, floats stay floats, everything else is stored as strings.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    chunk = []
+
+    def flush(chunk):
+        nonlocal writer, schema
+        if schema is None:
+            schema = _parquet_schema(pa, columns, chunk)
+            dictionary_columns = [c for c in ("sentiment", "username") if c in columns]
+            writer = pq.ParquetWriter(sink, schema, compression="zstd", use_dictionary=dictionary_columns)
+        arrays = []
+        for i, field in enumerate(schema):
+            values = [row[i] for row in chunk]
+            if pa.types.is_timestamp(field.type):
+                values = [v if isinstance(v, datetime) else None for v in values]
+            elif pa.types.is_floating(field.type):
+                values = [v if isinstance(v, (int, float)) else None for v in values]
+            else:
+                values = [None if v is None else str(v) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            flush(chunk)
+            chunk = []
+            yield sink.drain()
+    if chunk or writer is None:
+        flush(chunk)
+    writer.close()
+    yield sink.drain()
+
+#==================================== Helper Functions =================================
+# Helper to encode text chunks as UTF-8 bytes
+def _encode(chunks):
+    for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _parquet_schema(pa, columns, sample):
+    fields = []
+    for i, name in enumerate(columns):
+        values = [row[i] for row in sample if row[i] is not None]
+        if values and all(isinstance(v, datetime) for v in values):
+            field_type = pa.timestamp("us")
+        elif values and all(isinstance(v, float) for v in values):
+            field_type = pa.float64()
+        else:
+            field_type = pa.string()
+        fields.append(pa.field(name, field_type))
+    return pa.schema(fields)
+
+# Write-only file object that hands back whatever has been written since the last drain
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
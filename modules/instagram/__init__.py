@@ -1,3 +1,16 @@
-from modules.instagram.scraper import InstagramScraper
+# Public names load their submodule on first use (PEP 562), so importing one submodule,
+# e.g. modules.instagram.engine_health, does not pull in the scraper and the pool
+import importlib
 
-print("Instagram scraper module imported successfully")
\ No newline at end of file
+_EXPORTS = {
+    'InstagramScraper': 'modules.instagram.scraper',
+    'is_rate_limit_error': 'modules.instagram.scraper',
+    'InstagramSessionPool': 'modules.instagram.session_pool',
+}
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
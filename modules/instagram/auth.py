@@ -1,111 +1,112 @@
-import os
 import logging
 import base64
 import json
-import tempfile
+import pickle
 from modules.configuration.config import Config
+from modules.instagram.session_store import resolve_session, env_fingerprint
 
 logger = logging.getLogger(__name__)
 
 #======================================HELPER FUNCTION======================================
-# Helper to decode session from environment variable
-def decode_session_from_env(env_var_name):
-    """
-    Decode session from base64 environment variable.
-    Example: INSTAGRAPI_SESSION_B64
-    Returns: dict (session data) or None
-    """
-    env_value = os.environ.get(env_var_name)
-    if not env_value:
-        logger.warning(f"Environment variable {env_var_name} not found")
+# Helper to decode an Instaloader session from environment variable: a pickled cookie dict,
+# as written by Instaloader.save_session_to_file(). Only for the operator-set variable; sessions
+# sent over the API are plain JSON (see parse_session_json), since unpickling runs arbitrary code
+def decode_instaloader_session(env_value):
+    try:
+        cookies = pickle.loads(base64.b64decode(env_value))
+        return dict(cookies)
+    except Exception as e:
+        logger.warning(f"Failed to decode Instaloader session: {e}")
         return None
-    
+
+# Helper to decode an Instagrapi session from environment variable: base64 of the settings JSON
+def decode_instagrapi_session(env_value):
     try:
-        decoded = base64.b64decode(env_value).decode('utf-8')
-        session_data = json.loads(decoded)
-        logger.info(f"Session decoded from {env_var_name}")
-        return session_data
+        return json.loads(base64.b64decode(env_value).decode('utf-8'))
     except Exception as e:
-        logger.error(f"Failed to decode session from {env_var_name}: {e}")
+        logger.error(f"Failed to decode Instagrapi session: {e}")
         return None
 
 #==========================================================================================
 #                                  INSTALOADER
 #==========================================================================================
 # 1. Function to load session
-def load_instaloader_session(L, username):
+def load_instaloader_session(L, username, env_var_name='INSTALOADER_SESSION_B64', store=None, account='default'):
     """
-    READ-ONLY: Attempts to load an existing Instaloader session.
-    Only decodes from the INSTALOADER_SESSION_B64 environment variable.
-    Returns: bool (Success)
+    Attempts to load an existing Instaloader session, in memory.
+    Takes the account's stored session (see session_store.py) unless the given environment
+    variable (INSTALOADER_SESSION_B64 by default) changed since it was stored.
+    Returns: StoredSession that was loaded, or None
     """
-    logger.info("--- Loading Instaloader Session ---")
+    logger.info(f"--- Loading Instaloader Session ({env_var_name}) ---")
     try:
         L.context.user_agent = Config.USER_AGENT
-
-        # Decode environment variable
-        session_b64 = os.environ.get('INSTALOADER_SESSION_B64')
-        if session_b64:
-            tmp_path = None
-            try:
-                session_bytes = base64.b64decode(session_b64)
-                with tempfile.NamedTemporaryFile(delete=False, suffix='_il_session') as tmp:
-                    tmp.write(session_bytes)
-                    tmp_path = tmp.name
-                logger.info("Loading Instaloader session from environment variable...")
-                L.load_session_from_file(username, tmp_path)
-                logger.info("Instaloader session loaded from environment variable.")
-                return True
-            except Exception as e:
-                logger.warning(f"Failed to load Instaloader session from env var: {e}")
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-
-        logger.warning(f"No INSTALOADER_SESSION_B64 found in environment.")
-        return False
+        session = resolve_session(store, account, 'instaloader', env_var_name, decode_instaloader_session)
+        if session is None:
+            return None
+        apply_instaloader_session(L, username, session.data)
+        logger.info("Instaloader session loaded.")
+        return session
 
     except Exception as e:
         logger.warning(f"Instaloader Load Failed: {e}")
-        return False
+        return None
+
+# 2. Function to put a cookie dict into an Instaloader instance
+def apply_instaloader_session(L, username, cookies):
+    L.load_session(username, cookies)
 
 #==========================================================================================
 #                                  INSTAGRAPI
 #==========================================================================================
 # 1. Function to load session
-def load_instagrapi_session(cl):
+def load_instagrapi_session(cl, env_var_name='INSTAGRAPI_SESSION_B64', store=None, account='default'):
     """
-    READ-ONLY: Attempts to load an existing Instagrapi session.
-    Only decodes from the INSTAGRAPI_SESSION_B64 environment variable.
-    Returns: bool (Success)
+    Attempts to load an existing Instagrapi session, in memory.
+    Takes the account's stored session (see session_store.py) unless the given environment
+    variable (INSTAGRAPI_SESSION_B64 by default) changed since it was stored.
+    Returns: StoredSession that was loaded, or None
     """
-    logger.info("--- Loading Instagrapi Session ---")
+    logger.info(f"--- Loading Instagrapi Session ({env_var_name}) ---")
     try:
-        # Decode environment variable
-        session_from_env = decode_session_from_env('INSTAGRAPI_SESSION_B64')
-        if session_from_env:
-            tmp_path = None
-            try:
-                # Write to a proper temp file and guarantee cleanup
-                with tempfile.NamedTemporaryFile(mode='w', suffix='_ig_session.json',
-                                                 delete=False) as tmp:
-                    json.dump(session_from_env, tmp)
-                    tmp_path = tmp.name
-                logger.info("Loading Instagrapi session from environment variable...")
-                cl.load_settings(tmp_path)
-                logger.info("Instagrapi session loaded from environment variable.")
-                return True
-            except Exception as e:
-                logger.warning(f"Failed to load Instagrapi session from env var: {e}")
-            finally:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-
-        logger.warning("No INSTAGRAPI_SESSION_B64 found in environment.")
-        return False
+        session = resolve_session(store, account, 'instagrapi', env_var_name, decode_instagrapi_session)
+        if session is None:
+            return None
+        apply_instagrapi_session(cl, session.data)
+        logger.info("Instagrapi session loaded.")
+        return session
 
     except Exception as e:
         logger.error(f"Instagrapi Load Failed: {e}")
-        return False
+        return None
+
+# 2. Function to put a settings dict into an Instagrapi client
+def apply_instagrapi_session(cl, settings):
+    cl.set_settings(settings)
 
+#==========================================================================================
+#                                  SESSION STORE
+#==========================================================================================
+# 1. Function to check a session sent over the API (plain JSON, never pickled)
+def parse_session_json(engine, value):
+    """
+    Instagrapi takes its settings dict, or base64 of the settings JSON (the env variable format);
+    Instaloader takes its cookie dict, {"sessionid": "...", "csrftoken": "...", ...}, with string
+    names and values. Returns the session data, or None if `value` is not in that shape.
+    """
+    if engine == 'instagrapi':
+        data = decode_instagrapi_session(value) if isinstance(value, str) else value
+        return data if isinstance(data, dict) and data else None
+    if not isinstance(value, dict) or not value:
+        return None
+    if not all(isinstance(k, str) and isinstance(v, str) for k, v in value.items()):
+        return None
+    return dict(value)
 
+# 2. Function to put a new session into the store
+def store_session(store, account, engine, data):
+    """
+    Saves `data` (from parse_session_json) as the account's newest session for `engine`, tied
+    to the account's current env variable so that a restart keeps it. Returns the stored version.
+    """
+    return store.save(account["name"], engine, data, env_fingerprint(account[f"{engine}_env"]))
@@ -0,0 +1,400 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from types import SimpleNamespace
+from modules.configuration.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Everything InstagramScraper asks of Instagram goes through one backend per engine:
+#   Instagrapi:  media_id(shortcode) -> full media id, comments_page(media_id, params) -> raw API dict
+#   Instaloader: comments(shortcode, frozen=None) -> comment iterator, freeze(iterator) -> dict | None
+# The live backends wrap the real clients, the recording ones also save each response to
+# fixture files, and the replay ones serve those fixtures offline with simulated latency,
+# 429/5xx errors and comment volumes (Config.INSTAGRAM_BACKEND picks the mode).
+
+ENGINES = ('instagrapi', 'instaloader')
+
+# Comments per simulated Instaloader request when replaying
+INSTALOADER_REPLAY_PAGE_SIZE = 12
+
+# Comments per simulated Instagrapi page when the fixture has no recorded page to copy the size from
+INSTAGRAPI_REPLAY_PAGE_SIZE = 20
+
+#==================================== Live Backends =================================
+class InstagrapiBackend:
+    def __init__(self, client):
+        self.cl = client
+
+    def media_id(self, shortcode):
+        return self.cl.media_id(self.cl.media_pk_from_code(shortcode))
+
+    def comments_page(self, media_id, params):
+        return self.cl.private_request(f"media/{media_id}/comments/", params)
+
+
+class InstaloaderBackend:
+    def __init__(self, loader):
+        self.L = loader
+
+    def comments(self, shortcode, frozen=None):
+        from instaloader import Post
+        from instaloader.nodeiterator import FrozenNodeIterator
+
+        comments_iter = Post.from_shortcode(self.L.context, shortcode).get_comments()
+        if frozen:
+            comments_iter.thaw(FrozenNodeIterator(**frozen))
+        return comments_iter
+
+    def freeze(self, comments_iter):
+        """Resumable position of `comments_iter` as a JSON-able dict, or None if it has none."""
+        from instaloader.nodeiterator import NodeIterator
+        return comments_iter.freeze()._asdict() if isinstance(comments_iter, NodeIterator) else None
+
+#==================================== Fixture Store =================================
+# One JSON file per engine and shortcode: <fixtures dir>/<engine>/<shortcode>.json
+#   instagrapi:  {"shortcode", "media_id", "pages": [{"params", "response"}, ...]}
+#   instaloader: {"shortcode", "comments": [{"id", "username", "text", "created_at_utc"}, ...]}
+class FixtureStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path(self, engine, shortcode):
+        return os.path.join(self.directory, engine, f"{shortcode}.json")
+
+    def load(self, engine, shortcode):
+        try:
+            with open(self.path(engine, shortcode), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def shortcodes(self, engine):
+        try:
+            names = os.listdir(os.path.join(self.directory, engine))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def save(self, engine, shortcode, fixture):
+        path = self.path(engine, shortcode)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+#---------------------------------------------------------------------------------
+# 1. Function to add one Instagrapi page to a fixture (a re-recorded page replaces the old one)
+    def add_instagrapi_page(self, shortcode, media_id, params, response):
+        with self._lock:
+            fixture = self.load('instagrapi', shortcode) or {"shortcode": shortcode, "pages": []}
+            fixture["media_id"] = media_id
+            pages = [p for p in fixture["pages"] if p["params"] != params]
+            pages.append({"params": params, "response": response})
+            fixture["pages"] = pages
+            self.save('instagrapi', shortcode, fixture)
+
+# 2. Function to add Instaloader comments to a fixture (merged by comment id)
+    def add_instaloader_comments(self, shortcode, comments):
+        with self._lock:
+            fixture = self.load('instaloader', shortcode) or {"shortcode": shortcode, "comments": []}
+            merged = {c["id"]: c for c in fixture["comments"]}
+            merged.update((c["id"], c) for c in comments)
+            fixture["comments"] = list(merged.values())
+            self.save('instaloader', shortcode, fixture)
+
+#==================================== Recording Backends =================================
+class RecordingInstagrapiBackend(InstagrapiBackend):
+    def __init__(self, client, store):
+        super().__init__(client)
+        self.store = store
+        self._shortcodes = {}
+
+    def media_id(self, shortcode):
+        media_id = super().media_id(shortcode)
+        self._shortcodes[media_id] = shortcode
+        return media_id
+
+    def comments_page(self, media_id, params):
+        response = super().comments_page(media_id, params)
+        shortcode = self._shortcodes.get(media_id, media_id)
+        self.store.add_instagrapi_page(shortcode, media_id, params, response)
+        return response
+
+
+class RecordingInstaloaderBackend(InstaloaderBackend):
+    def __init__(self, loader, store):
+        super().__init__(loader)
+        self.store = store
+
+    def comments(self, shortcode, frozen=None):
+        return _RecordingIterator(super().comments(shortcode, frozen), shortcode, self.store)
+
+    def freeze(self, comments_iter):
+        # A page boundary: save what was consumed so far
+        comments_iter.flush()
+        return super().freeze(comments_iter.inner)
+
+
+# Passes comments through and buffers each one as it is consumed. The buffer is saved once
+# iteration ends (or fails), at every freeze(), and when the iterator is closed or dropped,
+# so a scrape that stops early still records what it saw without rewriting the fixture per comment.
+class _RecordingIterator:
+    def __init__(self, inner, shortcode, store):
+        self.inner = inner
+        self._iter = iter(inner)
+        self.shortcode = shortcode
+        self.store = store
+        self._buffer = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            comment = next(self._iter)
+        except BaseException:
+            self.flush()
+            raise
+        self._buffer.append({
+            "id": comment.id,
+            "username": comment.owner.username,
+            "text": comment.text,
+            "created_at_utc": comment.created_at_utc.isoformat() if comment.created_at_utc else None
+        })
+        return comment
+
+    def flush(self):
+        if self._buffer:
+            comments, self._buffer = self._buffer, []
+            self.store.add_instaloader_comments(self.shortcode, comments)
+
+    def close(self):
+        self.flush()
+
+    def __del__(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"Could not save recorded Instaloader comments for {self.shortcode}: {e}")
+
+#==================================== Replay Backends =================================
+# Simulated network conditions shared by both replay backends
+class ReplayConditions:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, rate_limit_rate='0', server_error_rate='0', seed=None,
+                 stall_rate='0', stall_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.rate_limit_rates = _per_engine_rates(rate_limit_rate)
+        self.server_error_rates = _per_engine_rates(server_error_rate)
+        # Share of requests that hang for stall_ms on top of the usual latency (a slow engine)
+        self.stall_rates = _per_engine_rates(stall_rate)
+        self.stall = stall_ms / 1000.0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        seed = Config.INSTAGRAM_REPLAY_SEED
+        return cls(
+            latency_ms=Config.INSTAGRAM_REPLAY_LATENCY_MS,
+            jitter_ms=Config.INSTAGRAM_REPLAY_JITTER_MS,
+            rate_limit_rate=Config.INSTAGRAM_REPLAY_429_RATE,
+            server_error_rate=Config.INSTAGRAM_REPLAY_5XX_RATE,
+            seed=int(seed) if seed else None,
+            stall_rate=Config.INSTAGRAM_REPLAY_STALL_RATE,
+            stall_ms=Config.INSTAGRAM_REPLAY_STALL_MS
+        )
+
+    def request(self, engine):
+        """Sleeps for one simulated round trip, then raises the engine's 429/5xx error if the dice say so."""
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            roll = self._rng.random()
+            if self._rng.random() < self.stall_rates.get(engine, 0.0):
+                delay += self.stall
+        if delay:
+            time.sleep(delay)
+
+        rate_limit = self.rate_limit_rates.get(engine, 0.0)
+        if roll < rate_limit:
+            raise _rate_limit_error(engine)
+        if roll < rate_limit + self.server_error_rates.get(engine, 0.0):
+            raise _server_error(engine)
+
+
+class _ReplayBackend:
+    engine = None
+
+    def __init__(self, store, conditions, comment_volume=0):
+        self.store = store
+        self.conditions = conditions
+        self.comment_volume = comment_volume
+        self._fixtures = {}
+        self._lock = threading.Lock()
+
+    # Fixture for a shortcode: its own recording if there is one, otherwise a stable pick among
+    # the recorded ones, so a load test can use any number of shortcodes
+    def fixture(self, shortcode):
+        with self._lock:
+            if shortcode not in self._fixtures:
+                fixture = self.store.load(self.engine, shortcode)
+                if fixture is None:
+                    recorded = self.store.shortcodes(self.engine)
+                    if not recorded:
+                        raise FileNotFoundError(
+                            f"No {self.engine} fixtures in {os.path.join(self.store.directory, self.engine)}; "
+                            "record some with INSTAGRAM_BACKEND=record first"
+                        )
+                    fixture = self.store.load(self.engine, recorded[zlib.crc32(shortcode.encode()) % len(recorded)])
+                self._fixtures[shortcode] = fixture
+            return self._fixtures[shortcode]
+
+    # Recorded comments stretched (or cut) to comment_volume, with unique ids for the repeats
+    def _scale(self, comments, id_key, copy_id):
+        if not self.comment_volume or not comments:
+            return comments
+        scaled = []
+        for i in range(self.comment_volume):
+            repeat, original = divmod(i, len(comments))
+            comment = comments[original]
+            scaled.append(copy_id(comment, int(comment[id_key]) + repeat * 10 ** 19) if repeat else comment)
+        return scaled
+
+
+class ReplayInstagrapiBackend(_ReplayBackend):
+    engine = 'instagrapi'
+
+    def __init__(self, store, conditions, comment_volume=0):
+        super().__init__(store, conditions, comment_volume)
+        self._comments = {}
+
+    def media_id(self, shortcode):
+        self.conditions.request(self.engine)
+        fixture = self.fixture(shortcode)
+        media_id = fixture.get("media_id") or f"{zlib.crc32(shortcode.encode())}_0"
+        with self._lock:
+            self._comments.setdefault(media_id, self._flatten(fixture))
+        return media_id
+
+    def comments_page(self, media_id, params):
+        self.conditions.request(self.engine)
+        comments, page_size = self._comments[media_id]
+        offset = 0
+        if params and str(params.get("max_id", "")).startswith("replay-"):
+            offset = int(params["max_id"][len("replay-"):])
+        end = offset + page_size
+        has_more = end < len(comments)
+        # Copies, because instagrapi's extract_comment() adds keys to the dicts it is given
+        return {
+            "comments": [dict(c) for c in comments[offset:end]],
+            "has_more_comments": has_more,
+            "next_max_id": f"replay-{end}" if has_more else None
+        }
+
+    def _flatten(self, fixture):
+        comments = {}
+        page_size = None
+        for page in fixture.get("pages", []):
+            page_comments = page["response"].get("comments") or []
+            page_size = page_size or len(page_comments)
+            for comment in page_comments:
+                comments.setdefault(str(comment["pk"]), comment)
+        scaled = self._scale(list(comments.values()), "pk", lambda c, pk: {**c, "pk": str(pk)})
+        return scaled, page_size or INSTAGRAPI_REPLAY_PAGE_SIZE
+
+
+class ReplayInstaloaderBackend(_ReplayBackend):
+    engine = 'instaloader'
+
+    def comments(self, shortcode, frozen=None):
+        self.conditions.request(self.engine)  # Post.from_shortcode
+        fixture = self.fixture(shortcode)
+        comments = self._scale(fixture.get("comments", []), "id", lambda c, comment_id: {**c, "id": comment_id})
+        return _ReplayCommentIterator(comments, self.conditions, (frozen or {}).get("offset", 0))
+
+    def freeze(self, comments_iter):
+        return {"offset": comments_iter.offset}
+
+
+# Yields objects shaped like instaloader's PostComment, one simulated request per page
+class _ReplayCommentIterator:
+    def __init__(self, comments, conditions, offset=0):
+        self.comments = comments
+        self.conditions = conditions
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.offset >= len(self.comments):
+            raise StopIteration
+        if self.offset and self.offset % INSTALOADER_REPLAY_PAGE_SIZE == 0:
+            self.conditions.request('instaloader')
+        comment = self.comments[self.offset]
+        self.offset += 1
+        created_at = comment.get("created_at_utc")
+        return SimpleNamespace(
+            id=int(comment["id"]),
+            owner=SimpleNamespace(username=comment["username"]),
+            text=comment["text"],
+            created_at_utc=datetime.fromisoformat(created_at) if created_at else None
+        )
+
+#==================================== Factory =================================
+# 1. Function to build the (instagrapi, instaloader) backends for Config.INSTAGRAM_BACKEND
+def create_backends(client=None, loader=None, mode=None):
+    """`client`/`loader` are the real instagrapi Client and Instaloader (unused when replaying)."""
+    mode = mode or Config.INSTAGRAM_BACKEND
+    if mode == 'live':
+        return InstagrapiBackend(client), InstaloaderBackend(loader)
+
+    store = FixtureStore(Config.INSTAGRAM_FIXTURES_DIR)
+    if mode == 'record':
+        logger.info(f"Recording Instagram responses to {store.directory}")
+        return RecordingInstagrapiBackend(client, store), RecordingInstaloaderBackend(loader, store)
+    if mode == 'replay':
+        conditions = ReplayConditions.from_config()
+        volume = Config.INSTAGRAM_REPLAY_COMMENTS
+        return ReplayInstagrapiBackend(store, conditions, volume), ReplayInstaloaderBackend(store, conditions, volume)
+    raise ValueError(f"Unknown INSTAGRAM_BACKEND '{mode}' (expected live, record or replay)")
+
+# 2. Function to list the engines a replayed scraper reports as logged in
+def replay_engines():
+    return {e.strip() for e in Config.INSTAGRAM_REPLAY_ENGINES.split(',') if e.strip()}
+
+#==================================== Helper Functions =================================
+# Helper to parse "0.1" (every engine) or "instagrapi:0.3,instaloader:0" into {engine: rate}
+def _per_engine_rates(spec):
+    spec = str(spec or '0').strip()
+    if ':' not in spec:
+        return dict.fromkeys(ENGINES, float(spec))
+    rates = dict.fromkeys(ENGINES, 0.0)
+    for part in spec.split(','):
+        engine, _, rate = part.partition(':')
+        rates[engine.strip()] = float(rate)
+    return rates
+
+# Helpers to build the error each real engine raises for a 429 / 5xx, so is_rate_limit_error(),
+# the fallback and the session pool's cooldowns react exactly as they would live
+def _rate_limit_error(engine):
+    if engine == 'instagrapi':
+        from instagrapi.exceptions import ClientThrottledError
+        return ClientThrottledError("429 Too Many Requests (replay)")
+    from instaloader.exceptions import TooManyRequestsException
+    return TooManyRequestsException("429 Too Many Requests (replay)")
+
+def _server_error(engine):
+    if engine == 'instagrapi':
+        from instagrapi.exceptions import ClientError
+        return ClientError("500 Internal Server Error (replay)")
+    from instaloader.exceptions import ConnectionException
+    return ConnectionException("500 Internal Server Error (replay)")
@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+from collections import deque
+from modules.configuration.config import Config
+from modules.metrics.prometheus import record_breaker_transition
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+#==================================== Permit Class =================================
+# Handed out by EngineBreaker.allow_request() and passed back with the outcome. Only the
+# permit of the half-open trial can close the breaker, re-open it or give the trial slot back.
+class Permit:
+    __slots__ = ('trial',)
+
+    def __init__(self, trial=False):
+        self.trial = trial
+
+#==================================== EngineBreaker Class =================================
+# Circuit breaker for one scraping engine of one account. Outcomes of the upstream requests
+# made in the last ENGINE_BREAKER_WINDOW seconds decide when to stop sending scrapes to the
+# engine (open); once the backoff expires a single trial is let through (half-open) and its
+# result closes the breaker again or re-opens it with twice the backoff.
+class EngineBreaker:
+    def __init__(self, engine, account="default"):
+        self.engine = engine
+        self.account = account
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.trips = 0 # times opened since the last successful trial (sets the backoff)
+        self.last_error = None
+        self.last_checked = 0.0 # monotonic time of the last recorded outcome (scrape or probe)
+        self._trial = None # Permit of the half-open trial in flight
+        self._outcomes = deque() # (monotonic time, ok, seconds or None), one per request
+        self._lock = threading.Lock()
+
+#---------------------------------------------------------------------------------
+# 1. Function to check, without side effects, whether a request could go through now
+    def available(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return now >= self.open_until
+            return self._trial is None
+
+#---------------------------------------------------------------------------------
+# 2. Function to ask for permission to send a request
+    def allow_request(self):
+        """Returns a Permit to pass to record_*() / release(), or None if the request must not go out."""
+        with self._lock:
+            if self.state == CLOSED:
+                return Permit()
+            if self.state == OPEN:
+                if time.monotonic() < self.open_until:
+                    return None
+                self._transition(HALF_OPEN)
+            if self._trial is not None:
+                return None
+            self._trial = Permit(trial=True)
+            return self._trial
+
+#---------------------------------------------------------------------------------
+# 3. Functions to record the outcome of a scrape or probe that allow_request() let through
+    def record_success(self, permit, seconds=None, requests=1):
+        """
+        `requests` is how many upstream requests the scrape made (each one is an outcome);
+        `seconds` is the scrape's duration; probes pass None so they don't skew latency.
+        """
+        with self._lock:
+            for _ in range(requests - 1):
+                self._add_outcome(True, None)
+            self._add_outcome(True, seconds)
+            self.last_error = None
+            # A request admitted before the breaker opened says nothing about now; only the trial counts
+            if self.state == HALF_OPEN and permit is not None and permit is self._trial:
+                logger.info(f"{self.engine} breaker ({self.account}) closed after a successful trial")
+                self._transition(CLOSED)
+                self.trips = 0
+                self._trial = None
+
+    def record_failure(self, permit, error, rate_limited=False, succeeded=0):
+        """
+        `succeeded` requests of the scrape went through before the one that failed.
+        A rate limit opens the breaker at once; other errors once the window's failure rate is too high.
+        """
+        with self._lock:
+            for _ in range(succeeded):
+                self._add_outcome(True, None)
+            now = self._add_outcome(False, None)
+            self.last_error = str(error)[:200]
+            if self.state == OPEN:
+                return
+            if self.state == HALF_OPEN:
+                if permit is not None and permit is self._trial:
+                    self._open(now)
+                return
+            if rate_limited or self._failure_rate_exceeded():
+                self._open(now)
+
+    # Gives back a half-open trial that ended without a verdict (e.g. the caller stopped paging);
+    # a permit that is not the trial's changes nothing
+    def release(self, permit):
+        with self._lock:
+            if permit is not None and permit is self._trial:
+                self._trial = None
+
+#---------------------------------------------------------------------------------
+# 4. Functions for the recent success rate and latency, used to rank engines
+    def success_rate(self):
+        """Share of successful requests in the window, or None when the window is empty."""
+        with self._lock:
+            self._expire(time.monotonic())
+            if not self._outcomes:
+                return None
+            return sum(1 for _, ok, _ in self._outcomes if ok) / len(self._outcomes)
+
+    def latency_percentiles(self):
+        """p50/p95/p99 of successful scrapes in the window, in seconds (None when there are none)."""
+        with self._lock:
+            self._expire(time.monotonic())
+            latencies = sorted(seconds for _, ok, seconds in self._outcomes if ok and seconds is not None)
+        return {f"p{p}": _percentile(latencies, p) for p in (50, 95, 99)}
+
+#---------------------------------------------------------------------------------
+# 5. Function to report the breaker for /admin/check-session
+    def status(self):
+        now = time.monotonic()
+        rate = self.success_rate()
+        latency = self.latency_percentiles()
+        with self._lock:
+            requests = len(self._outcomes)
+            return {
+                "state": self.state,
+                "open_remaining": round(max(0.0, self.open_until - now), 1) if self.state == OPEN else 0.0,
+                "trips": self.trips,
+                "window_requests": requests,
+                "success_rate": round(rate, 3) if rate is not None else None,
+                "latency_ms": {k: round(v * 1000, 1) if v is not None else None for k, v in latency.items()},
+                "last_checked_ago": round(now - self.last_checked, 1) if self.last_checked else None,
+                "last_error": self.last_error
+            }
+
+    # Callers hold self._lock for the methods below
+    def _add_outcome(self, ok, seconds):
+        now = time.monotonic()
+        self._outcomes.append((now, ok, seconds))
+        self.last_checked = now
+        self._expire(now)
+        return now
+
+    def _expire(self, now):
+        cutoff = now - Config.ENGINE_BREAKER_WINDOW
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _failure_rate_exceeded(self):
+        if len(self._outcomes) < Config.ENGINE_BREAKER_MIN_REQUESTS:
+            return False
+        failures = sum(1 for _, ok, _ in self._outcomes if not ok)
+        return failures / len(self._outcomes) >= Config.ENGINE_BREAKER_FAILURE_RATE
+
+    def _open(self, now):
+        backoff = min(Config.ENGINE_BREAKER_BASE_BACKOFF * (2 ** self.trips), Config.ENGINE_BREAKER_MAX_BACKOFF)
+        self.trips += 1
+        self.open_until = now + backoff
+        self._trial = None
+        self._transition(OPEN)
+        # Old outcomes would re-open the breaker right after a successful trial
+        self._outcomes.clear()
+        logger.warning(f"{self.engine} breaker ({self.account}) open for {backoff:.0f}s after: {self.last_error}")
+
+    def _transition(self, state):
+        self.state = state
+        record_breaker_transition(self.engine, state)
+
+#==================================== EngineProber Class =================================
+# Background thread (one per worker process) that sends a light request through every engine
+# whose breaker is ready for a half-open trial, or that has not been used for
+# ENGINE_PROBE_INTERVAL seconds, so breakers close without sacrificing a user's scrape and
+# the success rates used for ranking stay current.
+class EngineProber:
+    def __init__(self, scrapers, interval=None):
+        self.scrapers = scrapers
+        self.interval = Config.ENGINE_PROBE_INTERVAL if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = None
+
+#---------------------------------------------------------------------------------
+# 1. Functions to start and stop the probe thread
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="engine-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+#---------------------------------------------------------------------------------
+# 2. Function to probe every engine that is due once
+    def probe_once(self):
+        for scraper in self.scrapers:
+            try:
+                scraper.probe_engines(self.interval)
+            except Exception as e:
+                logger.warning(f"Engine probe failed for account {scraper.account['name']}: {e}")
+
+    def _run(self):
+        # Breakers open for at least ENGINE_BREAKER_BASE_BACKOFF, so checking more often than
+        # that or the probe interval would only spin
+        tick = max(1.0, min(self.interval, Config.ENGINE_BREAKER_BASE_BACKOFF) / 2)
+        while not self._stop.wait(tick):
+            self.probe_once()
+
+#==================================== Helper Functions =================================
+# Helper for the nearest-rank percentile of a sorted list
+def _percentile(values, p):
+    if not values:
+        return None
+    return values[max(0, -(-len(values) * p // 100) - 1)]
@@ -1,41 +1,99 @@
-import instaloader
+import base64
+import json
 import logging
 import os
+import threading
 import time
-import sys
-from instagrapi import Client
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
 from modules.configuration.config import Config
-from modules.instagram.auth import load_instaloader_session, load_instagrapi_session
+from modules.instagram.auth import (
+    load_instaloader_session, load_instagrapi_session, apply_instaloader_session, apply_instagrapi_session
+)
+from modules.instagram.session_store import StoredSession, session_digest
+from modules.instagram.backends import create_backends, replay_engines
+from modules.instagram.engine_health import EngineBreaker, CLOSED
+from modules.metrics.prometheus import stage_timer, record_engine_failure, record_fallback, record_hedge
+
+# instaloader and instagrapi are heavy to import, so they are imported where they are
+# first needed (building a scraper), not when this module is loaded
 
-# Configure Logging
-logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 logger = logging.getLogger(__name__)
 
 # Reduce verbosity of instagrapi library
 logging.getLogger("instagrapi").setLevel(logging.WARNING)
 logging.getLogger("private_request").setLevel(logging.WARNING)
 
+# Engines in fallback order; ties in the health ranking keep this order
+ENGINES = ("instagrapi", "instaloader")
+# An engine later in ENGINES must be this much cheaper (by latency/success rate) to be tried first
+ENGINE_SWITCH_MARGIN = 1.25
+# Comments per Instaloader GraphQL request (instaloader's NodeIterator page length), used to
+# count the requests a scrape made for the engine's breaker
+INSTALOADER_PAGE_LENGTH = 12
+
+# Threads for hedged scrapes, created on first use so forked workers each get their own
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
 #==================================== InstagramScraper Class =================================
 class InstagramScraper:
-    def __init__(self):
-        # 1. Initialize Instaloader (Primary)
-        # Prevent 429 rate limits from triggering infinite 30-minute sleeps that lock up Flask workers
-        self.L = instaloader.Instaloader(
-            max_connection_attempts=1,
-            fatal_status_codes=[429, 400, 401, 403, 404, 500, 502, 503, 504]
-        )
-        # User Agent is now set inside authenticate_instaloader
-        
-        # 2. Initialize Instagrapi (Fallback)
-        self.cl = Client()
+    def __init__(self, account=None, session_store=None):
+        # Account whose sessions this scraper uses (see Config.instagram_accounts); default is the primary pair
+        self.account = account or Config.instagram_accounts()[0]
+        self.replay = Config.INSTAGRAM_BACKEND == 'replay'
+        # Where sessions are loaded from and refreshed state is saved to (see session_store.py);
+        # None reads the *_SESSION_B64 variables only. Replayed sessions are never stored.
+        self.session_store = None if self.replay else session_store
+        self.L = None
+        self.cl = None
+
+        # Replay mode serves recorded fixtures (see backends.py) and needs no real clients
+        if not self.replay:
+            import instaloader
+            from instagrapi import Client
+
+            # 1. Initialize Instaloader (Primary)
+            # Prevent 429 rate limits from triggering infinite 30-minute sleeps that lock up Flask workers
+            self.L = instaloader.Instaloader(
+                max_connection_attempts=1,
+                fatal_status_codes=[429, 400, 401, 403, 404, 500, 502, 503, 504]
+            )
+            # User Agent is now set inside authenticate_instaloader
+
+            # 2. Initialize Instagrapi (Fallback)
+            self.cl = Client()
+
+        # 3. Where requests go: the real clients, the clients plus a fixture recorder, or fixtures only
+        self.instagrapi, self.instaloader = create_backends(self.cl, self.L)
         
-        # 3. State to track which method is active/logged in
-        self.instaloader_active = False
-        self.instagrapi_active = False
+        # 4. Per engine: whether its session loaded, and a circuit breaker tracking its recent health
+        self.logged_in = {engine: False for engine in ENGINES}
+        self.breakers = {engine: EngineBreaker(engine, self.account["name"]) for engine in ENGINES}
+        # Post the background probe checks engines against when ENGINE_PROBE_SHORTCODE is unset
+        self.last_shortcode = None
+        # Loaded session per engine (StoredSession), the digest of its last saved state, and when
+        # the store was last checked for sessions other workers saved
+        self.sessions = {engine: None for engine in ENGINES}
+        self._saved_digests = {}
+        self._synced_at = time.monotonic()
+        self._sync_lock = threading.Lock()
         
-        # 4. Setup session
+        # 5. Setup session
         self.setup_session()
 
+    # An engine is active while its session is loaded and its breaker lets requests through
+    @property
+    def instagrapi_active(self):
+        return self.engine_available("instagrapi")
+
+    @property
+    def instaloader_active(self):
+        return self.engine_available("instaloader")
+
+    def engine_available(self, engine):
+        return self.logged_in[engine] and self.breakers[engine].available()
+
 #---------------------------------------------------------------------------------
 # 1. Function to setup session
     def setup_session(self):
@@ -48,72 +106,646 @@ class InstagramScraper:
         self._init_instagrapi_session()
         self._init_instaloader_session()   # always init — not just on Instagrapi failure
 
-        if not self.instagrapi_active and not self.instaloader_active:
+        if not any(self.logged_in.values()):
             logger.error("CRITICAL: All login methods failed.")
 
 #---------------------------------------------------------------------------------
 # 2. Function to initialize Instaloader session
     def _init_instaloader_session(self):
-        username = Config.INSTAGRAM_USERNAME
+        if self.replay:
+            self.logged_in["instaloader"] = 'instaloader' in replay_engines()
+            return
+        username = self.account["username"]
 
-        self.instaloader_active = load_instaloader_session(self.L, username)
+        session = load_instaloader_session(
+            self.L, username, self.account["instaloader_env"], self.session_store, self.account["name"]
+        )
+        self._set_session("instaloader", session)
 
 #---------------------------------------------------------------------------------
 # 3. Function to initialize Instagrapi session
     def _init_instagrapi_session(self):
-        self.instagrapi_active = load_instagrapi_session(self.cl)
+        if self.replay:
+            self.logged_in["instagrapi"] = 'instagrapi' in replay_engines()
+            return
+        session = load_instagrapi_session(self.cl, self.account["instagrapi_env"], self.session_store, self.account["name"])
+        self._set_session("instagrapi", session)
+
+    def _set_session(self, engine, session):
+        self.sessions[engine] = session
+        self._saved_digests[engine] = session_digest(session.data) if session else None
+        self.logged_in[engine] = session is not None
 
 #---------------------------------------------------------------------------------
 # 4. Function to scrape comments
     def scrape_comments(self, shortcode, retry=True):
         """
         Hybrid Scraping:
-        1. Try Instagrapi (Primary).
-        2. If it fails, try Instaloader (Fallback).
-        Only self-heal if session fails DURING scraping, not if it failed during setup.
+        1. Try the healthiest engine (Instagrapi unless its recent record is worse).
+        2. If it fails, try the other one.
+        Failures feed each engine's circuit breaker, which takes an unhealthy engine out of
+        rotation until a trial request (usually the background probe) succeeds again.
         """
-        comments = []
-        
-        # --- Attempt 1: Instagrapi (Primary) ---
-        if self.instagrapi_active:
+        return self.fetch_comments(shortcode)["comments"]
+
+#---------------------------------------------------------------------------------
+# 5. Function to scrape comments with engine/cursor metadata, optionally only new ones
+    def fetch_comments(self, shortcode, since=None, known_ids=None):
+        """
+        Same hybrid engine order as scrape_comments, but returns
+        {"comments": [...], "engine": "instagrapi" | "instaloader", "cursor": str | None}.
+        Each comment dict also carries "comment_id" and "created_at" (naive UTC ISO string).
+
+        Incremental mode (since set): only comments created at/after `since` whose id is not
+        in `known_ids` are kept, and paging stops at the first page with nothing new.
+        `cursor` is where paging stopped (Instagrapi only), for resuming older pages later.
+        """
+        known_ids = set(known_ids or ())
+        self.sync_sessions()
+        order = self._engine_order()
+        if Config.SCRAPE_HEDGE_ENABLED and len(order) > 1:
+            return self._fetch_hedged(order, shortcode, since, known_ids)
+
+        last_error = None
+        for engine in order:
+            # Half-open breakers let one trial through; another thread may already hold it
+            permit = self.breakers[engine].allow_request()
+            if permit is None:
+                continue
+            if engine == "instaloader":
+                record_fallback(_fallback_reason(order, last_error is not None))
             try:
-                logger.info(f"Scraping {shortcode} using Instagrapi (Primary)...")
-                media_pk = self.cl.media_pk_from_code(shortcode)
-                comments_objs = self.cl.media_comments(media_pk, amount=Config.MAX_COMMENTS)
-                
-                for comment in comments_objs:
-                    comments.append({
-                        "username": comment.user.username,
-                        "comment": comment.text
-                    })
-                logger.info(f"Instagrapi scraped {len(comments)} comments.")
-                return comments
+                return self._attempt(engine, permit, shortcode, since, known_ids)
             except Exception as e:
-                 logger.warning(f"Instagrapi failed during scrape: {e}.")
-                 self.instagrapi_active = False
-        
-        if not self.instagrapi_active:
-             logger.info("Primary Instagrapi is inactive. Using Fallback...")
-        
-        # --- Attempt 2: Instaloader (Fallback) ---
-        if self.instaloader_active:
+                last_error = e
+
+        if last_error is not None:
+            raise last_error
+        logger.error("CRITICAL: No active session available for scraping")
+        raise Exception("All scraping methods failed - no active session")
+
+    # Hedged variant: the second engine starts once the first has been slower than its usual p95
+    def _fetch_hedged(self, order, shortcode, since, known_ids):
+        primary, secondary = order[0], order[1]
+        permit = self.breakers[primary].allow_request()
+        if permit is None:
+            return self._fetch_with_secondary(order, shortcode, since, known_ids)
+
+        cancelled = threading.Event()
+        executor = _hedge_executor()
+        pending = {executor.submit(self._attempt, primary, permit, shortcode, since, known_ids, cancelled): primary}
+        secondary_started = False
+        hedged = False
+        last_error = None
+
+        def start_secondary(reason):
+            secondary_permit = self.breakers[secondary].allow_request()
+            if secondary_permit is not None:
+                if secondary == "instaloader":
+                    record_fallback(reason)
+                pending[executor.submit(
+                    self._attempt, secondary, secondary_permit, shortcode, since, known_ids, cancelled
+                )] = secondary
+
+        try:
+            while pending:
+                # Only the first wait is bounded: after that the secondary is running or unavailable
+                done, _ = wait(pending, timeout=None if secondary_started else self._hedge_delay(primary),
+                               return_when=FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"{primary.capitalize()} is slow on {shortcode}; hedging with {secondary}")
+                    secondary_started = hedged = True
+                    start_secondary('hedged')
+                    continue
+
+                for future in done:
+                    engine = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    if hedged:
+                        record_hedge('primary' if engine == primary else 'secondary')
+                    return result
+
+                if not secondary_started:
+                    # The primary failed outright: an ordinary fallback
+                    secondary_started = True
+                    start_secondary(_fallback_reason(order, True))
+        finally:
+            # The loser stops at its next page; a request already on the wire finishes and is discarded
+            cancelled.set()
+
+        if hedged:
+            record_hedge('none')
+        raise last_error
+
+    # Used when another thread holds the primary's half-open trial
+    def _fetch_with_secondary(self, order, shortcode, since, known_ids):
+        permit = self.breakers[order[1]].allow_request()
+        if permit is None:
+            raise Exception("All scraping methods failed - no active session")
+        if order[1] == "instaloader":
+            record_fallback(_fallback_reason(order, False))
+        return self._attempt(order[1], permit, shortcode, since, known_ids)
+
+    # Hedge delay for an engine: its recent p95 scrape time, floored, or a default without history
+    def _hedge_delay(self, engine):
+        p95 = self.breakers[engine].latency_percentiles()["p95"]
+        if p95 is None:
+            return Config.SCRAPE_HEDGE_DEFAULT_DELAY
+        return max(p95, Config.SCRAPE_HEDGE_MIN_DELAY)
+
+    # Runs one engine with the permit allow_request() gave and records the outcome on its breaker,
+    # one per upstream request, so a long scrape is not judged on its single worst page
+    def _attempt(self, engine, permit, shortcode, since, known_ids, cancelled=None):
+        breaker = self.breakers[engine]
+        fetch = self._fetch_instagrapi if engine == "instagrapi" else self._fetch_instaloader
+        requests = _RequestCount()
+        started = time.perf_counter()
+        try:
+            result = fetch(shortcode, since, known_ids, cancelled, requests)
+        except ScrapeCancelled:
+            # Lost a hedge race: no verdict on the engine
+            breaker.release(permit)
+            raise
+        except Exception as e:
+            logger.warning(f"{engine.capitalize()} failed during scrape: {e}.")
+            rate_limited = is_rate_limit_error(e)
+            record_engine_failure(engine, rate_limited)
+            breaker.record_failure(permit, e, rate_limited, succeeded=requests.ok)
+            raise
+        breaker.record_success(permit, time.perf_counter() - started, requests=max(1, requests.ok))
+        self.last_shortcode = shortcode
+        self.persist_session(engine)
+        return result
+
+    def _fetch_instagrapi(self, shortcode, since, known_ids, cancelled=None, requests=None):
+        requests = requests or _RequestCount()
+        logger.info(f"Scraping {shortcode} using Instagrapi...")
+        comments = []
+        cursor = None
+        with stage_timer('instagrapi_media_pk'):
+            media_id = self._request(lambda: self.instagrapi.media_id(shortcode))
+        requests.ok += 1
+        with stage_timer('instagrapi_fetch'):
+            for page, cursor in self._iter_instagrapi_pages(media_id):
+                requests.ok += 1
+                if cancelled is not None and cancelled.is_set():
+                    raise ScrapeCancelled(shortcode)
+                new_in_page = 0
+                for comment in page:
+                    row = _comment_dict(comment.pk, comment.user.username, comment.text, comment.created_at_utc)
+                    if _is_new(row, since, known_ids):
+                        comments.append(row)
+                        new_in_page += 1
+                if len(comments) >= Config.MAX_COMMENTS or (since is not None and new_in_page == 0):
+                    break
+        comments = comments[:Config.MAX_COMMENTS]
+        logger.info(f"Instagrapi scraped {len(comments)} comments.")
+        return {"comments": comments, "engine": "instagrapi", "cursor": cursor}
+
+    # Instaloader has no stable page cursor, so incremental mode scans up to
+    # MAX_COMMENTS comments and keeps the new ones.
+    def _fetch_instaloader(self, shortcode, since, known_ids, cancelled=None, requests=None):
+        requests = requests or _RequestCount()
+        logger.info(f"Scraping {shortcode} using Instaloader...")
+        comments = []
+        with stage_timer('instaloader_fetch'):
+            position = self._request(lambda: self.instaloader.comments(shortcode))
+            requests.ok += 1
+            for scanned, comment in enumerate(self._retrying(position), start=1):
+                # Instaloader fetches comments a GraphQL page at a time, out of our sight
+                if scanned % INSTALOADER_PAGE_LENGTH == 1:
+                    requests.ok += 1
+                if cancelled is not None and cancelled.is_set():
+                    raise ScrapeCancelled(shortcode)
+                row = _comment_dict(comment.id, comment.owner.username, comment.text, comment.created_at_utc)
+                if _is_new(row, since, known_ids):
+                    comments.append(row)
+                if len(comments) >= Config.MAX_COMMENTS or scanned >= Config.MAX_COMMENTS:
+                    break
+        logger.info(f"Instaloader scraped {len(comments)} comments.")
+        return {"comments": comments, "engine": "instaloader", "cursor": None}
+
+#---------------------------------------------------------------------------------
+# 6. Function to stream comment pages with a resumable cursor and no MAX_COMMENTS cap
+    def iter_comment_pages(self, shortcode, cursor=None, limit=None, page_size=None):
+        """
+        Generator yielding {"comments": [...], "cursor": str | None, "engine": str} per page,
+        as soon as each page is fetched, so memory stays bounded by one page.
+        `cursor` (from a previous page) resumes where that page stopped; None means the end.
+        `limit` caps the total number of comments yielded (None = every comment). When the
+        cap cuts an Instagrapi page short, the rest of that page is skipped on resume.
+        `page_size` sets the comments per page; without it Instaloader uses COMMENT_PAGE_SIZE
+        and Instagrapi yields one page per private API response.
+
+        Without a cursor, Instagrapi is tried first and Instaloader takes over if Instagrapi
+        fails before the first page. A cursor always resumes on the engine that issued it.
+        """
+        instagrapi_page_size = page_size
+        page_size = page_size or Config.COMMENT_PAGE_SIZE
+        self.sync_sessions()
+        if cursor:
+            # A resumed cursor is bound to its engine, so an open breaker there means no scrape
+            engine = "instaloader" if cursor.startswith("il:") else "instagrapi"
+            permit = self.breakers[engine].allow_request()
+            if permit is None:
+                logger.error(f"CRITICAL: {engine.capitalize()} is unavailable to resume paging")
+                raise Exception("All scraping methods failed - no active session")
+            if engine == "instaloader":
+                pages = self._iter_instaloader_comment_pages(shortcode, cursor, page_size)
+            else:
+                pages = self._iter_instagrapi_comment_pages(shortcode, cursor, instagrapi_page_size)
+            pages = self._track_pages(engine, shortcode, pages, permit)
+        else:
+            pages = self._iter_first_available_pages(shortcode, page_size, instagrapi_page_size)
+
+        remaining = limit
+        for page in pages:
+            if remaining is not None:
+                page["comments"] = page["comments"][:remaining]
+                remaining -= len(page["comments"])
+            yield page
+            if remaining is not None and remaining <= 0:
+                return
+
+    # Healthiest engine first, the other one if it fails before yielding anything
+    def _iter_first_available_pages(self, shortcode, page_size, instagrapi_page_size=None):
+        last_error = None
+        for engine in self._engine_order():
+            permit = self.breakers[engine].allow_request()
+            if permit is None:
+                continue
+            if engine == "instagrapi":
+                pages = self._iter_instagrapi_comment_pages(shortcode, None, instagrapi_page_size)
+            else:
+                pages = self._iter_instaloader_comment_pages(shortcode, None, page_size)
+
+            started = False
             try:
-                logger.info(f"Scraping {shortcode} using Instaloader (Fallback)...")
-                post = instaloader.Post.from_shortcode(self.L.context, shortcode)
-                for comment in post.get_comments():
-                    comments.append({
-                        "username": comment.owner.username,
-                        "comment": comment.text
-                    })
-                    if len(comments) >= Config.MAX_COMMENTS:
-                        break
-                logger.info(f"Instaloader scraped {len(comments)} comments.")
-                return comments
+                for page in self._track_pages(engine, shortcode, pages, permit):
+                    started = True
+                    yield page
+                return
             except Exception as e:
-                logger.warning(f"Instaloader failed during scrape: {e}.")
-                self.instaloader_active = False
-                raise e
-        
-        # --- Both inactive from setup ---
+                if started:
+                    raise
+                logger.warning(f"{engine.capitalize()} failed during paginated scrape: {e}.")
+                last_error = e
+
+        if last_error is not None:
+            raise last_error
         logger.error("CRITICAL: No active session available for scraping")
         raise Exception("All scraping methods failed - no active session")
+
+    # Feeds a page stream's outcome to the engine's breaker: every page counts as a successful
+    # request and an error as a failed one. `permit` is what allow_request() gave; a half-open
+    # trial that got no verdict (paging stopped before the first page) is released.
+    def _track_pages(self, engine, shortcode, pages, permit):
+        breaker = self.breakers[engine]
+        first = True
+        try:
+            for page in pages:
+                breaker.record_success(permit)
+                if first:
+                    self.last_shortcode = shortcode
+                    self.persist_session(engine)
+                    first = False
+                yield page
+        except Exception as e:
+            rate_limited = is_rate_limit_error(e)
+            record_engine_failure(engine, rate_limited)
+            breaker.record_failure(permit, e, rate_limited)
+            raise
+        finally:
+            breaker.release(permit)
+
+    # With `page_size`, API responses are merged or split into pages of exactly that many
+    # comments; a cursor that stops inside a response reads "<api cursor>@<n>", i.e. fetch that
+    # response again and skip its first n comments
+    def _iter_instagrapi_comment_pages(self, shortcode, cursor=None, page_size=None):
+        with stage_timer('instagrapi_media_pk'):
+            media_id = self._request(lambda: self.instagrapi.media_id(shortcode))
+        fetch_cursor, skip = _split_instagrapi_cursor(cursor)
+        buffer = []
+        yielded = False
+        for page, next_cursor in self._iter_instagrapi_pages(media_id, fetch_cursor):
+            comments = [
+                _comment_dict(c.pk, c.user.username, c.text, c.created_at_utc) for c in page
+            ]
+            offset, skip = skip, 0
+            comments = comments[offset:]
+            if page_size is None:
+                yield {"comments": comments, "cursor": next_cursor, "engine": "instagrapi"}
+                continue
+
+            while len(buffer) + len(comments) >= page_size:
+                take = page_size - len(buffer)
+                buffer.extend(comments[:take])
+                comments = comments[take:]
+                offset += take
+                page_cursor = f"{fetch_cursor or ''}@{offset}" if comments else next_cursor
+                yield {"comments": buffer, "cursor": page_cursor, "engine": "instagrapi"}
+                yielded = True
+                buffer = []
+                if page_cursor is None:
+                    return
+            buffer.extend(comments)
+            fetch_cursor = next_cursor
+
+        if page_size is not None and (buffer or not yielded):
+            yield {"comments": buffer, "cursor": None, "engine": "instagrapi"}
+
+    def _iter_instaloader_comment_pages(self, shortcode, cursor, page_size):
+        frozen = None
+        skip_id = None
+        if cursor:
+            state = json.loads(base64.urlsafe_b64decode(cursor[3:].encode()).decode())
+            frozen = state["frozen"]
+            # freeze() re-yields the last consumed node, so skip it once
+            skip_id = state.get("last_id")
+
+        position = self._request(lambda: self.instaloader.comments(shortcode, frozen))
+        page = []
+        for comment in self._retrying(position):
+            if skip_id is not None and str(comment.id) == skip_id:
+                skip_id = None
+                continue
+            skip_id = None
+            page.append(_comment_dict(comment.id, comment.owner.username, comment.text, comment.created_at_utc))
+            if len(page) >= page_size:
+                next_cursor = _instaloader_cursor(self.instaloader.freeze(position), page[-1]["comment_id"])
+                yield {"comments": page, "cursor": next_cursor, "engine": "instaloader"}
+                page = []
+        yield {"comments": page, "cursor": None, "engine": "instaloader"}
+
+#---------------------------------------------------------------------------------
+# 7. Function to page through Instagrapi comments one API response at a time
+    def _iter_instagrapi_pages(self, media_id, cursor=None):
+        """
+        Yields (comments, next_cursor) per private API page, mirroring Client.media_comments.
+        Cursors look like "max_id:<id>" (older comments) or "min_id:<id>" (headload comments).
+        """
+        from instagrapi.extractors import extract_comment
+
+        params = _cursor_params(cursor)
+        while True:
+            result = self._request(lambda: self.instagrapi.comments_page(media_id, params))
+            page = [extract_comment(c) for c in result.get("comments") or []]
+
+            if result.get("has_more_comments") and result.get("next_max_id"):
+                cursor = f"max_id:{result['next_max_id']}"
+            elif result.get("has_more_headload_comments") and result.get("next_min_id"):
+                cursor = f"min_id:{result['next_min_id']}"
+            else:
+                cursor = None
+
+            yield page, cursor
+            if cursor is None or not page:
+                return
+            params = _cursor_params(cursor)
+
+    # Runs one upstream request, retrying a transient failure (5xx, dropped connection)
+    # SCRAPE_REQUEST_RETRIES times, so one bad page does not fail the whole scrape
+    def _request(self, call):
+        for attempt in range(Config.SCRAPE_REQUEST_RETRIES + 1):
+            try:
+                return call()
+            except Exception as e:
+                if attempt >= Config.SCRAPE_REQUEST_RETRIES or not is_transient_error(e):
+                    raise
+                logger.info(f"Transient error ({e}), retrying request")
+                time.sleep(Config.SCRAPE_REQUEST_RETRY_DELAY * (attempt + 1))
+
+    # Iterates an Instaloader comment iterator, whose next() fetches a new page now and then,
+    # with the same retries
+    def _retrying(self, iterator):
+        iterator = iter(iterator)
+        while True:
+            try:
+                item = self._request(lambda: next(iterator))
+            except StopIteration:
+                return
+            yield item
+
+#---------------------------------------------------------------------------------
+# 8. Function to rank the usable engines by recent success rate and latency
+    def _engine_order(self):
+        """
+        Engines whose session is loaded and whose breaker is not open, cheapest first, where
+        cost is the median scrape time divided by the success rate (a failure costs a retry),
+        and the fallback engine has to beat the primary by ENGINE_SWITCH_MARGIN to avoid flapping.
+        Latency only counts when every engine has recent scrapes to compare; otherwise engines
+        are ranked by success rate in steps of 10%, so a probe-only engine does not win on noise.
+        """
+        engines = [engine for engine in ENGINES if self.engine_available(engine)]
+        if len(engines) < 2:
+            return engines
+        rates = {}
+        medians = {}
+        for engine in engines:
+            rate = self.breakers[engine].success_rate()
+            rates[engine] = 1.0 if rate is None else rate
+            medians[engine] = self.breakers[engine].latency_percentiles()["p50"]
+
+        if all(median is not None for median in medians.values()):
+            cost = lambda engine: (medians[engine] / max(rates[engine], 0.01)) * ENGINE_SWITCH_MARGIN ** ENGINES.index(engine)
+        else:
+            cost = lambda engine: -round(rates[engine], 1)
+        return sorted(engines, key=cost)
+
+#---------------------------------------------------------------------------------
+# 9. Function to health-check engines in the background (called by EngineProber)
+    def probe_engines(self, interval):
+        """
+        Sends one light request (a media lookup) through each logged-in engine that is due:
+        an open breaker whose backoff expired gets its half-open trial here, with the session
+        re-loaded first, and a closed one that saw no traffic for `interval` seconds is re-checked.
+        """
+        self.sync_sessions()
+        shortcode = Config.ENGINE_PROBE_SHORTCODE or self.last_shortcode
+        if shortcode is None:
+            return
+        for engine in ENGINES:
+            breaker = self.breakers[engine]
+            now = time.monotonic()
+            if breaker.state == CLOSED:
+                due = self.logged_in[engine] and now - breaker.last_checked >= interval
+            else:
+                due = breaker.available(now)
+                if due:
+                    # Self-heal: a failing engine may just need its session re-loaded
+                    (self._init_instagrapi_session if engine == "instagrapi" else self._init_instaloader_session)()
+                    due = self.logged_in[engine]
+            if not due:
+                continue
+            permit = breaker.allow_request()
+            if permit is None:
+                continue
+
+            try:
+                if engine == "instagrapi":
+                    self.instagrapi.media_id(shortcode)
+                else:
+                    self.instaloader.comments(shortcode)
+            except Exception as e:
+                logger.info(f"Probe of {engine} ({self.account['name']}) failed: {e}")
+                breaker.record_failure(permit, e, is_rate_limit_error(e))
+            else:
+                breaker.record_success(permit)
+
+#---------------------------------------------------------------------------------
+# 10. Function to report each engine's session and breaker for /admin/check-session
+    def engine_status(self):
+        return {
+            engine: {
+                "logged_in": self.logged_in[engine],
+                "session_version": self.sessions[engine].version if self.sessions[engine] else None,
+                **self.breakers[engine].status()
+            }
+            for engine in ENGINES
+        }
+
+#---------------------------------------------------------------------------------
+# 11. Function to save session state Instagram refreshed during a scrape (cookies, claims)
+    def persist_session(self, engine):
+        """Saves the engine's live session to the store if it changed since it was loaded or last saved."""
+        session = self.sessions[engine]
+        if self.session_store is None or session is None:
+            return
+        try:
+            data = self.cl.get_settings() if engine == "instagrapi" else self.L.save_session()
+            digest = session_digest(data)
+            if digest == self._saved_digests.get(engine):
+                return
+            version = self.session_store.save(self.account["name"], engine, data, session.source_hash)
+            self.sessions[engine] = StoredSession(data, session.source_hash, version)
+            self._saved_digests[engine] = digest
+        except Exception as e:
+            logger.warning(f"Could not save refreshed {engine} session for account {self.account['name']}: {e}")
+
+#---------------------------------------------------------------------------------
+# 12. Function to pick up sessions other workers saved (at most every SESSION_STORE_SYNC_INTERVAL)
+    def sync_sessions(self, force=False):
+        if self.session_store is None:
+            return
+        if not force and time.monotonic() - self._synced_at < Config.SESSION_STORE_SYNC_INTERVAL:
+            return
+        # One thread checks; the others carry on with the sessions they have
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = time.monotonic()
+            name = self.account["name"]
+            for engine, version in self.session_store.versions(name).items():
+                current = self.sessions.get(engine)
+                if engine not in self.sessions or (current is not None and version <= current.version):
+                    continue
+                stored = self.session_store.load(name, engine)
+                if engine == "instagrapi":
+                    apply_instagrapi_session(self.cl, stored.data)
+                else:
+                    apply_instaloader_session(self.L, self.account["username"], stored.data)
+                self._set_session(engine, stored)
+                logger.info(f"Picked up {engine} session version {stored.version} for account {name}")
+        except Exception as e:
+            logger.warning(f"Session store sync failed for account {self.account['name']}: {e}")
+        finally:
+            self._sync_lock.release()
+
+#==================================== Helper Functions =================================
+# Raised by the session pool when every account is cooling down or out of budget
+class AccountsExhaustedError(Exception):
+    pass
+
+# Raised inside an engine attempt that lost a hedged race, to stop it paging
+class ScrapeCancelled(Exception):
+    pass
+
+# Upstream requests an engine attempt got through, filled in by the fetchers as they page
+class _RequestCount:
+    def __init__(self):
+        self.ok = 0
+
+# Helper to get the executor for hedged scrapes
+def _hedge_executor():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=Config.SCRAPE_HEDGE_WORKERS, thread_name_prefix='scrape-hedge')
+        return _hedge_pool
+
+# Helper to recognise Instagram rate limiting (HTTP 429) from either engine
+def is_rate_limit_error(exc):
+    from instagrapi.exceptions import ClientThrottledError, PleaseWaitFewMinutes, RateLimitError
+    from instaloader.exceptions import TooManyRequestsException
+
+    if isinstance(exc, (ClientThrottledError, PleaseWaitFewMinutes, RateLimitError, TooManyRequestsException,
+                        AccountsExhaustedError)):
+        return True
+    # Instaloader raises AbortDownloadException for our fatal_status_codes, so check the message
+    message = str(exc)
+    return "429" in message or "Too Many Requests" in message or "Please wait a few minutes" in message
+
+# Helper to recognise a transient upstream failure worth retrying (never a rate limit)
+def is_transient_error(exc):
+    from instagrapi.exceptions import ClientConnectionError, ClientRequestTimeout
+    from instaloader.exceptions import ConnectionException
+
+    if is_rate_limit_error(exc):
+        return False
+    if isinstance(exc, (ClientConnectionError, ClientRequestTimeout, ConnectionException)):
+        return True
+    message = str(exc)
+    return any(status in message for status in ("500 ", "502 ", "503 ", "504 "))
+
+# Helper to label why a scrape went to Instaloader, for the fallback counter
+def _fallback_reason(order, instagrapi_failed):
+    if instagrapi_failed:
+        return 'instagrapi_failed'
+    if "instagrapi" in order[1:]:
+        return 'instagrapi_slower'
+    return 'instagrapi_inactive'
+
+# Helper to build the comment dict returned by the scraper
+def _comment_dict(comment_id, username, text, created_at):
+    if created_at is not None and created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        "username": username,
+        "comment": text,
+        "comment_id": str(comment_id),
+        "created_at": created_at.isoformat() if created_at else None
+    }
+
+# Helper to check whether a comment dict is new for an incremental scrape
+def _is_new(row, since, known_ids):
+    if row["comment_id"] in known_ids:
+        return False
+    if since is None or row["created_at"] is None:
+        return True
+    return datetime.fromisoformat(row["created_at"]) >= since
+
+# Helper to encode an Instaloader iterator position as an opaque cursor (None if not resumable)
+def _instaloader_cursor(frozen, last_id):
+    if frozen is None:
+        return None
+    state = {"frozen": frozen, "last_id": last_id}
+    return "il:" + base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+# Helper to split an Instagrapi page cursor into the API cursor and the comments to skip
+def _split_instagrapi_cursor(cursor):
+    if cursor:
+        api_cursor, sep, skip = cursor.rpartition("@")
+        if sep and skip.isdigit():
+            return api_cursor or None, int(skip)
+    return cursor, 0
+
+# Helper to turn a stored cursor back into request params
+def _cursor_params(cursor):
+    if not cursor:
+        return None
+    key, _, value = cursor.partition(":")
+    return {key: value}
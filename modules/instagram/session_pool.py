@@ -0,0 +1,239 @@
+import logging
+import threading
+import time
+from modules.configuration.config import Config
+from modules.instagram.scraper import InstagramScraper, AccountsExhaustedError, is_rate_limit_error
+from modules.instagram.shared_state import state_record
+from modules.instagram.engine_health import EngineProber
+
+logger = logging.getLogger(__name__)
+
+#==================================== PooledAccount Class =================================
+# One Instagram account: its scraper, token bucket and failure cooldown. The numeric health
+# lives in `self.health`, which is shared by all gunicorn workers when enable_shared_state()
+# ran in the master (see gunicorn.conf.py); `self.health_lock` guards updates to it.
+class PooledAccount:
+    def __init__(self, account, scraper):
+        self.name = account["name"]
+        self.username = account["username"]
+        self.scraper = scraper
+        self.last_error = None
+
+        # Token bucket (one token per scrape)
+        self.capacity = Config.ACCOUNT_BURST
+        self.refill_per_second = Config.ACCOUNT_SCRAPES_PER_MINUTE / 60.0
+
+        # Health
+        self.health, self.health_lock = state_record(
+            f"account:{self.name}",
+            tokens=float(self.capacity),
+            refilled_at=time.monotonic(),
+            cooldown_until=0.0,
+            consecutive_failures=0,
+            successes=0,
+            failures=0
+        )
+
+    @property
+    def active(self):
+        return self.scraper.instagrapi_active or self.scraper.instaloader_active
+
+    # Callers hold health_lock for the methods below
+    def refill(self, now):
+        health = self.health
+        health.tokens = min(self.capacity, health.tokens + (now - health.refilled_at) * self.refill_per_second)
+        health.refilled_at = now
+
+    def available(self, now):
+        return self.active and now >= self.health.cooldown_until and self.health.tokens >= 1
+
+    def status(self, now):
+        health = self.health
+        return {
+            "name": self.name,
+            "username": self.username,
+            "instagrapi_active": self.scraper.instagrapi_active,
+            "instaloader_active": self.scraper.instaloader_active,
+            "tokens": round(health.tokens, 2),
+            "cooldown_remaining": round(max(0.0, health.cooldown_until - now), 1),
+            "consecutive_failures": int(health.consecutive_failures),
+            "successes": int(health.successes),
+            "failures": int(health.failures),
+            "last_error": self.last_error,
+            "engines": self.scraper.engine_status()
+        }
+
+#==================================== InstagramSessionPool Class =================================
+# Drop-in replacement for a single InstagramScraper that spreads scrapes over several accounts
+class InstagramSessionPool:
+    def __init__(self, accounts=None, session_store=None):
+        self._lock = threading.Condition()
+        self._healing = set() # names of accounts whose sessions a thread is re-loading
+        self.accounts = []
+        for account in accounts or Config.instagram_accounts():
+            self.accounts.append(PooledAccount(account, InstagramScraper(account, session_store)))
+        self._health_lock = self.accounts[0].health_lock if self.accounts else threading.RLock()
+        logger.info(f"Session pool ready with {len(self.accounts)} account(s), "
+                    f"{sum(1 for a in self.accounts if a.active)} active.")
+
+        # Background health checks that close engine breakers without waiting for user traffic
+        self.prober = EngineProber([a.scraper for a in self.accounts])
+        self.prober.start()
+
+#---------------------------------------------------------------------------------
+# 1. Engine flags, aggregated the way callers of a single scraper expect
+    @property
+    def instagrapi_active(self):
+        return any(a.scraper.instagrapi_active for a in self.accounts)
+
+    @property
+    def instaloader_active(self):
+        return any(a.scraper.instaloader_active for a in self.accounts)
+
+#---------------------------------------------------------------------------------
+# 2. Function to re-load sessions of every account that has no active engine
+    def setup_session(self):
+        for account in self.accounts:
+            if not account.active:
+                account.scraper.setup_session()
+
+#---------------------------------------------------------------------------------
+# 3. Function to scrape comments through the healthiest account
+    def scrape_comments(self, shortcode, retry=True):
+        return self.fetch_comments(shortcode)["comments"]
+
+    def fetch_comments(self, shortcode, **kwargs):
+        """
+        Routes the scrape to the best available account. A rate-limited account is put
+        on cooldown and the scrape moves on to the next one; other errors are raised.
+        Result dicts gain an "account" key naming the account that served them.
+        """
+        tried = set()
+        while True:
+            account = self._acquire(exclude=tried)
+            tried.add(account.name)
+            try:
+                result = account.scraper.fetch_comments(shortcode, **kwargs)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                self._record_failure(account, e, rate_limited)
+                if rate_limited and len(tried) < len(self.accounts):
+                    logger.warning(f"Account {account.name} rate limited, retrying {shortcode} on another account")
+                    continue
+                raise
+            self._record_success(account)
+            result["account"] = account.name
+            return result
+
+    def iter_comment_pages(self, shortcode, cursor=None, limit=None, page_size=None):
+        """Paginated scrape on one pooled account; see InstagramScraper.iter_comment_pages."""
+        account = self._acquire()
+        try:
+            for page in account.scraper.iter_comment_pages(shortcode, cursor, limit, page_size):
+                page["account"] = account.name
+                yield page
+        except GeneratorExit:
+            self._record_success(account)
+            raise
+        except Exception as e:
+            self._record_failure(account, e, is_rate_limit_error(e))
+            raise
+        self._record_success(account)
+
+#---------------------------------------------------------------------------------
+# 4. Function to pick an account, waiting briefly for budget if none is free
+    def _acquire(self, exclude=()):
+        deadline = time.monotonic() + Config.SESSION_POOL_ACQUIRE_TIMEOUT
+        while True:
+            self._heal_accounts(exclude)
+            with self._lock:
+                now = time.monotonic()
+                accounts = [a for a in self.accounts if a.name not in exclude]
+
+                # All accounts share one health lock (process-wide, or cross-process under gunicorn)
+                with self._health_lock:
+                    candidates = []
+                    for account in accounts:
+                        account.refill(now)
+                        if account.available(now):
+                            candidates.append(account)
+
+                    if candidates:
+                        # Healthiest first: Instagrapi up, fewest recent failures, most budget left
+                        best = min(candidates, key=lambda a: (
+                            not a.scraper.instagrapi_active, a.health.consecutive_failures, -a.health.tokens
+                        ))
+                        best.health.tokens -= 1
+                        return best
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise AccountsExhaustedError(
+                        "All Instagram accounts are cooling down or out of budget (429). Try again later."
+                    )
+                self._lock.wait(timeout=min(remaining, 1.0))
+
+    # Self-heal: an account with no logged-in engine whose cooldown expired gets its sessions
+    # re-loaded (engines with open breakers are re-checked by the prober instead). The login runs
+    # outside self._lock so other scrapes are not held up behind it, and `_healing` keeps two
+    # threads from re-loading the same account at once.
+    def _heal_accounts(self, exclude=()):
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                a for a in self.accounts
+                if a.name not in exclude and a.name not in self._healing
+                and not any(a.scraper.logged_in.values()) and now >= a.health.cooldown_until
+            ]
+            self._healing.update(a.name for a in due)
+        for account in due:
+            try:
+                account.scraper.setup_session()
+            finally:
+                with self._lock:
+                    self._healing.discard(account.name)
+                    self._lock.notify_all()
+
+#---------------------------------------------------------------------------------
+# 5. Functions to update account health after a scrape
+    def _record_success(self, account):
+        with self._lock:
+            with self._health_lock:
+                account.health.successes += 1
+                account.health.consecutive_failures = 0
+            account.last_error = None
+            self._lock.notify_all()
+
+    def _record_failure(self, account, error, rate_limited):
+        with self._lock:
+            account.last_error = str(error)[:200]
+            with self._health_lock:
+                health = account.health
+                health.failures += 1
+                health.consecutive_failures += 1
+                # A single bad shortcode also raises here, so ordinary errors only cool an
+                # account down once they repeat; rate limits always do
+                if rate_limited:
+                    cooldown = Config.ACCOUNT_RATE_LIMIT_COOLDOWN
+                elif health.consecutive_failures >= Config.ACCOUNT_FAILURE_THRESHOLD:
+                    excess = int(health.consecutive_failures) - Config.ACCOUNT_FAILURE_THRESHOLD
+                    cooldown = Config.ACCOUNT_FAILURE_COOLDOWN * (2 ** excess)
+                else:
+                    return
+                cooldown = min(cooldown, Config.ACCOUNT_MAX_COOLDOWN)
+                health.cooldown_until = time.monotonic() + cooldown
+            logger.warning(f"Account {account.name} cooling down for {cooldown:.0f}s after: {account.last_error}")
+
+#---------------------------------------------------------------------------------
+# 6. Function to stop the background prober when the pool is replaced
+    def close(self):
+        self.prober.stop()
+
+#---------------------------------------------------------------------------------
+# 7. Function to report pool status for /admin/check-session
+    def status(self):
+        with self._lock, self._health_lock:
+            now = time.monotonic()
+            for account in self.accounts:
+                account.refill(now)
+            return [account.status(now) for account in self.accounts]
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+from modules.configuration.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Session state as kept by a store: `data` is the engine's JSON-able session (Instagrapi
+# settings dict or Instaloader cookie dict), `source_hash` fingerprints the *_SESSION_B64 value it
+# descends from, and `version` goes up on every save so workers can tell they are behind.
+StoredSession = namedtuple('StoredSession', ['data', 'source_hash', 'version'])
+
+#==================================== DatabaseSessionStore Class =================================
+# Sessions in the instagram_session table of the app database (shared by all workers and hosts)
+class DatabaseSessionStore:
+    def __init__(self, app):
+        self.app = app
+
+    # Each call runs in its own app context, so it works from request threads, scrape jobs
+    # and the engine prober alike without touching the caller's transaction
+    def load(self, account, engine):
+        from modules.database.models import db, InstagramSession
+        with self.app.app_context():
+            row = db.session.get(InstagramSession, (account, engine))
+            if row is None:
+                return None
+            return StoredSession(json.loads(row.data), row.source_hash, row.version)
+
+    def save(self, account, engine, data, source_hash):
+        """Stores `data` as the newest session and returns its version."""
+        from sqlalchemy.exc import IntegrityError
+        from modules.database.models import db, InstagramSession
+        with self.app.app_context():
+            for attempt in range(2):
+                row = db.session.get(InstagramSession, (account, engine))
+                if row is None:
+                    row = InstagramSession(account=account, engine=engine, version=1)
+                    db.session.add(row)
+                else:
+                    # Incremented in SQL so concurrent saves from other workers are not lost
+                    row.version = InstagramSession.version + 1
+                row.data = json.dumps(data)
+                row.source_hash = source_hash
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    # Another worker inserted the row first; update it instead
+                    db.session.rollback()
+                    if attempt:
+                        raise
+                    continue
+                return row.version
+
+    def versions(self, account):
+        from modules.database.models import db, InstagramSession
+        with self.app.app_context():
+            rows = db.session.execute(
+                db.select(InstagramSession.engine, InstagramSession.version).where(InstagramSession.account == account)
+            )
+            return {engine: version for engine, version in rows}
+
+#==================================== FileSessionStore Class =================================
+# Sessions as JSON files, <directory>/<account>/<engine>.json, for single-host deployments
+# that would rather not keep session cookies in the database
+class FileSessionStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, account, engine):
+        return os.path.join(self.directory, account, f"{engine}.json")
+
+    def load(self, account, engine):
+        try:
+            with open(self.path(account, engine), encoding='utf-8') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        return StoredSession(record["data"], record.get("source_hash"), record["version"])
+
+    def save(self, account, engine, data, source_hash):
+        current = self.load(account, engine)
+        version = current.version + 1 if current else 1
+        path = self.path(account, engine)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        record = {"data": data, "source_hash": source_hash, "version": version, "updated_at": datetime.utcnow().isoformat()}
+        # Written next to the target and renamed over it, so readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return version
+
+    def versions(self, account):
+        versions = {}
+        for engine in ("instagrapi", "instaloader"):
+            stored = self.load(account, engine)
+            if stored is not None:
+                versions[engine] = stored.version
+        return versions
+
+#==================================== Functions =================================
+# 1. Function to build the store selected by Config.SESSION_STORE (None when it is 'off')
+def create_session_store(app, kind=None):
+    kind = kind or Config.SESSION_STORE
+    if kind == 'database':
+        return DatabaseSessionStore(app)
+    if kind == 'file':
+        return FileSessionStore(Config.SESSION_STORE_DIR)
+    if kind == 'off':
+        return None
+    raise ValueError(f"Unknown SESSION_STORE '{kind}' (expected database, file or off)")
+
+# 2. Function to pick the session to load: the stored one, unless the env variable changed since
+def resolve_session(store, account, engine, env_var_name, decode):
+    """
+    Returns a StoredSession, or None if there is no usable session.
+    The stored session wins while it descends from the current *_SESSION_B64 value (it may hold
+    cookies Instagram refreshed since); a new env value (e.g. a fresh cookie.json export) is
+    decoded with `decode` and replaces it. Without a store the env value is used as is (version 0).
+    """
+    source_hash = env_fingerprint(env_var_name)
+    if store is not None:
+        try:
+            stored = store.load(account, engine)
+        except Exception as e:
+            logger.warning(f"Session store unavailable, using {env_var_name}: {e}")
+            store, stored = None, None
+        if stored is not None and (source_hash is None or stored.source_hash == source_hash):
+            logger.info(f"Using stored {engine} session for account {account} (version {stored.version})")
+            return stored
+
+    if source_hash is None:
+        logger.warning(f"No {env_var_name} found in environment.")
+        return None
+    data = decode(os.environ[env_var_name])
+    if data is None:
+        return None
+    version = 0
+    if store is not None:
+        try:
+            version = store.save(account, engine, data, source_hash)
+        except Exception as e:
+            logger.warning(f"Could not store {engine} session for account {account}: {e}")
+    return StoredSession(data, source_hash, version)
+
+# 3. Function to fingerprint an env variable's value (None if unset)
+def env_fingerprint(env_var_name):
+    value = os.environ.get(env_var_name)
+    return hashlib.sha256(value.encode()).hexdigest() if value else None
+
+# 4. Function to fingerprint session data, to skip saving state that did not change
+def session_digest(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
@@ -0,0 +1,76 @@
+import multiprocessing
+import threading
+
+#==================================== SharedStateTable Class =================================
+# Fixed table of float fields in anonymous shared memory. Allocated in the gunicorn master
+# before it forks (see gunicorn.conf.py), so every worker process reads and writes the same
+# account health and rate-limit backoff instead of keeping its own copy.
+class SharedStateTable:
+    def __init__(self, keys, fields):
+        self.lock = multiprocessing.RLock()
+        self._keys = {key: i for i, key in enumerate(keys)}
+        self._fields = {field: i for i, field in enumerate(fields)}
+        self._width = len(self._fields) + 1 # last slot flags an initialized record
+        self._values = multiprocessing.RawArray('d', len(self._keys) * self._width)
+
+#---------------------------------------------------------------------------------
+# 1. Function to get the shared record for a key, seeding it on first use
+    def record(self, key, **defaults):
+        """Returns None for keys the table was not allocated with (e.g. accounts added after fork)."""
+        if key not in self._keys:
+            return None
+        record = SharedRecord(self, self._keys[key] * self._width)
+        with self.lock:
+            if not self._values[record._offset + self._width - 1]:
+                for field, value in defaults.items():
+                    setattr(record, field, value)
+                self._values[record._offset + self._width - 1] = 1.0
+        return record
+
+
+# Attribute view over one row of a SharedStateTable (callers hold table.lock while updating)
+class SharedRecord:
+    def __init__(self, table, offset):
+        object.__setattr__(self, '_table', table)
+        object.__setattr__(self, '_offset', offset)
+
+    def __getattr__(self, field):
+        try:
+            return self._table._values[self._offset + self._table._fields[field]]
+        except KeyError:
+            raise AttributeError(field) from None
+
+    def __setattr__(self, field, value):
+        if field not in self._table._fields:
+            raise AttributeError(field)
+        self._table._values[self._offset + self._table._fields[field]] = value
+
+
+# Per-process stand-in with the same interface, used under the development server
+class LocalRecord:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+#==================================== Process-wide Table =================================
+ACCOUNT_FIELDS = ('tokens', 'refilled_at', 'cooldown_until', 'consecutive_failures', 'successes', 'failures')
+GATE_FIELDS = ('resume_at', 'strikes')
+
+_shared_table = None
+_local_lock = threading.RLock()
+
+# 1. Function to allocate the shared table; call once in the parent process before forking
+def enable_shared_state(account_names):
+    global _shared_table
+    keys = [f"account:{name}" for name in account_names] + ["rate_limit_gate"]
+    _shared_table = SharedStateTable(keys, sorted(set(ACCOUNT_FIELDS + GATE_FIELDS)))
+    return _shared_table
+
+# 2. Function to get a record: shared if enable_shared_state() ran before fork, else local
+def state_record(key, **defaults):
+    """Returns (record, lock). The lock guards read-modify-write of the record across processes."""
+    if _shared_table is not None:
+        record = _shared_table.record(key, **defaults)
+        if record is not None:
+            return record, _shared_table.lock
+    return LocalRecord(**defaults), _local_lock
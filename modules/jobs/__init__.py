@@ -0,0 +1,16 @@
+# Public names load their submodule on first use (PEP 562), so importing one submodule, e.g.
+# modules.jobs.batch_scheduler, does not pull in the job runner and the database models
+import importlib
+
+_EXPORTS = {
+    'ScrapeJobRunner': 'modules.jobs.scrape_jobs',
+    'BatchScrapeScheduler': 'modules.jobs.batch_scheduler',
+    'rate_limit_gate': 'modules.jobs.batch_scheduler',
+}
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,126 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from modules.configuration.config import Config
+from modules.instagram.shared_state import state_record
+
+logger = logging.getLogger(__name__)
+
+#==================================== RateLimitGate Class =================================
+# Process-wide backoff shared by every batch: one 429 pauses all scheduled scrapes.
+# Under gunicorn the backoff window is shared by all workers (see shared_state.py).
+class RateLimitGate:
+    def __init__(self, base_backoff=None, max_backoff=None):
+        self.base_backoff = base_backoff or Config.RATE_LIMIT_BASE_BACKOFF
+        self.max_backoff = max_backoff or Config.RATE_LIMIT_MAX_BACKOFF
+        self._record = None
+
+    # The record is resolved on first use, i.e. inside a worker, after the shared table exists
+    def _state(self):
+        if self._record is None:
+            self._record = state_record("rate_limit_gate", resume_at=0.0, strikes=0)
+        return self._record
+
+#---------------------------------------------------------------------------------
+# 1. Function to wait out the current backoff window, if it ends within `max_wait` seconds
+    def wait(self, max_wait=None):
+        """
+        Returns True once scrapes may go ahead, or False straight away if the backoff lasts
+        longer than `max_wait` (None waits as long as it takes).
+        """
+        state, lock = self._state()
+        while True:
+            delay = self.remaining()
+            if delay <= 0:
+                return True
+            if max_wait is not None and delay > max_wait:
+                return False
+            time.sleep(delay)
+
+    # Seconds left in the current backoff window (0 when scrapes may go ahead)
+    def remaining(self):
+        state, lock = self._state()
+        with lock:
+            return max(0.0, state.resume_at - time.monotonic())
+
+#---------------------------------------------------------------------------------
+# 2. Function to start (or extend) a backoff window after a 429
+    def trip(self):
+        """Doubles the backoff for every consecutive 429, capped at max_backoff. Returns the delay."""
+        state, lock = self._state()
+        with lock:
+            delay = min(self.base_backoff * (2 ** int(state.strikes)), self.max_backoff)
+            state.strikes += 1
+            state.resume_at = max(state.resume_at, time.monotonic() + delay)
+        logger.warning(f"Instagram rate limit hit, pausing scrapes for {delay:.1f}s")
+        return delay
+
+#---------------------------------------------------------------------------------
+# 3. Function to reset the backoff after a successful request
+    def reset(self):
+        state, lock = self._state()
+        with lock:
+            state.strikes = 0
+
+    def status(self):
+        state, lock = self._state()
+        with lock:
+            return {
+                "backing_off": state.resume_at > time.monotonic(),
+                "resume_in_seconds": round(max(0.0, state.resume_at - time.monotonic()), 1),
+                "consecutive_rate_limits": int(state.strikes)
+            }
+
+
+# Shared gate for the whole worker process
+rate_limit_gate = RateLimitGate()
+
+#==================================== BatchScrapeScheduler Class =================================
+# Runs one task per shortcode on a bounded thread pool. Batches run inside an HTTP request, so
+# the scheduler only waits out a backoff that ends within max_wait seconds; while a longer one
+# is in force, the remaining items come back as rate limited for the caller to resubmit.
+class BatchScrapeScheduler:
+    def __init__(self, max_concurrency=None, max_retries=None, gate=None, max_wait=None):
+        self.max_concurrency = max_concurrency or Config.BATCH_SCRAPE_CONCURRENCY
+        self.max_retries = Config.BATCH_SCRAPE_MAX_RETRIES if max_retries is None else max_retries
+        self.max_wait = Config.BATCH_SCRAPE_MAX_WAIT if max_wait is None else max_wait
+        self.gate = gate or rate_limit_gate
+
+#---------------------------------------------------------------------------------
+# 1. Function to run every item and return results in input order
+    def run(self, items, task):
+        """
+        `task(item)` must return (payload, status_code). A 429 status trips the shared
+        gate and the item is retried up to max_retries times if the backoff ends within
+        max_wait. Items not run because of the backoff get a 429 payload with "retry_after".
+        Returns a list of (item, payload, status_code).
+        """
+        workers = max(1, min(self.max_concurrency, len(items)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-scrape') as pool:
+            return list(pool.map(lambda item: self._run_one(item, task), items))
+
+#---------------------------------------------------------------------------------
+# 2. Function to run a single item with rate-limit retries
+    def _run_one(self, item, task):
+        attempt = 0
+        payload = None
+        while True:
+            if not self.gate.wait(self.max_wait):
+                retry_after = round(self.gate.remaining(), 1)
+                error = (payload or {}).get("error") or "Skipped: Instagram rate limit backoff in progress"
+                return item, {"error": error, "retry_after": retry_after}, 429
+            try:
+                payload, status_code = task(item)
+            except Exception as e:
+                logger.error(f"Batch scrape of {item} crashed: {e}", exc_info=True)
+                return item, {"error": str(e)}, 500
+
+            if status_code != 429:
+                if status_code == 200:
+                    self.gate.reset()
+                return item, payload, status_code
+
+            self.gate.trip()
+            attempt += 1
+            if attempt > self.max_retries:
+                return item, {**payload, "retry_after": round(self.gate.remaining(), 1)}, status_code
@@ -0,0 +1,74 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from modules.configuration.config import Config
+from modules.database.models import db, ScrapeJob
+
+logger = logging.getLogger(__name__)
+
+#==================================== ScrapeJobRunner Class =================================
+# Runs scrapes on a background thread pool. Job state lives in the `scrape_job` table,
+# so whichever worker process receives a poll can answer it.
+class ScrapeJobRunner:
+    def __init__(self, app=None, max_workers=None):
+        self.app = None
+        self.max_workers = max_workers or Config.SCRAPE_JOB_WORKERS
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+
+#---------------------------------------------------------------------------------
+# 1. Function to enqueue a scrape job
+    def submit(self, shortcode, task):
+        """
+        Creates a queued ScrapeJob and schedules `task(report_progress)` on the pool.
+        `task` must return (payload, status_code, scrape_id) like app.run_scrape.
+        Returns the new job id.
+        """
+        job = ScrapeJob(id=uuid.uuid4().hex, shortcode=shortcode, status='queued', progress=0)
+        db.session.add(job)
+        db.session.commit()
+
+        # Executor is created lazily so forked workers each get their own threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scrape-job')
+        self._executor.submit(self._run, job.id, task)
+        return job.id
+
+#---------------------------------------------------------------------------------
+# 2. Function to execute a job inside an app context and record the outcome
+    def _run(self, job_id, task):
+        with self.app.app_context():
+            try:
+                self._update(job_id, status='running', progress=5)
+                payload, status_code, scrape_id = task(lambda progress: self._update(job_id, progress=progress))
+
+                if status_code != 200:
+                    self._update(job_id, status='failed', error=payload.get('error', 'Scrape failed'))
+                elif scrape_id is None:
+                    self._update(job_id, status='failed', error="Scrape finished but results could not be saved")
+                else:
+                    self._update(job_id, status='done', progress=100, scrape_id=scrape_id)
+            except Exception as e:
+                logger.error(f"Scrape job {job_id} crashed: {e}", exc_info=True)
+                db.session.rollback()
+                self._update(job_id, status='failed', error=str(e))
+            finally:
+                db.session.remove()
+
+#---------------------------------------------------------------------------------
+# 3. Function to persist job state changes
+    def _update(self, job_id, **fields):
+        try:
+            job = db.session.get(ScrapeJob, job_id)
+            if job is None:
+                return
+            for key, value in fields.items():
+                setattr(job, key, value)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Failed to update scrape job {job_id}: {e}")
+            db.session.rollback()
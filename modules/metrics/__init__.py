@@ -0,0 +1 @@
+from modules.metrics.prometheus import stage_timer, record_scrape, record_upload_rows, render_metrics
@@ -0,0 +1,112 @@
+import os
+import glob
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import multiprocess
+
+# Multi-process mode: when PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py does it before the
+# app is loaded) every worker writes its samples to files in that directory and /metrics sums
+# them, so a scrape of any one worker reports the whole server.
+
+#==================================== Metric Definitions =================================
+# Pipeline stages run from a few ms (DB batch) to minutes (a slow Instaloader fallback)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    'social_pulse_stage_seconds', 'Time spent in each stage of the scrape and upload pipelines',
+    ['stage'], buckets=STAGE_BUCKETS
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'social_pulse_http_request_seconds', 'HTTP request latency by route',
+    ['endpoint', 'method', 'status'], buckets=STAGE_BUCKETS
+)
+SCRAPES = Counter(
+    'social_pulse_scrapes', 'Scrapes by the engine that served them (cache = stored scrape) and outcome',
+    ['engine', 'outcome']
+)
+ENGINE_FALLBACKS = Counter(
+    'social_pulse_engine_fallbacks', 'Scrapes that went to Instaloader because Instagrapi was down, failed or ranked slower',
+    ['reason']
+)
+ENGINE_FAILURES = Counter(
+    'social_pulse_engine_failures', 'Failed scrape attempts per engine', ['engine', 'reason']
+)
+ENGINE_BREAKER_TRANSITIONS = Counter(
+    'social_pulse_engine_breaker_transitions', 'Engine circuit breaker state changes, by the state entered',
+    ['engine', 'state']
+)
+SCRAPE_HEDGES = Counter(
+    'social_pulse_scrape_hedges', 'Hedged scrapes (second engine started because the first was slow), by winner',
+    ['winner']
+)
+UPLOAD_ROWS = Histogram(
+    'social_pulse_upload_rows', 'Scored rows per CSV upload',
+    buckets=(10, 100, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+)
+DB_BATCH_ROWS = Histogram(
+    'social_pulse_db_batch_rows', 'Rows per bulk INSERT batch', ['table'],
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
+
+#==================================== Recording Helpers =================================
+# 1. Function to time a block: `with stage_timer('sentiment'): ...` (also works as a decorator)
+def stage_timer(stage):
+    return STAGE_SECONDS.labels(stage=stage).time()
+
+# 2. Function to record a stage timed by hand (e.g. one that spans a generator's yields)
+def record_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+# 3. Function to count one scrape (engine is 'instagrapi', 'instaloader', 'cache' or 'none')
+def record_scrape(engine, outcome):
+    SCRAPES.labels(engine=engine or 'none', outcome=outcome).inc()
+
+# 4. Function to count a failed engine attempt
+def record_engine_failure(engine, rate_limited):
+    ENGINE_FAILURES.labels(engine=engine, reason='rate_limit' if rate_limited else 'error').inc()
+
+# 5. Function to count a scrape sent to Instaloader instead of Instagrapi
+def record_fallback(reason):
+    ENGINE_FALLBACKS.labels(reason=reason).inc()
+
+# 6. Function to count an engine circuit breaker entering a state ('open', 'half_open', 'closed')
+def record_breaker_transition(engine, state):
+    ENGINE_BREAKER_TRANSITIONS.labels(engine=engine, state=state).inc()
+
+# 7. Function to count a hedged scrape by the engine that won ('primary', 'secondary' or 'none')
+def record_hedge(winner):
+    SCRAPE_HEDGES.labels(winner=winner).inc()
+
+# 8. Function to record the size of a finished upload
+def record_upload_rows(rows):
+    UPLOAD_ROWS.observe(rows)
+
+# 9. Function to record the size of one INSERT batch
+def record_db_batch(table, rows):
+    DB_BATCH_ROWS.labels(table=table).observe(rows)
+
+# 10. Function to record one HTTP request
+def record_request(endpoint, method, status, seconds):
+    HTTP_REQUEST_SECONDS.labels(endpoint=endpoint, method=method, status=str(status)).observe(seconds)
+
+#==================================== Exposition =================================
+# 1. Function to render every metric in the Prometheus text format
+def render_metrics():
+    """Returns (body, content_type); aggregates all worker processes in multi-process mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+# 2. Function to prepare the multi-process directory; call before any worker starts
+def reset_multiprocess_dir(path):
+    """Creates `path` and removes sample files left behind by a previous server run."""
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, '*.db')):
+        os.remove(stale)
+
+# 3. Function to drop a dead worker's live-only samples (gunicorn child_exit hook)
+def mark_worker_dead(pid):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -2,6 +2,8 @@
 let currentScrapeData = [];
 let currentRawScrapeData = [];
 let currentUploadData = [];
+let currentScrapeId = null;
+let currentUploadId = null;
 
 // --- Theme Toggle Logic ---
 const themeToggle = document.getElementById('theme-toggle');
@@ -63,8 +65,14 @@ function updateSummary(elementId, counts) {
 
 // --- Helper: Populate Table (safe from XSS - uses textContent not innerHTML for data)
 function populateTable(tableId, data) {
+    document.querySelector(`#${tableId} tbody`).innerHTML = '';
+    appendRows(tableId, data);
+}
+
+// --- Helper: Append rows to a results table (used as streamed pages arrive)
+function appendRows(tableId, data) {
     const tbody = document.querySelector(`#${tableId} tbody`);
-    tbody.innerHTML = '';
+    const fragment = document.createDocumentFragment();
     data.forEach(item => {
         const row = document.createElement('tr');
 
@@ -84,8 +92,33 @@ function populateTable(tableId, data) {
         row.appendChild(usernameCell);
         row.appendChild(commentCell);
         row.appendChild(sentimentCell);
-        tbody.appendChild(row);
+        fragment.appendChild(row);
     });
+    tbody.appendChild(fragment);
+}
+
+// --- Helper: Read a Server-Sent Events response, calling onEvent(name, data) for each event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            const dataLines = [];
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+            });
+            if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+    }
 }
 
 // --- Helper: Download Trigger
@@ -118,6 +151,15 @@ async function triggerDownload(url, payload) {
     }
 }
 
+// --- Helper: Stream an export straight from the server (no need to POST the data back)
+function triggerExport(url) {
+    const a = document.createElement('a');
+    a.href = url;
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+}
+
 // --- 1. Scraper Logic
 document.getElementById('scrape-form').addEventListener('submit', async function (e) {
     e.preventDefault();
@@ -132,24 +174,47 @@ document.getElementById('scrape-form').addEventListener('submit', async function
     errorMsg.style.display = 'none';
     resultsSection.style.display = 'none';
 
+    // Streamed: each page of comments is shown (already scored) as soon as the server fetches it
     try {
-        const response = await fetch('/scrape', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ shortcode: shortcode })
+        const response = await fetch(`/scrape/stream?shortcode=${encodeURIComponent(shortcode)}`, {
+            headers: { 'Accept': 'text/event-stream' }
         });
 
-        const data = await response.json();
-
-        if (response.ok) {
-            currentScrapeData = data.analyzed_comments;
-            currentRawScrapeData = data.comments;
-            updateSummary('scrape-sentiment-summary', data.sentiment_counts);
-            populateTable('scrape-results-table', currentScrapeData);
-            resultsSection.style.display = 'block';
-        } else {
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
             errorMsg.textContent = data.error || "An error occurred.";
             errorMsg.style.display = 'block';
+            return;
+        }
+
+        currentScrapeData = [];
+        currentRawScrapeData = [];
+        currentScrapeId = null;
+        populateTable('scrape-results-table', []);
+        let finished = false;
+
+        await readEventStream(response, (event, data) => {
+            if (event === 'page') {
+                currentScrapeData.push(...data.comments);
+                currentRawScrapeData.push(...data.comments.map(({ sentiment, sentiment_score, ...raw }) => raw));
+                appendRows('scrape-results-table', data.comments);
+                updateSummary('scrape-sentiment-summary', data.running_sentiment_counts);
+                resultsSection.style.display = 'block';
+            } else if (event === 'done') {
+                finished = true;
+                currentScrapeId = data.scrape_id ?? null;
+                updateSummary('scrape-sentiment-summary', data.sentiment_counts);
+                resultsSection.style.display = 'block';
+            } else if (event === 'error') {
+                finished = true;
+                errorMsg.textContent = data.error || "An error occurred.";
+                errorMsg.style.display = 'block';
+            }
+        });
+
+        if (!finished) {
+            errorMsg.textContent = "The connection closed before the scrape finished.";
+            errorMsg.style.display = 'block';
         }
     } catch (err) {
         errorMsg.textContent = "Network or Server Error.";
@@ -161,11 +226,19 @@ document.getElementById('scrape-form').addEventListener('submit', async function
 
 // --- Scraper Downloads
 document.getElementById('download-scrape-raw').addEventListener('click', () => {
+    if (currentScrapeId !== null) {
+        triggerExport(`/export/scrape/${currentScrapeId}?raw=1`);
+        return;
+    }
     const shortcode = extractShortcode(document.getElementById('post-url').value);
     triggerDownload('/download_csv', { comments: currentRawScrapeData, shortcode: shortcode });
 });
 
 document.getElementById('download-scrape-analyzed').addEventListener('click', () => {
+    if (currentScrapeId !== null) {
+        triggerExport(`/export/scrape/${currentScrapeId}`);
+        return;
+    }
     triggerDownload('/download_analyzed_csv', { comments: currentScrapeData, filename_prefix: 'Analyzed_Instagram_Comments' });
 });
 
@@ -195,6 +268,7 @@ document.getElementById('upload-form').addEventListener('submit', async function
         const data = await response.json();
         if (response.ok) {
             currentUploadData = data.comments;
+            currentUploadId = data.upload_id ?? null;
             updateSummary('upload-sentiment-summary', data.counts);
             populateTable('upload-results-table', currentUploadData);
             resultsSection.style.display = 'block';
@@ -211,5 +285,9 @@ document.getElementById('upload-form').addEventListener('submit', async function
 });
 
 document.getElementById('download-upload-analyzed').addEventListener('click', () => {
+    if (currentUploadId !== null) {
+        triggerExport(`/export/upload/${currentUploadId}`);
+        return;
+    }
     triggerDownload('/download_analyzed_csv', { comments: currentUploadData, filename_prefix: 'Analyzed_Custom_Upload' });
 });
@@ -0,0 +1,68 @@
+"""
+Shared setup for the test suite. Config reads the environment on import, so everything is set
+here before any app module is loaded: a throwaway SQLite database and the replay backend
+(modules/instagram/backends.py) serving synthetic fixtures, so no test touches the network.
+
+Run from the repository root with: python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='social_pulse_tests_')
+FIXTURES_DIR = os.path.join(_tmp_dir.name, 'fixtures')
+SHORTCODES = [f"TEST{i:04d}" for i in range(4)]
+COMMENTS_PER_POST = 60
+
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}",
+    'INSTAGRAM_BACKEND': 'replay',
+    'INSTAGRAM_FIXTURES_DIR': FIXTURES_DIR,
+    'INSTAGRAM_REPLAY_LATENCY_MS': '0',
+    'INSTAGRAM_REPLAY_JITTER_MS': '0',
+    'INSTAGRAM_REPLAY_429_RATE': '0',
+    'INSTAGRAM_REPLAY_5XX_RATE': '0',
+    'ENGINE_PROBE_INTERVAL': '0',
+    'SESSION_STORE': 'off',
+    'SCRAPE_CACHE_TTL': '0',
+})
+
+from benchmarks.bench_scrape_replay import write_synthetic_fixtures  # noqa: E402
+from modules.instagram.backends import FixtureStore  # noqa: E402
+
+write_synthetic_fixtures(FixtureStore(FIXTURES_DIR), SHORTCODES, COMMENTS_PER_POST)
+
+
+@pytest.fixture
+def scraper():
+    from modules.instagram import InstagramScraper
+    return InstagramScraper()
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app
+    # Per-route limits would throttle a test run that posts the same route back to back
+    app.limiter.enabled = False
+    return app
+
+
+@pytest.fixture
+def db_app(app_module):
+    """The Flask app with every table emptied, inside an app context."""
+    from modules.database.models import db
+    with app_module.app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app_module.app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(db_app):
+    return db_app.test_client()
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from modules.configuration.config import Config
+from modules.instagram.engine_health import EngineBreaker, CLOSED, OPEN, HALF_OPEN
+from tests.conftest import SHORTCODES
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(Config, 'ENGINE_BREAKER_BASE_BACKOFF', 0.01)
+    return EngineBreaker('instagrapi')
+
+
+def _trip(breaker):
+    breaker.record_failure(breaker.allow_request(), "429", rate_limited=True)
+
+
+def _half_open(breaker):
+    _trip(breaker)
+    assert breaker.state == OPEN
+    time.sleep(0.02)
+    trial = breaker.allow_request()
+    assert breaker.state == HALF_OPEN and trial.trial
+    return trial
+
+
+def test_only_the_trial_permit_closes_a_half_open_breaker(breaker):
+    stale = breaker.allow_request()
+    trial = _half_open(breaker)
+    assert breaker.allow_request() is None
+
+    breaker.record_success(stale)
+    breaker.release(stale)
+    assert breaker.state == HALF_OPEN and breaker.allow_request() is None
+
+    breaker.record_success(trial)
+    assert breaker.state == CLOSED
+
+
+def test_outcome_without_a_permit_after_release_changes_nothing(breaker):
+    trial = _half_open(breaker)
+    breaker.release(trial)
+
+    breaker.record_success(None)
+    assert breaker.state == HALF_OPEN
+    breaker.record_failure(None, "500")
+    assert breaker.state == HALF_OPEN
+
+
+def test_scattered_request_failures_keep_the_breaker_closed(breaker):
+    # 5% of requests fail, one outcome per request: well under ENGINE_BREAKER_FAILURE_RATE
+    for i in range(200):
+        permit = breaker.allow_request()
+        if i % 20 == 0:
+            breaker.record_failure(permit, "HTTP 500 ")
+        else:
+            breaker.record_success(permit, 0.01)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.parametrize("engine, other", [("instagrapi", "instaloader"), ("instaloader", "instagrapi")])
+def test_resumed_cursor_is_refused_while_its_engine_breaker_is_open(scraper, engine, other):
+    _trip(scraper.breakers[other])
+    first = next(scraper.iter_comment_pages(SHORTCODES[0], page_size=10))
+    assert first["engine"] == engine and first["cursor"]
+
+    _trip(scraper.breakers[engine])
+    with pytest.raises(Exception, match="no active session"):
+        next(scraper.iter_comment_pages(SHORTCODES[0], cursor=first["cursor"], page_size=10))
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from modules.jobs.batch_scheduler import RateLimitGate, BatchScrapeScheduler
+from tests.conftest import SHORTCODES, COMMENTS_PER_POST
+
+
+def _poll(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = client.get(f"/jobs/{job_id}").get_json()
+        if body["status"] in ('done', 'failed'):
+            return body
+        time.sleep(0.05)
+    pytest.fail(f"job {job_id} did not finish: {body}")
+
+
+#==================================== Scrape Jobs =================================
+def test_async_scrape_job_completes_with_the_sync_payload(client):
+    response = client.post('/scrape', json={"shortcode": SHORTCODES[0], "async": True})
+    assert response.status_code == 202
+    queued = response.get_json()
+    assert queued["status"] == 'queued' and queued["status_url"].endswith(queued["job_id"])
+
+    job = _poll(client, queued["job_id"])
+    assert job["status"] == 'done' and job["progress"] == 100 and job["error"] is None
+    result = job["result"]
+    assert len(result["comments"]) == COMMENTS_PER_POST
+    assert sum(result["sentiment_counts"].values()) == COMMENTS_PER_POST
+    assert {"comment_id", "created_at", "sentiment"} <= set(result["analyzed_comments"][0])
+
+
+def test_failed_scrape_marks_the_job_failed(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'run_scrape', lambda *args, **kwargs: ({"error": "boom"}, 500, None))
+    job_id = client.post('/scrape', json={"shortcode": SHORTCODES[0], "async": True}).get_json()["job_id"]
+
+    job = _poll(client, job_id)
+    assert job["status"] == 'failed' and job["error"] == "boom" and "result" not in job
+
+
+def test_unknown_job_is_404(client):
+    assert client.get('/jobs/doesnotexist').status_code == 404
+
+
+#==================================== Batch Scrapes =================================
+def test_batch_scrape_runs_each_shortcode_once(client):
+    shortcodes = [SHORTCODES[1], SHORTCODES[2], SHORTCODES[1]]
+    body = client.post('/scrape/batch', json={"shortcodes": shortcodes}).get_json()
+
+    assert [r["shortcode"] for r in body["results"]] == SHORTCODES[1:3]
+    assert all(r["status"] == 'ok' for r in body["results"])
+    assert body["summary"]["succeeded"] == 2 and body["summary"]["rate_limited"] == []
+    assert sum(body["summary"]["sentiment_counts"].values()) == 2 * COMMENTS_PER_POST
+
+
+#==================================== RateLimitGate =================================
+def test_one_trip_pauses_every_waiter():
+    gate = RateLimitGate(base_backoff=0.2, max_backoff=1)
+    gate.trip()
+    started = time.monotonic()
+    finished = []
+
+    def waiter():
+        assert gate.wait()
+        finished.append(time.monotonic() - started)
+
+    threads = [threading.Thread(target=waiter) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(finished) == 4 and min(finished) >= 0.19
+    # A wait capped below the backoff gives up at once instead of sleeping
+    gate.trip()
+    assert gate.wait(max_wait=0.01) is False
+
+
+def test_consecutive_trips_double_the_backoff_until_reset():
+    gate = RateLimitGate(base_backoff=0.01, max_backoff=0.03)
+    assert [gate.trip() for _ in range(3)] == [0.01, 0.02, 0.03]
+    gate.reset()
+    assert gate.trip() == 0.01
+
+
+def test_batch_waits_out_a_short_shared_backoff_and_retries():
+    gate = RateLimitGate(base_backoff=0.1, max_backoff=1)
+    calls = []
+    lock = threading.Lock()
+
+    def task(item):
+        with lock:
+            calls.append(item)
+            first = calls.count(item) == 1
+        if item == 'a' and first:
+            return {"error": "rate limited"}, 429
+        return {"item": item}, 200
+
+    started = time.monotonic()
+    results = BatchScrapeScheduler(max_concurrency=1, max_retries=2, gate=gate, max_wait=1).run(['a', 'b'], task)
+    assert [(item, status) for item, _, status in results] == [('a', 200), ('b', 200)]
+    assert calls == ['a', 'a', 'b'] and time.monotonic() - started >= 0.09
+    assert gate.status()["consecutive_rate_limits"] == 0
+
+
+def test_batch_returns_rate_limited_items_while_a_long_backoff_runs():
+    gate = RateLimitGate(base_backoff=30, max_backoff=30)
+    gate.trip()
+    calls = []
+
+    results = BatchScrapeScheduler(gate=gate, max_wait=0).run(['a', 'b'], lambda item: calls.append(item))
+    assert calls == []
+    for _, payload, status in results:
+        assert status == 429 and 0 < payload["retry_after"] <= 30
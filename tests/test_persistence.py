@@ -0,0 +1,142 @@
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+
+import pytest
+
+from benchmarks.corpus import comment_records
+from modules.analysis.sentiment import analyze_comment_records
+from modules.database import persistence
+from modules.database.models import (
+    db, InstagramScrape, InstagramComment, ScrapeSentimentRollup, ShortcodeSentimentHourly
+)
+from modules.database.persistence import (
+    save_instagram_scrape, merge_incremental_scrape, scrape_sentiment_counts, update_sentiment_rollups,
+    rebuild_sentiment_rollups
+)
+from modules.instagram.backends import FixtureStore
+from tests.conftest import FIXTURES_DIR
+
+
+def _stored(scrape_id):
+    return db.session.execute(
+        db.select(InstagramComment.ig_comment_id, InstagramComment.sentiment)
+        .where(InstagramComment.scrape_id == scrape_id)
+    ).all()
+
+
+def _hourly_total(shortcode):
+    return db.session.query(db.func.sum(ShortcodeSentimentHourly.count)).filter_by(shortcode=shortcode).scalar()
+
+
+# Writes `records` as replay fixtures for both engines, newest first like Instagram serves them
+def _write_fixture(shortcode, records, page_size=20):
+    store = FixtureStore(FIXTURES_DIR)
+    newest_first = sorted(records, key=lambda r: r["created_at"], reverse=True)
+    raw = [
+        {
+            "pk": r["comment_id"],
+            "text": r["comment"],
+            "user": {"pk": str(1_000 + i), "username": r["username"]},
+            "created_at_utc": int(datetime.fromisoformat(r["created_at"]).replace(tzinfo=timezone.utc).timestamp()),
+            "content_type": "comment",
+            "status": "Active",
+        }
+        for i, r in enumerate(newest_first)
+    ]
+    for start in range(0, len(raw), page_size):
+        params = {"max_id": f"replay-{start}"} if start else None
+        store.add_instagrapi_page(shortcode, f"{zlib.crc32(shortcode.encode())}_7", params, {"comments": raw[start:start + page_size]})
+    store.add_instaloader_comments(shortcode, [
+        {"id": int(r["comment_id"]), "username": r["username"], "text": r["comment"], "created_at_utc": r["created_at"]}
+        for r in newest_first
+    ])
+
+
+#==================================== Incremental Scrapes =================================
+def test_incremental_rescrape_merges_an_overlapping_scrape_once(db_app, app_module):
+    shortcode = "MERGE0001"
+    records = comment_records(60, seed=9)
+    # Posted in the same second as the newest stored comment, so only its id tells it apart
+    tied = {**records[39], "comment_id": str(10**18), "username": "late_poster"}
+    analyzed, _ = analyze_comment_records(records[:40])
+    base = save_instagram_scrape(shortcode, analyzed, "instagrapi")
+    _write_fixture(shortcode, records + [tied])
+
+    payload, status_code, scrape_id = app_module.run_scrape(shortcode, incremental=True)
+    assert status_code == 200 and scrape_id == base.id and payload["incremental"]
+    assert {c["comment_id"] for c in payload["comments"]} == {r["comment_id"] for r in records[40:]} | {tied["comment_id"]}
+
+    rows = _stored(base.id)
+    ids = [comment_id for comment_id, _ in rows]
+    assert len(ids) == len(set(ids)) == 61
+    expected = dict(Counter(sentiment for _, sentiment in rows))
+    assert scrape_sentiment_counts(base.id) == expected == payload["sentiment_counts"]
+    assert _hourly_total(shortcode) == 61
+
+    # Nothing new the second time round: no rows, no counts
+    payload, status_code, _ = app_module.run_scrape(shortcode, incremental=True)
+    assert status_code == 200 and payload["comments"] == []
+    assert len(_stored(base.id)) == 61
+    assert scrape_sentiment_counts(base.id) == expected and _hourly_total(shortcode) == 61
+
+
+#==================================== Sentiment Rollups =================================
+def _rollups(shortcode):
+    per_scrape = db.session.query(ScrapeSentimentRollup.scrape_id, ScrapeSentimentRollup.sentiment,
+                                  ScrapeSentimentRollup.count)
+    hourly = (db.session.query(ShortcodeSentimentHourly.hour, ShortcodeSentimentHourly.sentiment,
+                               ShortcodeSentimentHourly.count, ShortcodeSentimentHourly.scrape_id)
+              .filter_by(shortcode=shortcode))
+    return sorted(per_scrape), sorted(hourly)
+
+
+def _comments(sentiments, hour):
+    return [
+        {"comment_id": str(i), "comment": "x", "username": "u", "sentiment": sentiment,
+         "created_at": f"2026-03-01T{hour:02d}:{i % 60:02d}:00"}
+        for i, sentiment in enumerate(sentiments)
+    ]
+
+
+# ON CONFLICT upsert (SQLite, PostgreSQL) and the ORM read-modify-write used by other backends
+@pytest.fixture(params=['upsert', 'orm'])
+def increment_path(request, monkeypatch):
+    if request.param == 'orm':
+        monkeypatch.setattr(persistence, 'UPSERT_DIALECTS', ())
+    return request.param
+
+
+def test_rollup_updates_for_the_same_hour_add_up(db_app, increment_path):
+    scrape = InstagramScrape(shortcode="ROLL0001")
+    db.session.add(scrape)
+    db.session.flush()
+    first = _comments(['Positive', 'Positive', 'Negative'], hour=10)
+    second = _comments(['Positive', 'Neutral', 'Negative', 'Negative'], hour=10)
+    update_sentiment_rollups(scrape, first, new_snapshot=True)
+    update_sentiment_rollups(scrape, second)
+    db.session.commit()
+
+    expected = {'Positive': 3, 'Negative': 3, 'Neutral': 1}
+    assert scrape_sentiment_counts(scrape.id) == expected
+    hour = datetime(2026, 3, 1, 10)
+    assert {s: c for h, s, c, _ in _rollups("ROLL0001")[1] if h == hour} == expected
+
+
+def test_rebuild_reproduces_the_incremental_rollups(db_app, increment_path):
+    records = comment_records(90, seed=11)
+    analyzed, _ = analyze_comment_records(records)
+    older = save_instagram_scrape("ROLL0002", analyzed[:30], "instagrapi")
+    newer = save_instagram_scrape("ROLL0002", analyzed[:60], "instaloader")
+    merge_incremental_scrape(newer, analyzed[60:])
+    save_instagram_scrape("ROLL0003", analyzed[:10], "instagrapi")
+    before = _rollups("ROLL0002")
+
+    assert rebuild_sentiment_rollups() == 2
+    assert _rollups("ROLL0002") == before
+    per_scrape = Counter()
+    for scrape_id, _, count in before[0]:
+        per_scrape[scrape_id] += count
+    assert per_scrape[older.id] == 30 and per_scrape[newer.id] == 90
+    # The hourly buckets follow the newest scrape, merge included
+    assert {row[3] for row in before[1]} == {newer.id} and sum(row[2] for row in before[1]) == 90
@@ -0,0 +1,10 @@
+# WSGI entry point for production servers (gunicorn -c gunicorn.conf.py wsgi:app)
+from app import app, apply_migrations
+from modules.analysis.sentiment import warm_up
+
+# Runs once in the gunicorn master (preload_app) before workers fork: schema upgrade,
+# then the VADER analyzer so every worker inherits it instead of building its own
+apply_migrations()
+warm_up()
+
+application = app